@@ -0,0 +1,85 @@
+# Benchmark for the fork server used by libdesktop.system.get_cmd_out()
+#
+# Grows this process to each of the given sizes, then times get_cmd_out()
+# with programs started directly (posix_spawn()) and from the fork server,
+# along with subprocess.check_output() and a plain fork() and exec() for
+# comparison.
+#
+# Usage: python benchmarks/forkserver.py [size in MB ...]
+
+import os
+import sys
+import time
+import mmap
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from libdesktop import processes, system
+
+COMMAND = ['true']
+RUNS = 200
+
+
+def fork_exec():
+	read_end, write_end = os.pipe()
+	pid = os.fork()
+
+	if pid == 0:
+		os.dup2(write_end, 1)
+
+		try:
+			os.execvp(COMMAND[0], COMMAND)
+		finally:
+			os._exit(127)
+
+	os.close(write_end)
+
+	with os.fdopen(read_end, 'rb') as f:
+		f.read()
+
+	os.waitpid(pid, 0)
+
+
+def timed(function):
+	function()
+
+	start = time.perf_counter()
+
+	for i in range(RUNS):
+		function()
+
+	return (time.perf_counter() - start) / RUNS * 1000
+
+
+def main(sizes):
+	ballast = []
+
+	for size in sizes:
+		# Touch every page, so that it is really part of the process
+		grow = size - sum(len(block) for block in ballast) // (1 << 20)
+
+		if grow > 0:
+			block = bytearray(grow << 20)
+			block[::mmap.PAGESIZE] = b'\1' * len(range(0, len(block),
+														 mmap.PAGESIZE))
+
+			ballast.append(block)
+
+		processes.use_forkserver(False)
+		direct = timed(lambda: system.get_cmd_out(COMMAND))
+
+		processes.use_forkserver(True)
+		forkserver = timed(lambda: system.get_cmd_out(COMMAND))
+		processes.use_forkserver(False)
+
+		popen = timed(lambda: subprocess.check_output(COMMAND))
+		fork = timed(fork_exec)
+
+		print('%5d MB: posix_spawn %.2fms, fork server %.2fms, '
+			  'subprocess %.2fms, fork %.2fms' % (
+				  size, direct, forkserver, popen, fork))
+
+
+if __name__ == '__main__':
+	main([int(i) for i in sys.argv[1:]] or [100, 2000])
@@ -0,0 +1,79 @@
+# Benchmark for libdesktop.desktopfile.parse_many()
+#
+# Compares parsing a set of generated .desktop files one by one with parse()
+# against parse_many() with threads and with processes.
+#
+# Usage: python benchmarks/parse_many.py [number of files ...]
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from libdesktop import desktopfile
+
+DESKTOP_FILE = '''[Desktop Entry]
+Type=Application
+Name=Benchmark Application %(i)d
+Name[de]=Benchmark-Anwendung %(i)d
+Name[fr]=Application de test %(i)d
+GenericName=Benchmark
+Comment=A generated application for benchmarking libdesktop
+Icon=benchmark-%(i)d
+Exec=benchmark-%(i)d --new-window %%U
+Terminal=false
+Categories=Utility;Development;
+Keywords=benchmark;test;generated;
+MimeType=text/plain;text/x-python;
+StartupNotify=true
+Actions=new-window;
+
+[Desktop Action new-window]
+Name=New Window
+Exec=benchmark-%(i)d --new-window
+'''
+
+
+def timed(function):
+	desktopfile._entry_cache.clear()
+
+	start = time.perf_counter()
+	function()
+
+	return time.perf_counter() - start
+
+
+def main(counts):
+	for count in counts:
+		directory = tempfile.mkdtemp(prefix='libdesktop-bench-')
+
+		try:
+			paths = []
+
+			for i in range(count):
+				path = os.path.join(directory, 'benchmark-%d.desktop' % i)
+
+				with open(path, 'w') as f:
+					f.write(DESKTOP_FILE % {'i': i})
+
+				paths.append(path)
+
+			# The entry cache is cleared before every run (the OS page cache is not)
+			sequential = timed(lambda: [desktopfile.parse(path) for path in paths])
+			threads = timed(lambda: desktopfile.parse_many(paths))
+			processes = timed(lambda: desktopfile.parse_many(paths, processes=True))
+
+			print('%6d files: sequential %.3fs, threads %.3fs (%.2fx), processes %.3fs (%.2fx)' % (
+				count, sequential,
+				threads, sequential / threads,
+				processes, sequential / processes))
+
+		finally:
+			shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+	main([int(i) for i in sys.argv[1:]] or [1000, 10000, 50000])
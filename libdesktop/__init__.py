@@ -5,9 +5,15 @@ sys.path.insert(0, '.')
 
 from . import startup
 from . import desktopfile
+from . import catalog
+from . import capabilities
+from . import icons
+from . import mime
+from . import processes
 from . import system
 from . import applications
 from . import volume
 from . import dialog
 from . import wallpaper
 from . import directories
+from . import aio
@@ -0,0 +1,129 @@
+# coding: utf-8
+
+# This file is part of libdesktop
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Bharadwaj Raju
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import functools
+import contextvars
+
+# The commands whose output the steps being driven closed early (see
+# libdesktop.aio.system._Lines), which are finished with before the steps
+# count as done
+_closing = contextvars.ContextVar('libdesktop.aio._closing', default=None)
+
+
+def _mirror(function):
+	# The coroutine function version of a libdesktop function, which runs
+	# its steps (see libdesktop.processes.driven) on the event loop
+	steps = getattr(function, 'steps', None)
+
+	# libdesktop.volume.get_volume → libdesktop.aio.volume.get_volume
+	module = 'libdesktop.aio.' + function.__module__.rsplit('.', 1)[-1]
+	name = '%s.%s' % (module, function.__name__)
+
+	@functools.wraps(function)
+	async def mirrored(*args, **kwargs):
+		if steps is None:
+			# Does not wait for any programs
+			return function(*args, **kwargs)
+
+		if _processes._api.get() is not None:
+			return await _drive(steps(*args, **kwargs))
+
+		token = _processes._api.set(name)
+
+		try:
+			return await _drive(steps(*args, **kwargs))
+		finally:
+			_processes._api.reset(token)
+
+	mirrored.__module__ = module
+
+	return mirrored
+
+
+async def _drive(steps):
+	# Like libdesktop.processes.drive()
+	result = None
+	error = None
+	closing = []
+	token = _closing.set(closing)
+
+	try:
+		while True:
+			try:
+				if error is None:
+					step = steps.send(result)
+				else:
+					step = steps.throw(error)
+
+			except StopIteration as e:
+				return e.value
+
+			finally:
+				error = None
+
+			try:
+				result = await _run(step)
+			except Exception as e:
+				result = None
+				error = e
+
+	finally:
+		_closing.reset(token)
+
+		for task in closing:
+			await task
+
+
+async def _run(step):
+	function = _coroutines.get(step.function)
+
+	if function is None:
+		return step.function(*step.args, **step.kwargs)
+
+	return await function(*step.args, **step.kwargs)
+
+
+from . import processes
+from . import system
+from . import applications
+from . import startup
+from . import volume
+from . import wallpaper
+
+from libdesktop import processes as _processes
+from libdesktop import system as _system
+
+# The calls yielded by libdesktop's backends which wait for a program
+_coroutines = {
+	_processes.check_output: processes.check_output,
+	_processes.spawn: processes.spawn,
+	_system.get_cmd_out: system.get_cmd_out,
+	_system.iter_cmd_lines: system._get_cmd_lines,
+	_system._next_line: system._next_line,
+	_system.run_cmds: system.run_cmds,
+}
@@ -0,0 +1,253 @@
+# coding: utf-8
+
+# This file is part of libdesktop
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Bharadwaj Raju
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import time
+import subprocess as sp
+
+from libdesktop import processes
+
+PIPE = processes.PIPE
+DEVNULL = processes.DEVNULL
+STDOUT = processes.STDOUT
+
+
+async def _create(args, shell, **kwargs):
+	import asyncio
+
+	if shell and os.name != 'nt':
+		args = ['/bin/sh', '-c'] + ([args] if isinstance(args, str)
+									else list(args))
+		shell = False
+
+	if shell:
+		if not isinstance(args, str):
+			args = sp.list2cmdline(args)
+
+		return await asyncio.create_subprocess_shell(args, **kwargs)
+
+	if isinstance(args, str):
+		args = [args]
+
+	return await asyncio.create_subprocess_exec(*args, **kwargs)
+
+
+async def _communicate(child, args, input, timeout):
+	import asyncio
+
+	try:
+		return await asyncio.wait_for(child.communicate(input), timeout)
+
+	except asyncio.TimeoutError:
+		child.kill()
+		await child.wait()
+
+		raise sp.TimeoutExpired(args, timeout)
+
+	except BaseException:
+		# Cancelled: do not leave the program behind
+		if child.returncode is None:
+			child.kill()
+
+		raise
+
+
+async def _run_program(args, shell, input, timeout, **kwargs):
+	# Start the program and wait for it, accounted like the programs
+	# libdesktop.processes starts. Returns it and its output.
+	accounting = processes._spawn_started(args)
+
+	try:
+		child = await _create(args, shell, **kwargs)
+	except OSError:
+		processes._spawn_exited(accounting, None)
+		raise
+
+	try:
+		return child, await _communicate(child, args, input, timeout)
+	finally:
+		processes._spawn_exited(accounting, child.returncode)
+
+
+async def _iter_lines(args, shell, timeout):
+	# Yields the lines of the output of the program as it writes them, and
+	# kills it if the caller stops early
+	import asyncio
+
+	# Our own pipe rather than PIPE, which asyncio waits for every program
+	# holding it (like the shell's children) to close before the program
+	# counts as exited
+	read_end, write_end = os.pipe()
+	accounting = processes._spawn_started(args)
+
+	try:
+		child = await _create(args, shell, stdout=write_end)
+	except OSError:
+		os.close(read_end)
+		processes._spawn_exited(accounting, None)
+		raise
+	finally:
+		os.close(write_end)
+
+	output = asyncio.StreamReader()
+	transport, _ = await asyncio.get_event_loop().connect_read_pipe(
+		lambda: asyncio.StreamReaderProtocol(output),
+		os.fdopen(read_end, 'rb', 0))
+
+	deadline = None if timeout is None else time.monotonic() + timeout
+	finished = False
+
+	try:
+		while True:
+			try:
+				line = await asyncio.wait_for(output.readline(),
+					None if deadline is None else deadline - time.monotonic())
+			except asyncio.TimeoutError:
+				raise sp.TimeoutExpired(args, timeout)
+
+			if not line:
+				break
+
+			yield line
+
+		finished = True
+
+	finally:
+		transport.close()
+
+		if not finished and child.returncode is None:
+			child.kill()
+
+		await child.wait()
+		processes._spawn_exited(accounting, child.returncode)
+
+	if child.returncode != 0:
+		raise sp.CalledProcessError(child.returncode, args)
+
+
+async def _run_with_output(args, shell, timeout):
+	# Returns the exit status, the output and the error output, and whether
+	# the program was killed after timeout seconds
+	import asyncio
+
+	accounting = processes._spawn_started(args)
+
+	try:
+		child = await _create(args, shell, stdin=DEVNULL, stdout=PIPE,
+							  stderr=PIPE)
+	except OSError:
+		processes._spawn_exited(accounting, None)
+		raise
+
+	try:
+		stdout, stderr = await asyncio.wait_for(child.communicate(), timeout)
+		return child.returncode, stdout, stderr, False
+
+	except asyncio.TimeoutError:
+		child.kill()
+		await child.wait()
+
+		return child.returncode, None, None, True
+
+	finally:
+		if child.returncode is None:
+			# Cancelled
+			child.kill()
+
+		processes._spawn_exited(accounting, child.returncode)
+
+
+async def spawn(args, background=False, detach=False, timeout=None,
+				input=None, stdin=None, stdout=None, stderr=None, shell=False,
+				env=None, cwd=None, creationflags=0):
+	'''Start a program, and wait for it without blocking the event loop.
+
+	Takes the same arguments as :func:`libdesktop.processes.spawn`. With ``background`` (or ``detach``), the program
+	is started with :func:`libdesktop.processes.spawn`, which returns at once.
+
+	Returns:
+			asyncio.subprocess.Process: The program, which has exited. Or, with ``background``, a :class:`libdesktop.processes.Child`.
+
+	Raises:
+			OSError: If the program could not be started.
+			subprocess.TimeoutExpired: If the program was killed after ``timeout`` seconds.
+	'''
+
+	if background or detach:
+		return processes.spawn(args, background=background, detach=detach,
+							   timeout=timeout, input=input, stdin=stdin,
+							   stdout=stdout, stderr=stderr, shell=shell,
+							   env=env, cwd=cwd, creationflags=creationflags)
+
+	kwargs = {}
+
+	if creationflags:
+		kwargs['creationflags'] = creationflags
+
+	if input is not None:
+		stdin = PIPE
+
+	child, _ = await _run_program(args, shell, input, timeout, stdin=stdin,
+								  stdout=stdout, stderr=stderr, env=env,
+								  cwd=cwd, **kwargs)
+
+	return child
+
+
+async def check_output(args, shell=False, timeout=None, env=None, cwd=None):
+	'''Get the output of a program, without blocking the event loop.
+
+	Like :func:`libdesktop.processes.check_output`, but started with :func:`asyncio.create_subprocess_exec`.
+
+	Returns:
+			bytes: What the program wrote to its output.
+
+	Raises:
+			subprocess.CalledProcessError: If the program exited with a non-zero status.
+			subprocess.TimeoutExpired: If the program was killed after ``timeout`` seconds.
+	'''
+
+	child, (output, _) = await _run_program(args, shell, None, timeout,
+											stdout=PIPE, env=env, cwd=cwd)
+
+	if child.returncode != 0:
+		raise sp.CalledProcessError(child.returncode, args, output=output)
+
+	return output
+
+
+async def wait_for_process(name, timeout=None, match='name'):
+	'''Wait for a process to start. See :func:`libdesktop.processes.wait_for_process`.'''
+
+	return await processes.wait_for_process_async(name, timeout, match)
+
+
+async def wait_for_exit(name_or_pid, timeout=None, match='name'):
+	'''Wait for processes to exit. See :func:`libdesktop.processes.wait_for_exit`.'''
+
+	return await processes.wait_for_exit_async(name_or_pid, timeout, match)
@@ -0,0 +1,172 @@
+# coding: utf-8
+
+# This file is part of libdesktop
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Bharadwaj Raju
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import time
+
+from libdesktop import system
+from libdesktop.aio import _mirror
+from libdesktop.aio import _closing
+from libdesktop.aio import processes
+
+
+async def get_cmd_out(command):
+	'''Get the output of a command, without blocking the event loop.
+
+	Like :func:`libdesktop.system.get_cmd_out`.
+
+	Args:
+			command (str or list): A string of the command, or a list of the arguments. A ``str`` is run through the shell.
+
+	Returns:
+			str: The ``stdout`` of the command.
+	'''
+
+	output = await processes.check_output(command,
+										  shell=not isinstance(command, list))
+
+	return output.decode('utf-8').rstrip()
+
+
+async def iter_cmd_lines(command, binary=False, timeout=None):
+	'''Get the output of a command line by line, without blocking the event loop.
+
+	Like :func:`libdesktop.system.iter_cmd_lines`, but an asynchronous generator, for use with ``async for``.
+	Closing the generator (with ``aclose()``) before the end kills the command. Unlike a generator, leaving
+	an ``async for`` early does not close it.
+
+	Args:
+			command (str or list): A string of the command, or a list of the arguments. A ``str`` is run through the shell.
+			binary  (bool)	   : Yield ``bytes`` instead of decoding every line. Defaults to ``False``.
+			timeout (float)	  : Kill the command if it is still running after this many seconds. Defaults to ``None`` (no limit).
+
+	Yields:
+			str: Each line, without the line ending (``bytes`` with ``binary``).
+	'''
+
+	lines = processes._iter_lines(command, not isinstance(command, list),
+								  timeout)
+
+	try:
+		async for line in lines:
+			line = line.rstrip(b'\r\n')
+			yield line if binary else line.decode('utf-8')
+
+	finally:
+		await lines.aclose()
+
+
+class _Lines(object):
+	# What the backends get from libdesktop.system.iter_cmd_lines: read with
+	# the _next_line step, and closed (killing the command) like a generator
+
+	def __init__(self, lines):
+		self._lines = lines
+
+	async def next(self):
+		try:
+			return await self._lines.__anext__()
+		except StopAsyncIteration:
+			return None
+
+	def close(self):
+		import asyncio
+
+		# Kills the command at once, while the steps go on; the driver
+		# waits for it to be done at the end
+		_closing.get().append(asyncio.get_running_loop().create_task(
+			self._lines.aclose()))
+
+
+async def _get_cmd_lines(command, binary=False, timeout=None):
+	return _Lines(iter_cmd_lines(command, binary, timeout))
+
+
+async def _next_line(lines):
+	return await lines.next()
+
+
+async def run_cmds(commands, max_parallel=4, timeout=None, total_timeout=None):
+	'''Run several commands at the same time, without blocking the event loop.
+
+	Like :func:`libdesktop.system.run_cmds`. The output of commands which are killed is lost.
+
+	Returns:
+			list: A :class:`libdesktop.system.CommandResult` for each command, in the same order.
+	'''
+
+	import asyncio
+
+	deadline = None
+
+	if total_timeout is not None:
+		deadline = time.monotonic() + total_timeout
+
+	semaphore = asyncio.Semaphore(max(max_parallel, 1))
+
+	async def run(command):
+		async with semaphore:
+			limit = timeout
+
+			if deadline is not None:
+				remaining = deadline - time.monotonic()
+
+				if remaining <= 0:
+					return system.CommandResult(command, '', '', None, 0.0,
+												True)
+
+				limit = remaining if limit is None else min(limit, remaining)
+
+			start = time.monotonic()
+
+			try:
+				returncode, stdout, stderr, timed_out = \
+					await processes._run_with_output(
+						command, not isinstance(command, list), limit)
+
+			except OSError as e:
+				return system.CommandResult(command, '', str(e), None,
+											time.monotonic() - start, False)
+
+			return system.CommandResult(command,
+										system._decode_output(stdout),
+										system._decode_output(stderr),
+										returncode, time.monotonic() - start,
+										timed_out)
+
+	return list(await asyncio.gather(*[run(command) for command in commands]))
+
+
+# Does not do any I/O
+join_cmd = system.join_cmd
+
+get_desktop_info = _mirror(system.get_desktop_info)
+refresh = _mirror(system.refresh)
+get_name = _mirror(system.get_name)
+which = _mirror(system.which)
+is_in_path = _mirror(system.is_in_path)
+is_running = _mirror(system.is_running)
@@ -30,10 +30,14 @@ import tempfile
 import os
 import shlex
 
+from libdesktop import capabilities
 from libdesktop import desktopfile
+from libdesktop import mime
+from libdesktop import processes
 from libdesktop import system
 
 
+@processes.driven
 def mac_app_exists(app):
 	'''Check if 'app' is installed (OS X).
 
@@ -58,18 +62,20 @@ def mac_app_exists(app):
 	with open('/tmp/app_check.AppleScript', 'w') as f:
 		f.write(APP_CHECK_APPLESCRIPT % app)
 
-	app_check_proc = sp.Popen(
+	app_check_proc = yield processes.call(processes.spawn,
 		['osascript', '-e', '/tmp/app_check.AppleScript'])
 
-	if app_check_proc.wait() != 0:
+	if app_check_proc.returncode != 0:
 		return False
 
 	else:
 		return True
 
 
+@processes.driven
 def open_file_with_default_program(file_path,
-								   background=False, return_cmd=False):
+								   background=False, return_cmd=False,
+								   argv=False):
 	'''Opens a file with the default program for that type.
 
 	Open the file with the user's preferred application.
@@ -78,39 +84,42 @@ def open_file_with_default_program(file_path,
 			file_path  (str) : Path to the file to be opened.
 			background (bool): Run the program in the background, instead of waiting for completion. Defaults to ``False``.
 			return_cmd (bool): Returns the command to run the program (str) instead of running it. Defaults to ``False``.
+			argv	   (bool): With ``return_cmd``, return the command as a list of arguments instead of a ``str``. Defaults to ``False``.
 
 	Returns:
 			str: Only if ``return_cmd``, the command to run the program is returned instead of running it. Else returns nothing.
 	'''
 
-	desktop_env = system.get_name()
+	desktop_env = capabilities.get_capabilities().desktop
 
 	if desktop_env == 'windows':
-		open_file_cmd = 'explorer.exe ' + "'%s'" % file_path
+		open_file_cmd = ['explorer.exe', file_path]
 
 	elif desktop_env == 'mac':
-		open_file_cmd = 'open ' + "'%s'" % file_path
+		open_file_cmd = ['open', file_path]
 
 	else:
-		file_mime_type = system.get_cmd_out(
-			['xdg-mime', 'query', 'filetype', file_path])
-		desktop_file = system.get_cmd_out(
-			['xdg-mime', 'query', 'default', file_mime_type])
+		file_mime_type = yield from mime.get_file_type.steps(file_path)
+		desktop_file = mime.get_default_application(file_mime_type)
+
+		if desktop_file is None:
+			desktop_file = (yield from system._run_until_success(
+				[['xdg-mime', 'query', 'default', file_mime_type]],
+				check=True)).stdout
 		open_file_cmd = desktopfile.execute(desktopfile.locate(
-			desktop_file)[0], files=[file_path], return_cmd=True)
+			desktop_file)[0], files=[file_path], return_cmd=True, argv=True)
 
 	if return_cmd:
-		return open_file_cmd
+		return open_file_cmd if argv else system.join_cmd(open_file_cmd)
 
 	else:
-		def_program_proc = sp.Popen(open_file_cmd, shell=True)
-
-		if not background:
-			def_program_proc.wait()
+		yield processes.call(processes.spawn, open_file_cmd,
+							 background=background)
 
 
+@processes.driven
 def terminal(exec_='', background=False, shell_after_cmd_exec=False,
-			 keep_open_after_cmd_exec=False, return_cmd=False):
+			 keep_open_after_cmd_exec=False, return_cmd=False, argv=False):
 	'''Start the default terminal emulator.
 
 	Start the user's preferred terminal emulator, optionally running a command in it.
@@ -134,100 +143,56 @@ def terminal(exec_='', background=False, shell_after_cmd_exec=False,
 					- xterm
 
 	Args:
-			exec\_			   (str) : An optional command to run in the opened terminal emulator. Defaults to empty (no command).
+			exec\_			   (str) : An optional command to run in the opened terminal emulator, as a ``str`` or a list of arguments. Defaults to empty (no command).
 			background		   (bool): Run the terminal in the background, instead of waiting for completion. Defaults to ``False``.
 			shell_after_cmd_exec (bool): Start the user's shell after running the command (see exec_). Defaults to `False`.
 			return_cmd		   (bool): Returns the command used to start the terminal (str) instead of running it. Defaults to ``False``.
+			argv				 (bool): With ``return_cmd``, return the command as a list of arguments instead of a ``str``. Defaults to ``False``.
 	Returns:
 			str: Only if ``return_cmd``, returns the command to run the terminal instead of running it. Else returns nothing.
 	'''
 
-	desktop_env = system.get_name()
+	session = capabilities.get_capabilities()
+	desktop_env = session.desktop
 
 	if not exec_:
 		shell_after_cmd_exec = True
 
 	if desktop_env == 'windows':
-		terminal_cmd_str = 'start powershell.exe'
+		terminal_cmd = ['powershell.exe']
 
-	if desktop_env == 'mac':
+	elif desktop_env == 'mac':
 		# Try iTerm2 first, apparently most popular Mac Terminal
-		if mac_app_exists('iTerm2'):
-			terminal_cmd_str = 'open -a iTerm2'
+		if (yield from mac_app_exists.steps('iTerm2')):
+			terminal_cmd = ['open', '-a', 'iTerm2']
 
 		else:
-			terminal_cmd_str = 'open -a Terminal'
+			terminal_cmd = ['open', '-a', 'Terminal']
 
 	else:
+		# sensible-terminal, found once per session
+		if session.terminal is None:
+			raise OSError('No terminal emulator found')
 
-		# sensible-terminal
-
-		if os.getenv('TERMINAL'):
-			# Not everywhere, but if user *really* has a preference, they will
-			# set this
-
-			terminal_cmd_str = os.getenv('TERMINAL')
-
-		elif system.is_in_path('x-terminal-emulator'):
-			# This is a convenience script that launches terminal based on
-			# user preferences.
-			# This is not available on some distros (but most have it)
-			# so try this first
-			terminal_cmd_str = 'x-terminal-emulator'
-
-		elif system.is_in_path('terminator'):
-			terminal_cmd_str = 'terminator'
-
-		elif desktop_env in ['gnome', 'unity', 'cinnamon', 'gnome2']:
-			terminal_cmd_str = 'gnome-terminal'
-
-		elif desktop_env == 'xfce4':
-			terminal_cmd_str = 'xfce4-terminal'
-
-		elif desktop_env == 'kde' or desktop_env == 'trinity':
-			terminal_cmd_str = 'konsole'
-
-		elif desktop_env == 'mate':
-			terminal_cmd_str = 'mate-terminal'
-
-		elif desktop_env == 'i3':
-			terminal_cmd_str = 'i3-sensible-terminal'
-
-		elif desktop_env == 'pantheon':
-			terminal_cmd_str = 'pantheon-terminal'
-
-		elif desktop_env == 'enlightenment':
-			terminal_cmd_str = 'terminology'
-
-		elif desktop_env == 'lxde' or desktop_env == 'lxqt':
-			terminal_cmd_str = 'lxterminal'
-
-		else:
-			if system.is_in_path('gnome-terminal'):
-				terminal_cmd_str = 'gnome-terminal'
-
-			elif system.is_in_path('urxvt'):
-				terminal_cmd_str = 'urxvt'
-
-			elif system.is_in_path('rxvt'):
-				terminal_cmd_str = 'rxvt'
-
-			elif system.is_in_path('xterm'):
-				terminal_cmd_str = 'xterm'
+		terminal_cmd = shlex.split(session.terminal)
 
 	if exec_:
+		if not isinstance(exec_, str):
+			# A list of arguments, as from desktopfile.execute()
+			exec_ = system.join_cmd(exec_)
+
 		if desktop_env == 'windows':
 			if keep_open_after_cmd_exec and not shell_after_cmd_exec:
 				exec_ += '; pause'
 
 			if os.path.isfile(exec_):
-				terminal_cmd_str += exec_
+				terminal_cmd.append(exec_)
 
 			else:
-				terminal_cmd_str += ' -Command ' + '"' + exec_ + '"'
+				terminal_cmd.extend(['-Command', exec_])
 
 			if shell_after_cmd_exec:
-				terminal_cmd_str += ' -NoExit'
+				terminal_cmd.append('-NoExit')
 
 		else:
 			if keep_open_after_cmd_exec and not shell_after_cmd_exec:
@@ -237,23 +202,30 @@ def terminal(exec_='', background=False, shell_after_cmd_exec=False,
 				exec_ += '; ' + os.getenv('SHELL')
 
 			if desktop_env == 'mac':
-				terminal_cmd_str += ' sh -c {}'.format(shlex.quote(exec_))
+				terminal_cmd.extend(['sh', '-c', exec_])
 
 			else:
-				terminal_cmd_str += ' -e {}'.format(
-					shlex.quote('sh -c {}'.format(shlex.quote(exec_))))
+				# Terminals differ in whether -e takes one argument or
+				# several, a single one works with all of them
+				terminal_cmd.extend(
+					['-e', 'sh -c {}'.format(shlex.quote(exec_))])
 
 	if return_cmd:
-		return terminal_cmd_str
+		return terminal_cmd if argv else system.join_cmd(terminal_cmd)
 
-	terminal_proc = sp.Popen([terminal_cmd_str], shell=True, stdout=sp.PIPE)
+	if desktop_env == 'windows':
+		# Without a shell to "start" it, powershell needs its own console
+		yield processes.call(processes.spawn, terminal_cmd,
+							 background=background,
+							 creationflags=sp.CREATE_NEW_CONSOLE)
 
-	if not background:
-		# Wait for process to complete
-		terminal_proc.wait()
+	else:
+		yield processes.call(processes.spawn, terminal_cmd,
+							 background=background, stdout=processes.DEVNULL)
 
 
-def text_editor(file='', background=False, return_cmd=False):
+@processes.driven
+def text_editor(file='', background=False, return_cmd=False, argv=False):
 	'''Starts the default graphical text editor.
 
 	Start the user's preferred graphical text editor, optionally with a file.
@@ -262,31 +234,36 @@ def text_editor(file='', background=False, return_cmd=False):
 			file	   (str) : The file to be opened with the editor. Defaults to an empty string (i.e. no file).
 			background (bool): Runs the editor in the background, instead of waiting for completion. Defaults to ``False``.
 			return_cmd (bool): Returns the command (str) to run the editor instead of running it. Defaults to ``False``.
+			argv	   (bool): With ``return_cmd``, return the command as a list of arguments instead of a ``str``. Defaults to ``False``.
 
 	Returns:
 			str: Only if ``return_cmd``, the command to run the editor is returned. Else returns nothing.
 	'''
 
-	desktop_env = system.get_name()
+	desktop_env = capabilities.get_capabilities().desktop
 
 	if desktop_env == 'windows':
-		editor_cmd_str = system.get_cmd_out(
-			['ftype', 'textfile']).split('=', 1)[1]
+		editor_cmd_str = (yield processes.call(system.get_cmd_out,
+			['ftype', 'textfile'])).split('=', 1)[1]
 
 	elif desktop_env == 'mac':
-		editor_cmd_str = 'open -a' + system.get_cmd_out(
+		editor_cmd_str = 'open -a' + (yield processes.call(system.get_cmd_out,
 				['def',
 				 'read',
 				 'com.apple.LaunchServices',
 				 'LSHandlers'
 				 '-array'
 				 '{LSHandlerContentType=public.plain-text;}']
-				)
+				))
 
 	else:
 		# Use def handler for MIME-type text/plain
-		editor_cmd_str = system.get_cmd_out(
-			['xdg-mime', 'query', 'default', 'text/plain'])
+		editor_cmd_str = mime.get_default_application('text/plain')
+
+		if editor_cmd_str is None:
+			editor_cmd_str = (yield from system._run_until_success(
+				[['xdg-mime', 'query', 'default', 'text/plain']],
+				check=True)).stdout
 
 		if '\n' in editor_cmd_str:
 			# Sometimes locate returns multiple results
@@ -298,25 +275,19 @@ def text_editor(file='', background=False, return_cmd=False):
 		# We don't use desktopfile.execute() in order to have working
 		# return_cmd and background
 
-		editor_cmd_str = desktopfile.parse(
-			desktopfile.locate(editor_cmd_str)[0])['Exec']
+		editor_cmd = desktopfile.get_exec_args(
+			desktopfile.locate(editor_cmd_str)[0], [file] if file else [])[0]
 
-		for i in editor_cmd_str.split():
-			if i.startswith('%'):
-				# %-style formatters
-				editor_cmd_str = editor_cmd_str.replace(i, '')
+		# Gedit
+		editor_cmd = [arg for arg in editor_cmd if arg != '--new-document']
 
-			if i == '--new-document':
-				# Gedit
-				editor_cmd_str = editor_cmd_str.replace(i, '')
+	else:
+		editor_cmd = shlex.split(editor_cmd_str, posix=os.name != 'nt')
 
-	if file:
-		editor_cmd_str += ' {}'.format(shlex.quote(file))
+		if file:
+			editor_cmd.append(file)
 
 	if return_cmd:
-		return editor_cmd_str
-
-	text_editor_proc = sp.Popen([editor_cmd_str], shell=True)
+		return editor_cmd if argv else system.join_cmd(editor_cmd)
 
-	if not background:
-		text_editor_proc.wait()
+	yield processes.call(processes.spawn, editor_cmd, background=background)
@@ -0,0 +1,263 @@
+# coding: utf-8
+
+# This file is part of libdesktop
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Bharadwaj Raju
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import json
+import time
+import threading
+from collections import namedtuple
+
+from libdesktop import processes
+from libdesktop import system
+
+# Bump whenever the layout of the capabilities file changes
+_CAPABILITIES_VERSION = 1
+
+# Seconds between checks that the capabilities are still current
+_VALIDATE_INTERVAL = 2
+
+# Programs the backends use, if they are installed
+_PROGRAMS = ['feh', 'amixer', 'gsettings', 'xfconf-query']
+
+# Terminals by desktop environment, used if neither x-terminal-emulator nor
+# terminator is installed
+_DESKTOP_TERMINALS = {
+	'gnome': 'gnome-terminal', 'unity': 'gnome-terminal',
+	'cinnamon': 'gnome-terminal', 'gnome2': 'gnome-terminal',
+	'xfce4': 'xfce4-terminal', 'kde': 'konsole', 'trinity': 'konsole',
+	'mate': 'mate-terminal', 'i3': 'i3-sensible-terminal',
+	'pantheon': 'pantheon-terminal', 'enlightenment': 'terminology',
+	'lxde': 'lxterminal', 'lxqt': 'lxterminal',
+}
+
+Capabilities = namedtuple('Capabilities', ['desktop', 'session_type',
+										   'terminal', 'programs',
+										   'pulseaudio'])
+Capabilities.__doc__ = '''The result of :func:`get_capabilities`.
+
+Attributes:
+		desktop	  (str) : The desktop environment or OS, as returned by :func:`libdesktop.system.get_name`.
+		session_type (str) : As in :class:`libdesktop.system.DesktopInfo`.
+		terminal	 (str) : The terminal emulator :func:`libdesktop.applications.terminal` starts, ``None`` if there is none (or on Windows and Mac OS X).
+		programs	 (dict): The path of each of ``feh``, ``amixer``, ``gsettings`` and ``xfconf-query``, ``None`` for those which are not installed.
+		pulseaudio   (bool): Is PulseAudio the sound server?
+'''
+
+_capabilities = None
+_capabilities_lock = threading.Lock()
+
+
+def _get_session_key():
+	try:
+		with open('/proc/sys/kernel/random/boot_id') as f:
+			boot_id = f.read().strip()
+
+	except (IOError, OSError):
+		boot_id = None
+
+	return [os.environ.get('XDG_SESSION_ID'), boot_id]
+
+
+def get_capabilities_file():
+	'''Get the path to the capabilities of the current login session.
+
+	The file is in ``$XDG_RUNTIME_DIR``, which only lives as long as the user is logged in.
+
+	Returns:
+			str: The path to the file (which may not exist yet), or ``None`` if ``$XDG_RUNTIME_DIR`` is not set.
+	'''
+
+	runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+
+	if not runtime_dir:
+		return None
+
+	return os.path.join(runtime_dir, 'libdesktop', 'capabilities-%s.json' %
+						(os.environ.get('XDG_SESSION_ID') or 'none'))
+
+
+def _mtime(path):
+	try:
+		return os.stat(path).st_mtime_ns
+
+	except OSError:
+		return None
+
+
+def _get_fingerprint(environ):
+	# Everything the capabilities depend on. The PATH directories change when
+	# programs are installed, and PulseAudio writes its pid file into
+	# $XDG_RUNTIME_DIR/pulse when it starts and removes it when it exits.
+	paths = [path for path in os.environ.get('PATH', '').split(os.pathsep)
+			 if path]
+
+	if os.environ.get('XDG_RUNTIME_DIR'):
+		paths.append(os.path.join(os.environ['XDG_RUNTIME_DIR'], 'pulse'))
+
+	return {'session': _get_session_key(), 'environ': environ,
+			'mtimes': [[path, _mtime(path)] for path in paths]}
+
+
+def _get_environ():
+	return [os.environ.get(name) for name in
+			system._DETECTION_ENVIRON + ['PATH', 'PATHEXT', 'TERMINAL']]
+
+
+def _find_terminal(desktop):
+	if desktop in ['windows', 'mac']:
+		return None
+
+	if os.environ.get('TERMINAL'):
+		# Not everywhere, but if user *really* has a preference, they will
+		# set this
+		return os.environ['TERMINAL']
+
+	# x-terminal-emulator is a convenience script that launches terminal
+	# based on user preferences. This is not available on some distros (but
+	# most have it) so try this first
+	for terminal in ['x-terminal-emulator', 'terminator']:
+		if system.is_in_path(terminal):
+			return terminal
+
+	if desktop in _DESKTOP_TERMINALS:
+		return _DESKTOP_TERMINALS[desktop]
+
+	for terminal in ['gnome-terminal', 'urxvt', 'rxvt', 'xterm']:
+		if system.is_in_path(terminal):
+			return terminal
+
+	return None
+
+
+def _probe():
+	info = system.get_desktop_info()
+
+	if info.name in ['windows', 'mac']:
+		pulseaudio = False
+	else:
+		pulseaudio = bool(processes.find_processes('pulseaudio'))
+
+	return Capabilities(info.name, info.session_type,
+						_find_terminal(info.name),
+						dict((program, system.which(program))
+							 for program in _PROGRAMS),
+						pulseaudio)
+
+
+def _load(path, fingerprint):
+	try:
+		with open(path) as f:
+			saved = json.load(f)
+
+	except (IOError, OSError, ValueError):
+		return None
+
+	if (not isinstance(saved, dict)
+			or saved.get('version') != _CAPABILITIES_VERSION
+			or saved.get('fingerprint') != fingerprint):
+		return None
+
+	try:
+		return Capabilities(**saved['capabilities'])
+	except (KeyError, TypeError):
+		return None
+
+
+def _save(path, fingerprint, capabilities):
+	temp_file = '%s.%d.tmp' % (path, os.getpid())
+
+	try:
+		if not os.path.isdir(os.path.dirname(path)):
+			os.makedirs(os.path.dirname(path), 0o700)
+
+		with open(temp_file, 'w') as f:
+			json.dump({'version': _CAPABILITIES_VERSION,
+					   'fingerprint': fingerprint,
+					   'capabilities': capabilities._asdict()}, f)
+
+		os.replace(temp_file, path)
+
+	except (IOError, OSError):
+		# Only a cache, the next process will probe again
+		try:
+			os.remove(temp_file)
+		except OSError:
+			pass
+
+
+def get_capabilities(refresh=False):
+	'''Get what the current login session can do.
+
+	Finds the desktop environment, the terminal emulator, the programs the backends use and whether
+	PulseAudio runs, once per login session: the result is saved in :func:`get_capabilities_file`,
+	keyed by ``$XDG_SESSION_ID`` and the boot ID, so that other processes in the same session do not
+	have to find them again. It is used again for as long as the relevant environment variables, the
+	``PATH`` directories and PulseAudio's runtime directory do not change.
+
+	Args:
+			refresh (bool): Find everything again, ignoring anything saved. Defaults to ``False``.
+
+	Returns:
+			Capabilities: What the session can do.
+	'''
+
+	global _capabilities
+
+	environ = _get_environ()
+	cached = _capabilities
+
+	if (not refresh and cached is not None and cached[0] == environ
+			and time.monotonic() - cached[1] < _VALIDATE_INTERVAL):
+		return cached[3]
+
+	with _capabilities_lock:
+		fingerprint = _get_fingerprint(environ)
+
+		if (not refresh and _capabilities is not None
+				and _capabilities[2] == fingerprint):
+			_capabilities = (environ, time.monotonic(), fingerprint,
+							 _capabilities[3])
+			return _capabilities[3]
+
+		path = get_capabilities_file()
+		capabilities = None
+
+		if path is not None and not refresh:
+			capabilities = _load(path, fingerprint)
+
+		if capabilities is None:
+			# system only checks the PATH directories every few seconds
+			system.refresh()
+			capabilities = _probe()
+
+			if path is not None:
+				_save(path, fingerprint, capabilities)
+
+		_capabilities = (environ, time.monotonic(), fingerprint, capabilities)
+
+		return capabilities
@@ -0,0 +1,1265 @@
+# coding: utf-8
+
+# This file is part of libdesktop
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Bharadwaj Raju
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import json
+import mmap
+import zlib
+import heapq
+import itertools
+import bisect
+import select
+import struct
+import threading
+import traceback
+
+from libdesktop import desktopfile
+from libdesktop import directories
+from libdesktop import inotify
+
+# Bump whenever the layout of the on-disk index changes
+_INDEX_VERSION = 3
+_SNAPSHOT_VERSION = 1
+
+_SNAPSHOT_MAGIC = b'LDCATLG\0'
+_SNAPSHOT_HEADER = struct.Struct('<8s13I')
+_SNAPSHOT_MTIME = struct.Struct('<Iq')
+_SNAPSHOT_KEY = struct.Struct('<IIIII')
+_U32 = struct.Struct('<I')
+_NONE = 0xffffffff
+
+# The string fields of each record in the snapshot, in order
+_SNAPSHOT_FIELDS = ['id', 'file', 'path', 'name', 'exec', 'localized_name',
+					'generic_name', 'keywords']
+_SNAPSHOT_RECORD = struct.Struct('<' + 'I' * len(_SNAPSHOT_FIELDS))
+
+_catalog = None
+# Held while a CatalogWatcher changes a catalog, and while reading one
+_catalog_lock = threading.RLock()
+
+_snapshot = None
+
+# Numbers every published version of a catalog and every snapshot, unlike
+# ids these are never reused, so caches built from one can tell it changed
+_versions = itertools.count()
+
+
+def get_application_dirs():
+	'''Get the directories searched for .desktop files.
+
+	Get the ``applications`` subdirectory of ``$XDG_DATA_HOME`` and of every ``$XDG_DATA_DIRS`` entry
+	(see :func:`libdesktop.directories.get_data_dirs`), highest priority first. This covers
+	``/usr/local/share``, Flatpak and Snap exports etc.
+
+	Returns:
+			list: A list of paths.
+	'''
+
+	return [os.path.join(data_dir, 'applications')
+			for data_dir in directories.get_data_dirs()]
+
+
+def get_index_file():
+	'''Get the path to the on-disk application index.
+
+	Returns:
+			str: The path to the index file (which may not exist yet).
+	'''
+
+	return os.path.join(directories.get_cache_dir('libdesktop'),
+						'applications-index.json')
+
+
+def get_snapshot_file():
+	'''Get the path to the binary snapshot of the application catalog.
+
+	Returns:
+			str: The path to the snapshot file (which may not exist yet), see :class:`Snapshot`.
+	'''
+
+	return os.path.join(directories.get_cache_dir('libdesktop'),
+						'applications-index.bin')
+
+
+def _dir_mtime(path):
+	try:
+		return os.stat(path).st_mtime_ns
+
+	except OSError:
+		return None
+
+
+def _make_record(path, desktop_id, parsed):
+	record = {
+		'id': desktop_id,
+		'file': os.path.basename(path),
+		'path': path,
+		'name': None,
+		'exec': None,
+		'localized_name': None,
+		'generic_name': None,
+		'keywords': []
+	}
+
+	# Unreadable entries (parsed is an exception) are still indexed by ID
+	if isinstance(parsed, desktopfile.DesktopEntry):
+		exec_ = parsed.get('Exec')
+		keywords = parsed.get_localized('Keywords')
+
+		record.update({
+			'name': parsed.get('Name'),
+			'exec': exec_.split(' ')[0] if exec_ else None,
+			'localized_name': parsed.get_localized('Name'),
+			'generic_name': parsed.get_localized('GenericName'),
+			'keywords': [keyword for keyword in (keywords or '').split(';')
+						 if keyword]
+		})
+
+	return record
+
+
+def _walk(directory, prefix, mtimes, found, visited=None):
+	# visited holds the (device, inode) of the directories being walked, so
+	# that a symbolic link to one of them (like "loop -> .") is not followed
+	# round and round
+	try:
+		info = os.stat(directory)
+	except OSError:
+		return
+
+	if visited is None:
+		visited = set()
+
+	if (info.st_dev, info.st_ino) in visited:
+		return
+
+	visited.add((info.st_dev, info.st_ino))
+	mtimes[directory] = _dir_mtime(directory)
+
+	try:
+		scanner = os.scandir(directory)
+	except OSError:
+		return
+
+	try:
+		dir_entries = sorted(scanner, key=lambda entry: entry.name)
+	finally:
+		scanner.close()
+
+	for entry in dir_entries:
+		try:
+			is_dir = entry.is_dir()
+			is_file = not is_dir and entry.is_file()
+		except OSError:
+			continue
+
+		if is_dir:
+			# Example: kde4/foo.desktop → kde4-foo.desktop
+			_walk(entry.path, prefix + entry.name + '-', mtimes, found,
+				  visited)
+
+		elif entry.name.endswith('.desktop') and is_file:
+			found.append((entry.path, prefix + entry.name))
+
+
+def _make_records(found):
+	parsed = desktopfile.parse_many([file_path for file_path, _ in found])
+
+	return [_make_record(file_path, desktop_id, entry)
+			for (file_path, desktop_id), entry in zip(found, parsed)]
+
+
+def _scan_dir(path):
+	'''Parse every .desktop file under a single application directory.'''
+
+	mtimes = {}
+	found = []
+
+	_walk(path, '', mtimes, found)
+
+	return {'mtimes': mtimes, 'entries': _make_records(found)}
+
+
+def _is_current(scanned):
+	return all(_dir_mtime(directory) == mtime
+			   for directory, mtime in scanned['mtimes'].items())
+
+
+class Catalog(object):
+	'''An index of the installed applications.
+
+	Maps desktop IDs, application names and executables to the .desktop files
+	they belong to, so that lookups do not need to touch the disk.
+
+	When the same desktop ID exists in several application directories, only the one
+	in the directory with the highest priority is used, as required by the
+	`Desktop Entry Specification <https://specifications.freedesktop.org/desktop-entry-spec/latest/ar01s02.html>`_.
+
+	Args:
+			dirs   (dict): Maps each application directory to its scanned contents (see :func:`get_catalog`).
+			order  (list): The application directories, highest priority first.
+			locale (str) : The locale the localized keys were read for.
+
+	Attributes:
+			entries (dict): Maps each desktop ID (for example ``kde4-konsole.desktop``) to a dict with the
+							``id``, ``file``, ``path``, ``name``, ``exec`` (binary), ``localized_name``,
+							``generic_name`` and ``keywords`` of the entry.
+	'''
+
+	def __init__(self, dirs, order, locale=None):
+		self.dirs = dirs
+		self.order = order
+		self.locale = locale
+
+		# Changed in place by a CatalogWatcher (under _catalog_lock), and
+		# copied to entries once a batch of changes is complete
+		self._entries = {}
+		self.entries = {}
+
+		# Bumped on every change, so that search sessions know to start over
+		self.generation = 0
+
+		# Built on the first search
+		self._trigrams = None
+		self._search_fields = {}
+		self._sorted_names = None
+
+		self._dir_entries = {}
+		self._rank = {}
+		self._by_file = {}
+		self._by_token = {}
+		self._by_name = {}
+		self._by_exec = {}
+
+		for dir_index, path in enumerate(order):
+			self._dir_entries[path] = dict(
+				(record['id'], record) for record in dirs[path]['entries'])
+
+			for record in dirs[path]['entries']:
+				if record['id'] not in self._entries:
+					self._add(record, dir_index)
+
+		self._publish()
+
+	def _publish(self):
+		# Readers of entries never see a batch of changes half done
+		self.entries = dict(self._entries)
+		self._version = next(_versions)
+
+	def _keys(self, record):
+		yield self._by_file, record['id']
+
+		if record['file'] != record['id']:
+			yield self._by_file, record['file']
+
+		# Example: org.gnome.gedit.desktop → org, gnome, gedit
+		for token in record['id'][:-len('.desktop')].split('.'):
+			yield self._by_token, token
+
+		if record['name']:
+			yield self._by_name, record['name'].lower()
+
+		if record['exec']:
+			yield self._by_exec, record['exec'].lower()
+			yield self._by_exec, os.path.basename(record['exec']).lower()
+
+	def _add(self, record, dir_index):
+		self._entries[record['id']] = record
+		self._rank[record['id']] = (dir_index, record['id'])
+		self.generation += 1
+		self._sorted_names = None
+
+		for table, key in self._keys(record):
+			if key:
+				table.setdefault(key, set()).add(record['id'])
+
+		if self._trigrams is not None:
+			self._index_trigrams(record)
+
+	def _remove(self, desktop_id):
+		record = self._entries.pop(desktop_id)
+		del self._rank[desktop_id]
+		self.generation += 1
+		self._sorted_names = None
+
+		if self._trigrams is not None:
+			for trigram in self._search_fields.pop(desktop_id)[-1]:
+				ids = self._trigrams[trigram]
+				ids.discard(desktop_id)
+
+				if not ids:
+					del self._trigrams[trigram]
+
+		for table, key in self._keys(record):
+			ids = table.get(key)
+
+			if ids is not None:
+				ids.discard(desktop_id)
+
+				if not ids:
+					del table[key]
+
+	def _update(self, path, desktop_id, record):
+		'''Set (or remove, if ``record`` is ``None``) an entry of one application directory.
+
+		``dirs`` is brought up to date by :meth:`_sync_dir`, once per batch of updates.
+
+		Returns:
+				tuple: ``('added', record)``, ``('changed', record)`` or ``('removed', old_record)`` if the visible entry for the ID changed, else ``None``.
+		'''
+
+		dir_entries = self._dir_entries[path]
+
+		if record is None:
+			dir_entries.pop(desktop_id, None)
+		else:
+			dir_entries[desktop_id] = record
+
+		old = self._entries.get(desktop_id)
+		new = None
+
+		for dir_index, other_path in enumerate(self.order):
+			if desktop_id in self._dir_entries[other_path]:
+				new = (self._dir_entries[other_path][desktop_id], dir_index)
+				break
+
+		if old is not None:
+			self._remove(desktop_id)
+
+		if new is not None:
+			self._add(*new)
+
+		if old is None and new is None:
+			return None
+		elif old is None:
+			return 'added', new[0]
+		elif new is None:
+			return 'removed', old
+		elif old != new[0]:
+			return 'changed', new[0]
+
+		return None
+
+	def _sync_dir(self, path):
+		self.dirs[path]['entries'] = sorted(
+			self._dir_entries[path].values(), key=lambda record: record['id'])
+
+		for directory in list(self.dirs[path]['mtimes']):
+			self.dirs[path]['mtimes'][directory] = _dir_mtime(directory)
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __contains__(self, desktop_id):
+		return desktop_id in self.entries
+
+	def get(self, desktop_id):
+		'''Get an entry by its desktop ID.
+
+		Args:
+				desktop_id (str): The desktop ID, for example ``org.gnome.gedit.desktop``.
+
+		Returns:
+				dict: The entry (see :attr:`entries`), or ``None`` if it is not installed.
+		'''
+
+		return self.entries.get(desktop_id)
+
+	def locate(self, desktop_filename_or_name):
+		'''Find .desktop files by filename or application name.
+
+		Args:
+				desktop_filename_or_name (str): Either the desktop ID or filename of a .desktop file, a component of it, the name of an application or its executable.
+
+		Returns:
+				list: A list of all matching .desktop files, highest priority first.
+		'''
+
+		key = desktop_filename_or_name.lower()
+
+		found = set()
+
+		# The catalog may be updated by a CatalogWatcher meanwhile
+		with _catalog_lock:
+			for table, table_key in ((self._by_file, desktop_filename_or_name),
+									 (self._by_token, desktop_filename_or_name),
+									 (self._by_name, key),
+									 (self._by_exec, key)):
+				found.update(table.get(table_key, ()))
+
+			return [self._entries[i]['path']
+					for i in sorted(found, key=self._rank.__getitem__)]
+
+	def _index_trigrams(self, record):
+		name = _normalize(record['localized_name'] or record['name'] or '')
+		generic_name = _normalize(record['generic_name'] or '')
+		keywords = _normalize(' '.join(record['keywords']))
+		exec_ = _normalize(os.path.basename(record['exec'] or ''))
+
+		trigrams = set(_trigrams(' '.join([name, generic_name, keywords, exec_])))
+
+		self._search_fields[record['id']] = (name, generic_name, keywords,
+											 exec_, trigrams)
+
+		for trigram in trigrams:
+			self._trigrams.setdefault(trigram, set()).add(record['id'])
+
+	def _get_trigrams(self):
+		if self._trigrams is None:
+			self._trigrams = {}
+
+			for record in self._entries.values():
+				self._index_trigrams(record)
+
+		return self._trigrams
+
+	def _get_sorted_names(self):
+		if self._sorted_names is None:
+			self._get_trigrams()
+			self._sorted_names = sorted(
+				(fields[0], desktop_id)
+				for desktop_id, fields in self._search_fields.items())
+
+		return self._sorted_names
+
+	def search(self, query, limit=10):
+		'''Search the applications.
+
+		See :func:`libdesktop.desktopfile.search`. For type-ahead, a :class:`SearchSession` is cheaper.
+
+		Args:
+				query (str): What to search for.
+				limit (int): The maximum number of results. Defaults to ``10``.
+
+		Returns:
+				list: The best matching entries (see :attr:`entries`), best first.
+		'''
+
+		return SearchSession(self).search(query, limit)
+
+
+def _normalize(text):
+	return ' '.join(text.lower().split())
+
+
+def _trigrams(text):
+	# Words are padded in front, so that short queries match word starts:
+	# "fi" → "  f", " fi"
+	for word in text.split():
+		padded = '  ' + word
+
+		for i in range(len(padded) - 2):
+			yield padded[i:i + 3]
+
+
+class SearchSession(object):
+	'''Search the applications as the query is typed.
+
+	When the new query extends the previous one, only the trigrams of the added characters
+	are looked up, so every keystroke costs about as much as one trigram lookup.
+
+	Args:
+			catalog (Catalog): The catalog to search. Defaults to the one from :func:`get_catalog`.
+	'''
+
+	def __init__(self, catalog=None):
+		self.catalog = catalog or get_catalog()
+
+		self._generation = None
+		self._trigrams = []
+		self._hits = {}
+
+	def search(self, query, limit=10):
+		'''Search for a query.
+
+		Args:
+				query (str): What to search for.
+				limit (int): The maximum number of results. Defaults to ``10``.
+
+		Returns:
+				list: The best matching entries (see :attr:`Catalog.entries`), best first.
+		'''
+
+		query = _normalize(query)
+		trigrams = list(_trigrams(query))
+
+		# The catalog may be updated by a CatalogWatcher meanwhile
+		with _catalog_lock:
+			index = self.catalog._get_trigrams()
+
+			if (self._generation != self.catalog.generation or
+					trigrams[:len(self._trigrams)] != self._trigrams):
+				self._generation = self.catalog.generation
+				self._trigrams = []
+				self._hits = {}
+
+			hits = self._hits
+
+			for trigram in trigrams[len(self._trigrams):]:
+				for desktop_id in index.get(trigram, ()):
+					hits[desktop_id] = hits.get(desktop_id, 0) + 1
+
+			self._trigrams = trigrams
+
+			if not trigrams:
+				return []
+
+			# Fuzzy: allow about a third of the trigrams to be missing
+			threshold = max(1, len(trigrams) - len(trigrams) // 3)
+
+			if len(hits) > limit * 20:
+				# Short queries match a lot of entries. If enough names start
+				# with the query, nothing else can rank above them
+				names = self.catalog._get_sorted_names()
+				start = bisect.bisect_left(names, (query,))
+				end = bisect.bisect_left(names, (query + '\uffff',))
+
+				if end - start >= limit:
+					hits = dict((desktop_id, hits.get(desktop_id, 0))
+								for _, desktop_id in names[start:end])
+
+			by_hits = {}
+
+			for desktop_id, count in hits.items():
+				if count >= threshold:
+					by_hits.setdefault(count, []).append(desktop_id)
+
+			ranked = []
+
+			# Candidates with the most trigrams in common come first, stop
+			# ranking once there are enough
+			for count in sorted(by_hits, reverse=True):
+				for desktop_id in by_hits[count]:
+					tier, length, name = self._rank(query, desktop_id)
+					ranked.append((tier, -count, length, name, desktop_id))
+
+				if len(ranked) >= limit:
+					break
+
+			return [self.catalog._entries[result[-1]]
+					for result in heapq.nsmallest(limit, ranked)]
+
+	def _rank(self, query, desktop_id):
+		name, generic_name, keywords, exec_, _ = \
+			self.catalog._search_fields[desktop_id]
+
+		if name == query:
+			tier = 0
+		elif name.startswith(query):
+			tier = 1
+		elif (' ' + name).find(' ' + query) != -1:
+			tier = 2
+		elif query in name:
+			tier = 3
+		elif query in generic_name or query in keywords:
+			tier = 4
+		elif query in exec_:
+			tier = 5
+		else:
+			tier = 6
+
+		return tier, len(name), name
+
+
+def _load_index(locale):
+	try:
+		with open(get_index_file()) as f:
+			index = json.load(f)
+
+	except (IOError, OSError, ValueError):
+		return {}
+
+	if (not isinstance(index, dict) or index.get('version') != _INDEX_VERSION
+			or index.get('locale') != locale):
+		return {}
+
+	return index.get('dirs', {})
+
+
+def _save_index(catalog):
+	_write_atomically(get_index_file(), json.dumps(
+		{'version': _INDEX_VERSION, 'locale': catalog.locale,
+		 'dirs': catalog.dirs}).encode('utf-8'))
+
+	_write_atomically(get_snapshot_file(), _build_snapshot(catalog))
+
+
+def _write_atomically(path, data):
+	temp_file = '%s.%d.tmp' % (path, os.getpid())
+
+	try:
+		if not os.path.isdir(os.path.dirname(path)):
+			os.makedirs(os.path.dirname(path))
+
+		with open(temp_file, 'wb') as f:
+			f.write(data)
+
+		os.replace(temp_file, path)
+
+	except (IOError, OSError):
+		# The index is only a cache, not being able to save it is fine
+		try:
+			os.remove(temp_file)
+		except OSError:
+			pass
+
+
+def get_catalog(refresh=False):
+	'''Get the catalog of installed applications.
+
+	Gets a :class:`Catalog` of the .desktop files in :func:`get_application_dirs`, built by
+	walking each directory once.
+
+	The catalog is persisted (see :func:`get_index_file`) and checked against the
+	modification times of the application directories on every call, so that only
+	directories which changed since it was built are parsed again.
+
+	Args:
+			refresh (bool): Rebuild the whole catalog, ignoring anything cached. Defaults to ``False``.
+
+	Returns:
+			Catalog: The application catalog.
+	'''
+
+	global _catalog
+
+	with _catalog_lock:
+		order = get_application_dirs()
+		locale = desktopfile.get_locale()
+
+		if (not refresh and _catalog is not None and _catalog.order == order
+				and _catalog.locale == locale
+				and all(_is_current(_catalog.dirs[path]) for path in order)):
+			return _catalog
+
+		if refresh:
+			cached = {}
+		elif _catalog is not None and _catalog.locale == locale:
+			cached = _catalog.dirs
+		else:
+			cached = _load_index(locale)
+
+		dirs = {}
+		changed = False
+
+		for path in order:
+			if path in cached and _is_current(cached[path]):
+				dirs[path] = cached[path]
+
+			else:
+				dirs[path] = _scan_dir(path)
+				changed = True
+
+		_catalog = Catalog(dirs, order, locale)
+
+		if (changed or set(cached) != set(order) or
+				not os.path.isfile(get_snapshot_file())):
+			_save_index(_catalog)
+
+		return _catalog
+
+
+def _build_snapshot(catalog):
+	strings = bytearray()
+	string_offsets = {}
+
+	def add_string(value):
+		if value is None:
+			return _NONE
+
+		offset = string_offsets.get(value)
+
+		if offset is None:
+			offset = string_offsets[value] = len(strings)
+			strings.extend(value.encode('utf-8', 'surrogateescape') + b'\0')
+
+		return offset
+
+	records = sorted(catalog._entries.values(),
+					 key=lambda record: catalog._rank[record['id']])
+
+	# The same keys as the lookup tables of the catalog, prefixed by table
+	keys = {}
+
+	prefixes = {id(catalog._by_file): 'f:', id(catalog._by_token): 't:',
+				id(catalog._by_name): 'n:', id(catalog._by_exec): 'x:'}
+
+	for index, record in enumerate(records):
+		keys.setdefault('i:' + record['id'], []).append(index)
+
+		for table, key in catalog._keys(record):
+			if key:
+				postings = keys.setdefault(prefixes[id(table)] + key, [])
+
+				if not postings or postings[-1] != index:
+					postings.append(index)
+
+	mtimes = [(path, mtime) for top in catalog.order
+			  for path, mtime in sorted(catalog.dirs[top]['mtimes'].items())]
+
+	packed_dirs = b''.join(_U32.pack(add_string(path))
+						   for path in catalog.order)
+	packed_mtimes = b''.join(
+		_SNAPSHOT_MTIME.pack(add_string(path), -1 if mtime is None else mtime)
+		for path, mtime in mtimes)
+	packed_records = b''.join(
+		_SNAPSHOT_RECORD.pack(*[add_string(';'.join(record[field])
+										   if field == 'keywords' else record[field])
+								for field in _SNAPSHOT_FIELDS])
+		for record in records)
+
+	# A chained hash table: buckets point at the first key of their chain
+	bucket_count = max(1, len(keys))
+	buckets = [_NONE] * bucket_count
+	key_entries = []
+	postings = bytearray()
+
+	for key in sorted(keys):
+		encoded = key.encode('utf-8', 'surrogateescape')
+		key_hash = zlib.crc32(encoded) & 0xffffffff
+		bucket = key_hash % bucket_count
+
+		key_entries.append([add_string(key), buckets[bucket], len(postings),
+							len(keys[key]), key_hash])
+		buckets[bucket] = len(key_entries) - 1
+
+		postings.extend(b''.join(_U32.pack(index) for index in keys[key]))
+
+	locale_offset = add_string(catalog.locale)
+
+	packed_buckets = b''.join(_U32.pack(bucket) for bucket in buckets)
+	packed_keys = b''.join(_SNAPSHOT_KEY.pack(*entry) for entry in key_entries)
+
+	sections = [packed_dirs, packed_mtimes, packed_records, packed_buckets,
+				packed_keys, bytes(postings), bytes(strings)]
+	offsets = []
+	offset = _SNAPSHOT_HEADER.size
+
+	for data in sections:
+		offsets.append(offset)
+		offset += len(data)
+
+	dirs_offset, mtimes_offset, records_offset, buckets_offset, \
+		keys_offset, postings_offset, strings_offset = offsets
+
+	header = _SNAPSHOT_HEADER.pack(
+		_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, locale_offset,
+		len(catalog.order), dirs_offset, len(mtimes), mtimes_offset,
+		len(records), records_offset, bucket_count, buckets_offset,
+		keys_offset, postings_offset, strings_offset)
+
+	return b''.join([header] + sections)
+
+
+class Snapshot(object):
+	'''A memory-mapped binary snapshot of the application catalog.
+
+	Written next to the index (see :func:`get_snapshot_file`) whenever the catalog is saved,
+	so that short-lived processes can look up an application without loading the whole catalog:
+	only the parts of the file needed for a lookup are read.
+
+	The snapshot holds a string table, fixed-width records (one per visible entry, highest priority first)
+	and a hash table mapping every lookup key to its records.
+
+	Args:
+			path (str): The path to the snapshot file.
+
+	Attributes:
+			order  (list): The application directories the snapshot was made from, highest priority first.
+			locale (str) : The locale the localized keys were read for.
+
+	Raises:
+			ValueError: If the file is not a snapshot (of this version).
+	'''
+
+	def __init__(self, path):
+		with open(path, 'rb') as f:
+			self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+		try:
+			(magic, version, locale_offset, dir_count, dirs_offset,
+			 self._mtime_count, self._mtimes_offset, self._record_count,
+			 self._records_offset, self._bucket_count, self._buckets_offset,
+			 self._keys_offset, self._postings_offset,
+			 self._strings_offset) = _SNAPSHOT_HEADER.unpack_from(self._map, 0)
+
+			if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION:
+				raise ValueError('Not a catalog snapshot: %s' % path)
+
+			self.locale = self._string(locale_offset)
+			self.order = [self._string(_U32.unpack_from(
+				self._map, dirs_offset + 4 * i)[0]) for i in range(dir_count)]
+			self._version = next(_versions)
+
+		except (struct.error, UnicodeDecodeError):
+			self._map.close()
+			raise ValueError('Truncated catalog snapshot: %s' % path)
+
+		except ValueError:
+			self._map.close()
+			raise
+
+	def __len__(self):
+		return self._record_count
+
+	def __contains__(self, desktop_id):
+		return bool(self._postings('i:' + desktop_id))
+
+	def _string(self, offset):
+		if offset == _NONE:
+			return None
+
+		start = self._strings_offset + offset
+
+		return self._map[start:self._map.find(b'\0', start)].decode(
+			'utf-8', 'surrogateescape')
+
+	def is_current(self, order, locale):
+		'''Check if the snapshot is up to date.
+
+		Args:
+				order  (list): The application directories, highest priority first (see :func:`get_application_dirs`).
+				locale (str) : The current locale.
+
+		Returns:
+				bool: Whether the snapshot was made from the same directories, as they are now, and for the same locale.
+		'''
+
+		if self.order != order or self.locale != locale:
+			return False
+
+		for i in range(self._mtime_count):
+			path_offset, mtime = _SNAPSHOT_MTIME.unpack_from(
+				self._map, self._mtimes_offset + i * _SNAPSHOT_MTIME.size)
+
+			if _dir_mtime(self._string(path_offset)) != (
+					None if mtime == -1 else mtime):
+				return False
+
+		return True
+
+	def _postings(self, key):
+		encoded = key.encode('utf-8', 'surrogateescape')
+		key_hash = zlib.crc32(encoded) & 0xffffffff
+
+		index = _U32.unpack_from(self._map, self._buckets_offset + 4 * (
+			key_hash % self._bucket_count))[0]
+
+		while index != _NONE:
+			key_offset, next_index, postings, count, entry_hash = \
+				_SNAPSHOT_KEY.unpack_from(
+					self._map, self._keys_offset + index * _SNAPSHOT_KEY.size)
+
+			start = self._strings_offset + key_offset
+
+			if (entry_hash == key_hash and self._map[
+					start:start + len(encoded) + 1] == encoded + b'\0'):
+				start = self._postings_offset + postings
+
+				return struct.unpack_from('<%dI' % count, self._map, start)
+
+			index = next_index
+
+		return ()
+
+	def _record(self, index):
+		offsets = _SNAPSHOT_RECORD.unpack_from(
+			self._map, self._records_offset + index * _SNAPSHOT_RECORD.size)
+
+		record = dict(zip(_SNAPSHOT_FIELDS,
+						  [self._string(offset) for offset in offsets]))
+		record['keywords'] = [keyword for keyword in
+							  (record['keywords'] or '').split(';') if keyword]
+
+		return record
+
+	def get(self, desktop_id):
+		'''Get an entry by its desktop ID.
+
+		Args:
+				desktop_id (str): The desktop ID, for example ``org.gnome.gedit.desktop``.
+
+		Returns:
+				dict: The entry (see :attr:`Catalog.entries`), or ``None`` if it is not installed.
+		'''
+
+		for index in self._postings('i:' + desktop_id):
+			return self._record(index)
+
+		return None
+
+	def locate(self, desktop_filename_or_name):
+		'''Find .desktop files by filename or application name, like :meth:`Catalog.locate`.'''
+
+		key = desktop_filename_or_name.lower()
+
+		found = set()
+
+		for table_key in ['f:' + desktop_filename_or_name,
+						  't:' + desktop_filename_or_name,
+						  'n:' + key, 'x:' + key]:
+			found.update(self._postings(table_key))
+
+		# Records are stored highest priority first
+		return [self._string(_SNAPSHOT_RECORD.unpack_from(
+			self._map, self._records_offset + index * _SNAPSHOT_RECORD.size)[2])
+			for index in sorted(found)]
+
+	def close(self):
+		self._map.close()
+
+
+def _get_snapshot(order, locale):
+	global _snapshot
+
+	if _snapshot is not None and _snapshot.is_current(order, locale):
+		return _snapshot
+
+	# Another process may have written a newer one meanwhile
+	try:
+		snapshot = Snapshot(get_snapshot_file())
+	except (IOError, OSError, ValueError):
+		return None
+
+	if not snapshot.is_current(order, locale):
+		snapshot.close()
+		return None
+
+	# The old one may still be in use by other threads, it is closed once
+	# the last of them lets go of it
+	_snapshot = snapshot
+
+	return snapshot
+
+
+def get_installed():
+	'''Get the installed applications, as cheaply as possible.
+
+	Returns the catalog if this process already loaded it (see :func:`get_catalog`), otherwise an up to date :class:`Snapshot`
+	if there is one. Either way, the result is current.
+
+	Returns:
+			Catalog: The catalog or a :class:`Snapshot`. Both support ``in``, ``get()`` and ``locate()``.
+	'''
+
+	with _catalog_lock:
+		if _catalog is None:
+			snapshot = _get_snapshot(get_application_dirs(),
+									 desktopfile.get_locale())
+
+			if snapshot is not None:
+				return snapshot
+
+	return get_catalog()
+
+
+def _is_empty(path):
+	try:
+		return os.stat(path).st_size == 0
+	except OSError:
+		return True
+
+
+class CatalogWatcher(object):
+	'''Keeps a :class:`Catalog` up to date with inotify.
+
+	Watches the application directories and applies additions, modifications and removals
+	of .desktop files to the catalog as they happen, parsing only the files that changed.
+	Events can be handled in a background thread (:meth:`start`) or by calling :meth:`process_events`.
+
+	Note:
+			Only available on Linux. Application directories which do not exist yet are not watched.
+
+	Args:
+			catalog (Catalog): The catalog to keep up to date. Defaults to the one from :func:`get_catalog`.
+
+	Raises:
+			OSError: if inotify is not available.
+	'''
+
+	_DIR_MASK = (inotify.IN_CLOSE_WRITE | inotify.IN_CREATE | inotify.IN_DELETE |
+				 inotify.IN_MOVED_FROM | inotify.IN_MOVED_TO | inotify.IN_ONLYDIR |
+				 inotify.IN_EXCL_UNLINK)
+
+	def __init__(self, catalog=None):
+		self.catalog = catalog or get_catalog()
+
+		self._inotify = inotify.Inotify()
+		self._watches = {}
+		self._subscribers = []
+		self._thread = None
+		self._stop_pipe = None
+
+		for top in self.catalog.order:
+			for directory in sorted(self.catalog.dirs[top]['mtimes']):
+				self._watch(top, directory)
+
+	def _watch(self, top, directory):
+		if not os.path.isdir(directory):
+			return
+
+		relative = os.path.relpath(directory, top)
+		prefix = '' if relative == '.' else relative.replace(os.sep, '-') + '-'
+
+		try:
+			wd = self._inotify.add_watch(directory, self._DIR_MASK)
+		except OSError:
+			return
+
+		self._watches[wd] = (top, directory, prefix)
+
+	def subscribe(self, callback):
+		'''Get notified of changes to the catalog.
+
+		Args:
+				callback (callable): Called with the change (``'added'``, ``'changed'`` or ``'removed'``),
+									 the desktop ID and the new entry (the old one for ``'removed'``).
+									 Runs in the thread which processes the events.
+		'''
+
+		self._subscribers.append(callback)
+
+	def unsubscribe(self, callback):
+		'''Stop notifying a callback registered with :meth:`subscribe`.'''
+
+		self._subscribers.remove(callback)
+
+	def process_events(self, timeout=0):
+		'''Apply pending changes to the catalog.
+
+		Args:
+				timeout (float): Seconds to wait for changes. Defaults to ``0`` (do not wait). ``None`` waits forever.
+
+		Returns:
+				list: The changes applied, as ``(change, desktop_id, entry)`` tuples (see :meth:`subscribe`).
+		'''
+
+		events = self._inotify.read_events(timeout)
+
+		if not events:
+			return []
+
+		# Every affected file is parsed once per batch, however many events it got
+		touched = {}
+		new_dirs = []
+		removed_dirs = []
+		overflow = False
+
+		for event in events:
+			if event.mask & inotify.IN_Q_OVERFLOW:
+				overflow = True
+				continue
+
+			watch = self._watches.get(event.wd)
+
+			if watch is None:
+				continue
+
+			if event.mask & inotify.IN_IGNORED:
+				del self._watches[event.wd]
+				continue
+
+			top, directory, prefix = watch
+			path = os.path.join(directory, event.name)
+
+			if event.mask & inotify.IN_ISDIR:
+				if event.mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO):
+					new_dirs.append((top, path, prefix + event.name + '-'))
+				elif event.mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+					removed_dirs.append((top, path))
+
+			elif event.name.endswith('.desktop'):
+				if (event.mask & inotify.IN_CREATE and
+						not os.path.islink(path) and _is_empty(path)):
+					# The file is still being written, IN_CLOSE_WRITE follows.
+					# A hard link gets no other event.
+					continue
+
+				touched[(top, path)] = prefix + event.name
+
+		with _catalog_lock:
+			if overflow:
+				changes = self._resync()
+
+			else:
+				changes = self._apply(touched, new_dirs, removed_dirs)
+
+			self.catalog._publish()
+			_save_index(self.catalog)
+
+		for change in changes:
+			for callback in list(self._subscribers):
+				try:
+					callback(*change)
+				except Exception:
+					# Must not stop the other subscribers (or the thread)
+					traceback.print_exc()
+
+		return changes
+
+	def _apply(self, touched, new_dirs, removed_dirs):
+		for top, path in removed_dirs:
+			for desktop_id, record in self.catalog._dir_entries[top].items():
+				if record['path'].startswith(path + os.sep):
+					touched[(top, record['path'])] = desktop_id
+
+			mtimes = self.catalog.dirs[top]['mtimes']
+
+			for directory in list(mtimes):
+				if directory == path or directory.startswith(path + os.sep):
+					del mtimes[directory]
+
+		for top, path, prefix in new_dirs:
+			mtimes = {}
+			found = []
+
+			_walk(path, prefix, mtimes, found)
+
+			self.catalog.dirs[top]['mtimes'].update(mtimes)
+
+			for directory in sorted(mtimes):
+				self._watch(top, directory)
+
+			for file_path, desktop_id in found:
+				touched[(top, file_path)] = desktop_id
+
+		existing = [(key, desktop_id) for key, desktop_id in touched.items()
+					if os.path.isfile(key[1])]
+
+		records = dict(zip(
+			[key for key, _ in existing],
+			_make_records([(key[1], desktop_id) for key, desktop_id in existing])))
+
+		changes = []
+
+		for key, desktop_id in touched.items():
+			change = self.catalog._update(key[0], desktop_id, records.get(key))
+
+			if change is not None:
+				changes.append((change[0], desktop_id, change[1]))
+
+		for top in set(key[0] for key in touched):
+			self.catalog._sync_dir(top)
+
+		return changes
+
+	def _resync(self):
+		'''Rescan every directory, after the kernel dropped events.'''
+
+		changes = []
+
+		for top in self.catalog.order:
+			scanned = _scan_dir(top)
+			old_records = dict(self.catalog._dir_entries[top])
+			new_records = dict((record['id'], record)
+							   for record in scanned['entries'])
+
+			for desktop_id in set(old_records) | set(new_records):
+				change = self.catalog._update(top, desktop_id,
+											  new_records.get(desktop_id))
+
+				if change is not None:
+					changes.append((change[0], desktop_id, change[1]))
+
+			self.catalog.dirs[top] = scanned
+
+			for directory in sorted(scanned['mtimes']):
+				if not any(watch[1] == directory
+						   for watch in self._watches.values()):
+					self._watch(top, directory)
+
+		return changes
+
+	def _run(self, stop_fd):
+		while True:
+			readable = select.select([self._inotify.fileno(), stop_fd], [], [])[0]
+
+			if stop_fd in readable:
+				return
+
+			try:
+				self.process_events()
+			except Exception:
+				# Keep following changes, a later batch may well work
+				traceback.print_exc()
+
+	def start(self):
+		'''Process changes in a background (daemon) thread.'''
+
+		if self._thread is not None:
+			return
+
+		self._stop_pipe = os.pipe()
+		self._thread = threading.Thread(target=self._run,
+										args=(self._stop_pipe[0],))
+		self._thread.daemon = True
+		self._thread.start()
+
+	def stop(self):
+		'''Stop the background thread started by :meth:`start`.'''
+
+		if self._thread is None:
+			return
+
+		os.write(self._stop_pipe[1], b'x')
+		self._thread.join()
+		self._thread = None
+
+		for fd in self._stop_pipe:
+			os.close(fd)
+
+		self._stop_pipe = None
+
+	def close(self):
+		'''Stop watching.'''
+
+		self.stop()
+		self._inotify.close()
+
+
+def watch(callback=None):
+	'''Keep the application catalog up to date in the background.
+
+	Start a :class:`CatalogWatcher` on the catalog from :func:`get_catalog`, so that
+	it follows installation and removal of applications without rescanning.
+
+	Args:
+			callback (callable): Optionally, a function to :meth:`~CatalogWatcher.subscribe` to changes.
+
+	Returns:
+			CatalogWatcher: The started watcher. Call :meth:`~CatalogWatcher.close` to stop it.
+	'''
+
+	watcher = CatalogWatcher()
+
+	if callback is not None:
+		watcher.subscribe(callback)
+
+	watcher.start()
+
+	return watcher
@@ -25,10 +25,26 @@
 # SOFTWARE.
 
 import os
-import subprocess as sp
+import io
+import stat
+import threading
+import functools
+import itertools
+import concurrent.futures
+from collections import OrderedDict, namedtuple
 from libdesktop import system
+from libdesktop import catalog
+from libdesktop import processes
 import sys
 
+try:
+	from urllib.parse import unquote, urlparse
+except ImportError:
+	from urllib import unquote
+	from urlparse import urlparse
+
+from collections.abc import Mapping
+
 
 def construct(name, exec_, terminal=False, additional_opts={}):
 	'''Construct a .desktop file and return it as a string.
@@ -42,155 +58,1118 @@ def construct(name, exec_, terminal=False, additional_opts={}):
 			str: The constructed .desktop file.
 	'''
 
-	desktop_file = '[Desktop Entry]\n'
-
-	desktop_file_dict = {
-		'Name': name,
-		'Exec': exec_,
-		'Terminal': 'true' if terminal else 'false',
-		'Comment': additional_opts.get('Comment', name)
-	}
-
-	desktop_file = ('[Desktop Entry]\nName={name}\nExec={exec_}\n'
-					'Terminal={terminal}\nComment={comment}\n')
-
-	desktop_file = desktop_file.format(name=desktop_file_dict['Name'],
-									   exec_=desktop_file_dict['Exec'],
-									   terminal=desktop_file_dict['Terminal'],
-									   comment=desktop_file_dict['Comment'])
-
 	if additional_opts is None:
 		additional_opts = {}
 
+	desktop_file_dict = OrderedDict([
+		('Name', name),
+		('Exec', exec_),
+		('Terminal', bool(terminal)),
+		('Comment', additional_opts.get('Comment', name))
+	])
+
 	for option in additional_opts:
 		if not option in desktop_file_dict:
-			desktop_file += '%s=%s\n' % (option, additional_opts[option])
+			desktop_file_dict[option] = additional_opts[option]
+
+	return serialize(desktop_file_dict)
+
+
+def _escape_value(value):
+	# The escapes of values of type string, and ";" in lists
+	if isinstance(value, bool):
+		return 'true' if value else 'false'
+
+	if isinstance(value, (list, tuple)):
+		return ''.join(_escape_value(item).replace(';', '\\;') + ';'
+					   for item in value)
+
+	value = str(value)
+
+	if '\\' in value:
+		value = value.replace('\\', '\\\\')
+
+	if '\n' in value or '\t' in value or '\r' in value:
+		value = value.replace('\n', '\\n').replace(
+			'\t', '\\t').replace('\r', '\\r')
+
+	if value.startswith(' '):
+		value = '\\s' + value[1:]
+
+	return value
+
+
+def _serialize_group(name, keys, lines):
+	lines.append('[%s]\n' % name)
+
+	for key, value in keys.items():
+		if isinstance(value, dict):
+			# A localized key: locale → value, '' being the unlocalized one
+			for locale, localized in sorted(value.items()):
+				lines.append('%s%s=%s\n' % (key, '[%s]' % locale if locale else '',
+											_escape_value(localized)))
+
+		elif value is not None:
+			lines.append('%s=%s\n' % (key, _escape_value(value)))
+
+
+def serialize(entry, groups=None):
+	'''Turn a .desktop file into a string.
+
+	Values are converted and escaped as the Desktop Entry Specification requires: ``bool`` values become ``true``
+	or ``false``, lists are separated (and terminated) with ``;`` and newlines, tabs, backslashes and leading spaces are escaped.
+
+	Args:
+			entry  (dict): The keys of the ``[Desktop Entry]`` group, in order. The value of a localized key can be a ``dict`` mapping each locale
+						   (``''`` for the unlocalized value) to its value, for example ``{'Name': {'': 'Files', 'de': 'Dateien'}}``.
+						   A :class:`DesktopEntry` is written back as it was parsed, with all of its groups.
+			groups (dict): Any other groups (like ``Desktop Action new-window``), mapped to their keys. Defaults to none.
+
+	Returns:
+			str: The .desktop file.
+	'''
+
+	lines = []
+
+	if isinstance(entry, DesktopEntry):
+		# Values of parsed files are still escaped
+		for i, (name, keys) in enumerate(entry.groups.items()):
+			if i:
+				lines.append('\n')
+
+			if name:
+				lines.append('[%s]\n' % name)
+
+			lines.extend('%s=%s\n' % item for item in keys.items())
+
+		return ''.join(lines)
+
+	_serialize_group('Desktop Entry', entry, lines)
+
+	for name, keys in (groups or {}).items():
+		lines.append('\n')
+		_serialize_group(name, keys, lines)
+
+	return ''.join(lines)
+
+
+_temp_numbers = itertools.count()
+
+
+def write_many(entries, directory=None, sync=True):
+	'''Write many .desktop files at once.
+
+	Each file is written to a temporary file in the same directory and renamed into place, so that
+	readers never see a partly written file. With ``sync``, each file is flushed to disk before it is renamed,
+	and each directory is flushed once after all of its files are renamed, instead of once per file.
+
+	Args:
+			entries   (iterable): ``(path, entry)`` pairs. ``entry`` is either a string with the contents of the file or anything :func:`serialize` takes,
+								  optionally followed by its other groups: ``(path, entry, groups)``.
+			directory (str)	 : The directory relative paths are relative to. Defaults to the current directory.
+			sync	  (bool)	: Make sure the files are on disk before returning. Defaults to ``True``.
+
+	Returns:
+			list: The paths of the written files.
+
+	Raises:
+			OSError: If a file could not be written. Files of the batch which were not renamed yet are removed.
+	'''
+
+	pending = []
+	renamed = 0
+
+	try:
+		for item in entries:
+			path, entry = item[0], item[1]
+			groups = item[2] if len(item) > 2 else None
+
+			if directory is not None:
+				path = os.path.join(directory, path)
+
+			if not isinstance(entry, str):
+				entry = serialize(entry, groups)
+
+			# Unique to each write, so that writes of the same path (in one
+			# batch, or from several threads) do not share a temporary file
+			temp_file = os.path.join(os.path.dirname(path) or '.', '.%s.%d.%d.tmp' % (
+				os.path.basename(path), os.getpid(), next(_temp_numbers)))
+
+			with io.open(temp_file, 'x', encoding='utf-8') as f:
+				pending.append((temp_file, path))
+				f.write(entry)
+
+				if sync:
+					f.flush()
+					os.fsync(f.fileno())
+
+		for temp_file, path in pending:
+			os.replace(temp_file, path)
+			renamed += 1
+
+	finally:
+		for temp_file, _ in pending[renamed:]:
+			try:
+				os.remove(temp_file)
+			except OSError:
+				pass
+
+	written = [path for _, path in pending]
+
+	if sync and os.name != 'nt':
+		for written_dir in set(os.path.dirname(os.path.abspath(path))
+							   for path in written):
+			dir_fd = os.open(written_dir, os.O_RDONLY)
+
+			try:
+				os.fsync(dir_fd)
+			finally:
+				os.close(dir_fd)
+
+	return written
+
+
+def get_exec_cmds(desktop_file, files=None, argv=False):
+	'''Get the commands which executing a .desktop file runs.
+
+	Like :func:`get_exec_args`, but programs which should be run in a terminal (``Terminal=true``)
+	are wrapped in a terminal command (see :func:`libdesktop.applications.terminal`).
+
+	Args:
+			desktop_file (str) : The path to the .desktop file.
+			files		(list): Any files to be launched by the .desktop. Defaults to empty list.
+			argv		 (bool): Return each command as a list of arguments instead of a ``str``. Defaults to ``False``.
+
+	Returns:
+			list: The command of each instance of the program, one per file if the program only takes a single file (``%f`` or ``%u``).
+	'''
+
+	from libdesktop import applications
 
-	return desktop_file
+	commands = get_exec_args(desktop_file, files)
 
+	if parse(desktop_file)['Terminal']:
+		commands = [applications.terminal(exec_=command,
+										  keep_open_after_cmd_exec=True,
+										  return_cmd=True, argv=True)
+					for command in commands]
 
-def execute(desktop_file, files=None, return_cmd=False, background=False):
+	if not argv:
+		commands = [system.join_cmd(command) for command in commands]
+
+	return commands
+
+
+def execute(desktop_file, files=None, return_cmd=False, background=False,
+			argv=False):
 	'''Execute a .desktop file.
 	Executes a given .desktop file path properly.
+	The ``Exec`` key is split into arguments as described by the Desktop Entry Specification
+	(see :func:`get_exec_args`) and the program is started directly, without a shell.
 	Args:
 			desktop_file (str) : The path to the .desktop file.
 			files		(list): Any files to be launched by the .desktop. Defaults to empty list.
 			return_cmd   (bool): Return the command (as ``str``) instead of executing. Defaults to ``False``.
 			background   (bool): Run command in background. Defaults to ``False``.
+			argv		 (bool): With ``return_cmd``, return the command as a list of arguments instead of a ``str``. Defaults to ``False``.
+	Note:
+			If the program only takes a single file (``%f`` or ``%u``) and several are given, one instance is started for each file.
+			There is no single command for that, so use :func:`get_exec_cmds` to get the command of each instance.
 	Returns:
 			str: Only if ``return_cmd``. Returns command instead of running it. Else returns nothing.
+	Raises:
+			ValueError: With ``return_cmd``, if several instances of the program would be started.
 	'''
 
-	# Attempt to manually parse and execute
+	commands = get_exec_cmds(desktop_file, files, argv=argv or not return_cmd)
+
+	if return_cmd:
+		if len(commands) != 1:
+			raise ValueError('%s starts %d instances, use get_exec_cmds()' % (
+				desktop_file, len(commands)))
+
+		return commands[0]
 
-	desktop_file_exec = parse(desktop_file)['Exec']
+	children = [processes.spawn(command, background=True)
+				for command in commands]
 
-	for i in desktop_file_exec.split():
-		if i.startswith('%'):
-			desktop_file_exec = desktop_file_exec.replace(i, '')
+	if not background:
+		for child in children:
+			child.wait()
 
-	desktop_file_exec = desktop_file_exec.replace(r'%F', '')
-	desktop_file_exec = desktop_file_exec.replace(r'%f', '')
 
-	if files:
-		for i in files:
-			desktop_file_exec += ' ' + i
+def _unescape_string(value):
+	# The escapes allowed in values of type string: \s, \n, \t, \r and \\
+	if '\\' not in value:
+		return value
 
-	if parse(desktop_file)['Terminal']:
-		# Use eval and __import__ to bypass a circular dependency
-		desktop_file_exec = eval(
-				('__import__("libdesktop").applications.terminal(exec_="%s",'
-				 ' keep_open_after_cmd_exec=True, return_cmd=True)') %
-			desktop_file_exec)
+	result = []
+	chars = iter(value)
 
-	if return_cmd:
-		return desktop_file_exec
+	for char in chars:
+		if char == '\\':
+			escaped = next(chars, '')
+			result.append({'s': ' ', 'n': '\n', 't': '\t', 'r': '\r',
+						   '\\': '\\'}.get(escaped, char + escaped))
+		else:
+			result.append(char)
 
-	desktop_file_proc = sp.Popen([desktop_file_exec], shell=True)
+	return ''.join(result)
 
-	if not background:
-		desktop_file_proc.wait()
+
+@functools.lru_cache(maxsize=1024)
+def compile_exec(exec_):
+	'''Split an ``Exec`` value into an argument template.
+
+	Split the value of an ``Exec`` key into arguments, following the quoting rules of the Desktop Entry Specification,
+	and find its field codes. The result is cached, so compiling the same value again is free.
+
+	Args:
+			exec\_ (str): The value of the ``Exec`` key, as in the .desktop file.
+
+	Returns:
+			tuple: One item per argument. Each argument is a tuple of parts: either a ``str`` or, for field codes, a one-item ``tuple`` with the code (for example ``('f',)``).
+
+	Raises:
+			ValueError: If the value has an unterminated quote.
+	'''
+
+	exec_ = _unescape_string(exec_)
+
+	args = []
+	parts = None
+	literal = []
+	quoted = False
+	chars = iter(exec_)
+
+	def flush():
+		if literal:
+			parts.append(''.join(literal))
+			del literal[:]
+
+	for char in chars:
+		if quoted:
+			if char == '"':
+				quoted = False
+			elif char == '\\':
+				# Only \", \`, \$ and \\ are escapes inside quotes
+				escaped = next(chars, '')
+				literal.append(escaped if escaped in '"`$\\' else char + escaped)
+			else:
+				literal.append(char)
+
+			continue
+
+		if char in ' \t\n':
+			if parts is not None:
+				flush()
+				args.append(tuple(parts))
+				parts = None
+
+			continue
+
+		if parts is None:
+			parts = []
+
+		if char == '"':
+			quoted = True
+
+		elif char == '%':
+			code = next(chars, '')
+
+			if code == '%':
+				literal.append('%')
+			elif code in 'fFuUick':
+				flush()
+				parts.append((code,))
+
+			# Deprecated (%d, %D, %n, %N, %v, %m) and invalid codes are dropped
+
+		else:
+			literal.append(char)
+
+	if quoted:
+		raise ValueError('Unterminated quote in Exec value: %s' % exec_)
+
+	if parts is not None:
+		flush()
+
+		# An argument which was only a deprecated field code disappears
+		if parts:
+			args.append(tuple(parts))
+
+	return tuple(args)
+
+
+def _file_path(file):
+	# %f and %F take local paths, convert file: URLs back
+	if file.startswith('file://'):
+		return unquote(urlparse(file).path)
+
+	return file
+
+
+def get_exec_args(desktop_file, files=None):
+	'''Get the arguments to run a .desktop file with.
+
+	Expand the field codes in the ``Exec`` key of a .desktop file:
+
+	- ``%f``, ``%u``: a single file or URL
+	- ``%F``, ``%U``: the files or URLs, as separate arguments
+	- ``%i``: ``--icon`` and the ``Icon`` key, if set
+	- ``%c``: the (localized) name
+	- ``%k``: the path of the .desktop file
+
+	If there is no field code for files, the files are added at the end.
+
+	Args:
+			desktop_file (str) : The path to the .desktop file or a string with its contents.
+			files		(list): Any files to be launched by the .desktop. Defaults to empty list.
+
+	Returns:
+			list: The arguments of each instance to start: one, unless the program only takes a single file (``%f`` or ``%u``) and several are given.
+	'''
+
+	entry = parse(desktop_file)
+	template = compile_exec(entry.get('Exec', ''))
+	files = list(files or [])
+
+	codes = set(part[0] for arg in template for part in arg
+				if isinstance(part, tuple))
+
+	if files and codes.isdisjoint('fFuU'):
+		template += tuple((file,) for file in files)
+		files = []
+
+	if files and codes.isdisjoint('FU') and len(files) > 1:
+		return [_expand_exec(template, entry, [file]) for file in files]
+
+	return [_expand_exec(template, entry, files)]
+
+
+def _expand_exec(template, entry, files):
+	args = []
+
+	for arg in template:
+		if len(arg) == 1 and isinstance(arg[0], tuple):
+			# A field code on its own can expand to several arguments
+			code = arg[0][0]
+
+			if code in 'FU':
+				args.extend(_file_path(file) if code == 'F' else file
+							for file in files)
+				continue
+
+			if code == 'i':
+				if entry.get('Icon'):
+					args.extend(['--icon', entry['Icon']])
+				continue
+
+			if code in 'fu' and not files:
+				continue
+
+		expanded = []
+
+		for part in arg:
+			if not isinstance(part, tuple):
+				expanded.append(part)
+				continue
+
+			code = part[0]
+
+			if code in 'fF':
+				expanded.append(_file_path(files[0]) if files else '')
+			elif code in 'uU':
+				expanded.append(files[0] if files else '')
+			elif code == 'i':
+				expanded.append(entry.get('Icon', ''))
+			elif code == 'c':
+				expanded.append(entry.get_localized('Name') or '')
+			elif code == 'k':
+				expanded.append(entry.path or '')
+
+		args.append(''.join(expanded))
+
+	return args
 
 
 def locate(desktop_filename_or_name):
 	'''Locate a .desktop from the standard locations.
 	Find the path to the .desktop file of a given .desktop filename or application name.
 	Standard locations:
-			- ``~/.local/share/applications/``
-			- ``/usr/share/applications``
+			- ``$XDG_DATA_HOME/applications`` (usually ``~/.local/share/applications/``)
+			- ``applications`` in each ``$XDG_DATA_DIRS`` directory (usually ``/usr/local/share/applications`` and ``/usr/share/applications``)
+	Note:
+			Lookups are answered from the application index (see :func:`libdesktop.catalog.get_installed`),
+			so only application directories which changed since the last lookup are read.
 	Args:
 			desktop_filename_or_name (str): Either the filename of a .desktop file or the name of an application.
 	Returns:
 			list: A list of all matching .desktop files found.
 	'''
 
-	paths = [
-		os.path.expanduser('~/.local/share/applications'),
-		'/usr/share/applications']
+	return catalog.get_installed().locate(desktop_filename_or_name)
 
-	result = []
 
-	for path in paths:
-		for file in os.listdir(path):
-			if desktop_filename_or_name in file.split(
-					'.') or desktop_filename_or_name == file:
-				# Example: org.gnome.gedit
-				result.append(os.path.join(path, file))
+def search(query, limit=10):
+	'''Search the installed applications.
+
+	Search the localized ``Name``, ``GenericName``, ``Keywords`` and ``Exec`` of the installed applications,
+	tolerating typos. Exact and prefix matches on the name rank first.
+
+	Note:
+			For type-ahead, use a :class:`libdesktop.catalog.SearchSession`, which reuses the work done for the previous query.
+
+	Args:
+			query (str): What to search for.
+			limit (int): The maximum number of results. Defaults to ``10``.
+
+	Returns:
+			list: The best matching entries (dicts with the ``id``, ``path``, ``name`` etc. of each, see :attr:`libdesktop.catalog.Catalog.entries`), best first.
+	'''
+
+	return catalog.get_catalog().search(query, limit)
+
+
+class DesktopEntry(Mapping):
+	'''A parsed .desktop file.
+
+	Behaves like a read-only ``dict`` of the keys in the ``[Desktop Entry]`` group, with
+	``true`` and ``false`` converted to ``bool`` and ``Terminal`` and ``Hidden`` always
+	present. Other groups (like ``[Desktop Action new-window]``) are kept separately, see :meth:`group`.
+
+	Note:
+			Entries returned by :func:`parse` are shared between callers, so they are not to be modified.
 
+	Attributes:
+			path   (str) : The path of the parsed file, or ``None`` if it was parsed from a string.
+			groups (dict): Maps each group name to a ``dict`` of its keys and (unconverted) values.
+	'''
+
+	__slots__ = ('path', 'groups', '_values')
+
+	def __init__(self, groups, path=None):
+		self.path = path
+		self.groups = groups
+
+		# Keys before any group header are treated as the main group
+		main_group = groups.get('Desktop Entry', groups.get('', {}))
+
+		values = {'Terminal': False, 'Hidden': False}
+
+		for key, value in main_group.items():
+			if value == 'false':
+				values[key] = False
+			elif value == 'true':
+				values[key] = True
 			else:
-				file_parsed = parse(os.path.join(path, file))
+				values[key] = value
 
-				try:
-					if desktop_filename_or_name.lower() == file_parsed[
-							'Name'].lower():
-						result.append(file)
-					elif desktop_filename_or_name.lower() == file_parsed[
-							'Exec'].split(' ')[0]:
-						result.append(file)
-				except KeyError:
-					pass
+		self._values = values
 
-	for res in result:
-		if not res.endswith('.desktop'):
-			result.remove(res)
+	def __getitem__(self, key):
+		return self._values[key]
 
-	if not result and not result.endswith('.desktop'):
-		result.extend(locate(desktop_filename_or_name + '.desktop'))
+	def __iter__(self):
+		return iter(self._values)
 
-	return result
+	def __len__(self):
+		return len(self._values)
+
+	def __repr__(self):
+		return '<DesktopEntry %s>' % (self.path or repr(self.get('Name')))
+
+	def group(self, name):
+		'''Get the keys of a group.
+
+		Args:
+				name (str): The group name, without brackets (for example ``Desktop Action new-window``).
+
+		Returns:
+				dict: The keys and values of the group (empty if there is no such group).
+		'''
+
+		return self.groups.get(name, {})
+
+	def get_localized(self, key, locale=None, group='Desktop Entry'):
+		'''Get the value of a localized key.
+
+		Get the value of a key (like ``Name``) for a locale, following the matching rules of the
+		Desktop Entry Specification (``lang_COUNTRY@MODIFIER``, ``lang_COUNTRY``, ``lang@MODIFIER``, ``lang``, then unlocalized).
+
+		Args:
+				key	(str): The key, without a locale (for example ``Name``).
+				locale (str): The locale, for example ``de_DE.UTF-8``. Defaults to the current locale (see :func:`get_locale`).
+				group  (str): The group to look in. Defaults to ``Desktop Entry``.
+
+		Returns:
+				str: The value, or ``None`` if the key is not set.
+		'''
+
+		values = self.groups.get(group)
+
+		if values is None and group == 'Desktop Entry':
+			values = self.groups.get('')
+
+		if values is None:
+			return None
+
+		for candidate in _locale_candidates(
+				get_locale() if locale is None else locale):
+			value = values.get('%s[%s]' % (key, candidate))
+
+			if value is not None:
+				return value
+
+		return values.get(key)
+
+
+def get_locale():
+	'''Get the locale used for localized keys.
+
+	Returns:
+			str: The value of the first of ``$LC_ALL``, ``$LC_MESSAGES`` and ``$LANG`` which is set, or ``C``.
+	'''
+
+	for variable in ['LC_ALL', 'LC_MESSAGES', 'LANG']:
+		if os.getenv(variable):
+			return os.getenv(variable)
+
+	return 'C'
+
+
+def _locale_candidates(locale):
+	# lang_COUNTRY.ENCODING@MODIFIER, the encoding is ignored
+	locale, _, modifier = locale.partition('@')
+	locale = locale.partition('.')[0]
+	lang, _, country = locale.partition('_')
+
+	if lang in ['', 'C', 'POSIX']:
+		return []
+
+	candidates = []
+
+	if country and modifier:
+		candidates.append('%s_%s@%s' % (lang, country, modifier))
+
+	if country:
+		candidates.append('%s_%s' % (lang, country))
+
+	if modifier:
+		candidates.append('%s@%s' % (lang, modifier))
+
+	candidates.append(lang)
+
+	return candidates
+
+
+def _parse_groups(desktop_file):
+	groups = {}
+	current = None
+
+	for line in desktop_file.splitlines():
+		line = line.strip()
+
+		if not line or line.startswith('#'):
+			continue
+
+		if line.startswith('[') and line.endswith(']'):
+			current = groups.setdefault(line[1:-1], {})
+			continue
+
+		key, sep, value = line.partition('=')
+
+		if not sep:
+			continue
+
+		if current is None:
+			current = groups.setdefault('', {})
+
+		current[key.rstrip()] = value.lstrip()
+
+	return groups
+
+
+class _EntryCache(object):
+	'''A least-recently-used cache of parsed files, validated by modification time and size.'''
+
+	def __init__(self, maxsize):
+		self.maxsize = maxsize
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, path, stamp):
+		with self._lock:
+			cached = self._entries.get(path)
+
+			if cached is None or cached[0] != stamp:
+				return None
+
+			self._entries.move_to_end(path)
+
+			return cached[1]
+
+	def put(self, path, stamp, entry):
+		with self._lock:
+			self._entries[path] = (stamp, entry)
+			self._entries.move_to_end(path)
+
+			while len(self._entries) > self.maxsize:
+				self._entries.popitem(last=False)
+
+	def clear(self):
+		with self._lock:
+			self._entries.clear()
+
+
+_entry_cache = _EntryCache(8192)
+
+
+def _parse_file(path, file_stat):
+	path = os.path.abspath(path)
+	stamp = (file_stat.st_mtime_ns, file_stat.st_size)
+
+	entry = _entry_cache.get(path, stamp)
+
+	if entry is None:
+		with io.open(path, encoding='utf-8', errors='replace') as f:
+			entry = DesktopEntry(_parse_groups(f.read()), path)
+
+		_entry_cache.put(path, stamp, entry)
+
+	return entry
 
 
 def parse(desktop_file_or_string):
 	'''Parse a .desktop file.
-	Parse a .desktop file or a string with its contents into an easy-to-use dict, with standard values present even if not defined in file.
+	Parse a .desktop file or a string with its contents into an easy-to-use :class:`DesktopEntry`, with standard values present even if not defined in file.
+	Parsed files are cached (keyed by path, modification time and size), so parsing an unchanged file again is free.
 	Args:
 			desktop_file_or_string (str): Either the path to a .desktop file or a string with a .desktop file as its contents.
 	Returns:
-			dict: A dictionary of the parsed file.'''
+			DesktopEntry: A read-only dict-like object of the parsed file.'''
 
-	if os.path.isfile(desktop_file_or_string):
-		with open(desktop_file_or_string) as f:
-			desktop_file = f.read()
+	try:
+		file_stat = os.stat(desktop_file_or_string)
+	except (OSError, ValueError):
+		file_stat = None
 
-	else:
-		desktop_file = desktop_file_or_string
+	if file_stat is not None and stat.S_ISREG(file_stat.st_mode):
+		return _parse_file(desktop_file_or_string, file_stat)
+
+	return DesktopEntry(_parse_groups(desktop_file_or_string))
+
+
+def _parse_in_worker(path):
+	# Runs in a worker process: return the raw groups, which are cheaper to
+	# send back than DesktopEntry objects
+	try:
+		file_stat = os.stat(path)
+
+		with io.open(path, encoding='utf-8', errors='replace') as f:
+			groups = _parse_groups(f.read())
+
+		return (file_stat.st_mtime_ns, file_stat.st_size), groups
+
+	except (IOError, OSError) as e:
+		return None, e
+
+
+def _parse_or_error(path):
+	try:
+		return _parse_file(path, os.stat(path))
+
+	except (IOError, OSError) as e:
+		return e
+
+
+def parse_many(paths, workers=None, processes=False):
+	'''Parse many .desktop files at once.
+
+	Parse a batch of .desktop files in parallel, in a pool of threads (or processes, with ``processes``).
+	Files that fail to parse do not abort the batch: the exception is returned in their place.
+
+	Parsed files are added to the same cache as :func:`parse` uses.
+
+	Args:
+			paths	 (list): The paths to the .desktop files.
+			workers   (int) : The number of threads or processes to use. Defaults to a number based on the number of CPUs.
+			processes (bool): Parse in a pool of processes instead of threads. Worth it only for very large batches. Defaults to ``False``.
+
+	Returns:
+			list: A :class:`DesktopEntry` for each path in ``paths``, in the same order, or the exception raised while reading it.
+	'''
+
+	paths = list(paths)
+
+	if workers is None:
+		workers = min(32, (os.cpu_count() or 1) + 4)
+
+	if not processes and (workers <= 1 or len(paths) <= 1):
+		return [_parse_or_error(path) for path in paths]
 
-	result = {}
+	chunksize = max(1, len(paths) // (workers * 4))
 
-	for line in desktop_file.split('\n'):
-		if '=' in line:
-			result[line.split('=')[0]] = line.split('=')[1]
+	if not processes:
+		# Hand out chunks rather than single files, a future per file costs
+		# about as much as parsing it
+		chunks = [paths[i:i + chunksize]
+				  for i in range(0, len(paths), chunksize)]
 
-	for key, value in result.items():
-		if value == 'false':
-			result[key] = False
-		elif value == 'true':
-			result[key] = True
+		with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+			parsed = executor.map(
+				lambda chunk: [_parse_or_error(path) for path in chunk], chunks)
 
-	if not 'Terminal' in result:
-		result['Terminal'] = False
+			return [entry for chunk in parsed for entry in chunk]
 
-	if not 'Hidden' in result:
-		result['Hidden'] = False
+	paths = [os.path.abspath(path) for path in paths]
+
+	with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+		parsed = executor.map(_parse_in_worker, paths, chunksize=chunksize)
+
+		result = []
+
+		for path, (stamp, groups) in zip(paths, parsed):
+			if stamp is None:
+				# groups is the exception here
+				result.append(groups)
+
+			else:
+				entry = DesktopEntry(groups, path)
+				_entry_cache.put(path, stamp, entry)
+				result.append(entry)
 
 	return result
+
+
+class Finding(namedtuple('Finding', ['path', 'line', 'severity', 'message'])):
+	'''A problem found by :func:`validate`.
+
+	Attributes:
+			path	 (str): The path of the file, or ``None`` if a string was validated.
+			line	 (int): The line number (starting at 1), or ``None`` if the problem is with the file as a whole.
+			severity (str): ``error`` for violations of the specification, ``warning`` for things which are likely mistakes.
+			message  (str): What is wrong.
+	'''
+
+	__slots__ = ()
+
+	def __str__(self):
+		location = self.path or '<string>'
+
+		if self.line is not None:
+			location += ':%d' % self.line
+
+		return '%s: %s: %s' % (location, self.severity, self.message)
+
+
+_TYPES = ['Application', 'Link', 'Directory']
+
+_BOOLEAN_KEYS = ['NoDisplay', 'Hidden', 'DBusActivatable', 'Terminal',
+				 'StartupNotify', 'PrefersNonDefaultGPU', 'SingleMainWindow']
+
+_LIST_KEYS = ['OnlyShowIn', 'NotShowIn', 'Actions', 'MimeType', 'Categories',
+			  'Implements', 'Keywords']
+
+_LOCALIZED_KEYS = frozenset(['Name', 'GenericName', 'Comment', 'Icon',
+							 'Keywords'])
+
+_KNOWN_KEYS = (['Type', 'Version', 'Name', 'GenericName', 'Comment', 'Icon',
+				'TryExec', 'Exec', 'Path', 'StartupWMClass', 'URL'] +
+			   _BOOLEAN_KEYS + _LIST_KEYS)
+
+# Must be quoted in Exec
+_EXEC_RESERVED = set('\t\n"\'\\><~|&;$*?#()`')
+
+
+def _check_exec(value, report):
+	value = _unescape_string(value)
+
+	quoted = False
+	file_codes = []
+	chars = iter(value)
+
+	for char in chars:
+		if quoted:
+			if char == '"':
+				quoted = False
+			elif char == '\\':
+				next(chars, '')
+			elif char == '%':
+				report('error', 'Field codes must not be used inside a quoted '
+						'argument in Exec')
+			elif char == '`' or char == '$':
+				report('error', '"%s" must be escaped inside a quoted '
+						'argument in Exec' % char)
+
+			continue
+
+		if char == '"':
+			quoted = True
+
+		elif char == '%':
+			code = next(chars, '')
+
+			if code in 'fFuU' and code:
+				file_codes.append(code)
+			elif code in 'dDnNvm' and code:
+				report('warning', 'Deprecated field code %%%s in Exec' % code)
+			elif code not in 'ick%' or not code:
+				report('error', 'Invalid field code %%%s in Exec' % code)
+
+		elif char in _EXEC_RESERVED:
+			report('error', 'Reserved character "%s" must be quoted in Exec' %
+				   char.replace('\n', '\\n').replace('\t', '\\t'))
+
+	if quoted:
+		report('error', 'Unterminated quote in Exec')
+
+	if len(file_codes) > 1:
+		report('error', 'Exec has more than one of %%f, %%F, %%u and %%U: %s' %
+			   ', '.join('%' + code for code in file_codes))
+
+
+def _validate_text(text, path):
+	findings = []
+	groups = OrderedDict()
+	current = None
+
+	def report(severity, message, line=None):
+		findings.append(Finding(path, line, severity, message))
+
+	for number, line in enumerate(text.splitlines(), 1):
+		stripped = line.strip()
+
+		if not stripped or stripped.startswith('#'):
+			continue
+
+		if stripped.startswith('['):
+			name = stripped[1:-1]
+
+			if not stripped.endswith(']') or '[' in name or ']' in name:
+				report('error', 'Invalid group header: %s' % stripped, number)
+
+			elif any(ord(char) < 32 or ord(char) == 127 for char in name):
+				report('error', 'Control characters in group name', number)
+
+			elif name in groups:
+				report('error', 'Duplicate group [%s]' % name, number)
+
+			elif not groups and name != 'Desktop Entry':
+				report('error', 'The first group must be [Desktop Entry], '
+					   'not [%s]' % name, number)
+
+			elif (groups and name != 'Desktop Entry' and
+				  not name.startswith('Desktop Action ') and
+				  not name.startswith('X-')):
+				report('error', 'Unknown group [%s] (extension groups must '
+					   'start with X-)' % name, number)
+
+			current = groups.setdefault(name, {})
+			continue
+
+		key, sep, value = line.partition('=')
+		key = key.strip()
+
+		if not sep:
+			report('error', 'Not a key, group or comment: %s' % stripped,
+				   number)
+			continue
+
+		if current is None:
+			report('error', 'Key %s before the [Desktop Entry] group' % key,
+				   number)
+			continue
+
+		base_key, _, locale = key.partition('[')
+
+		if (not base_key or not all(char.isalnum() and ord(char) < 128 or
+									char == '-' for char in base_key) or
+				(locale and not locale.endswith(']'))):
+			report('error', 'Invalid key name: %s' % key, number)
+
+		if key in current:
+			report('error', 'Duplicate key %s' % key, number)
+
+		current[key] = (value.strip(), number)
+
+	if 'Desktop Entry' not in groups:
+		report('error', 'No [Desktop Entry] group')
+		return findings
+
+	for group_name, keys in groups.items():
+		is_main = group_name == 'Desktop Entry'
+
+		if group_name.startswith('X-'):
+			continue
+
+		for key, (value, number) in keys.items():
+			base_key, _, locale = key.partition('[')
+
+			if base_key.startswith('X-'):
+				continue
+
+			if is_main and base_key not in _KNOWN_KEYS:
+				report('warning', 'Unknown key %s (extension keys must start '
+					   'with X-)' % key, number)
+
+			elif locale and base_key not in _LOCALIZED_KEYS:
+				report('error', 'Key %s can not be localized' % base_key,
+					   number)
+
+			if base_key in _BOOLEAN_KEYS and value not in ['true', 'false']:
+				report('error', 'Value of %s must be true or false, not "%s"' %
+					   (key, value), number)
+
+			elif base_key in _LIST_KEYS and value and not value.endswith(';'):
+				report('warning', 'Value of %s is a list and should end with '
+					   '";"' % key, number)
+
+			elif base_key == 'Exec' and not locale:
+				_check_exec(value, lambda severity, message:
+							report(severity, message, number))
+
+	main = groups['Desktop Entry']
+
+	def get(key):
+		return main.get(key, (None, None))[0]
+
+	entry_type = get('Type')
+
+	for required in ['Type', 'Name']:
+		if get(required) is None:
+			report('error', 'Required key %s is missing' % required)
+
+	if entry_type is not None and entry_type not in _TYPES:
+		report('error', 'Unknown Type "%s"' % entry_type,
+			   main['Type'][1])
+
+	if (entry_type == 'Application' and get('Exec') is None and
+			get('DBusActivatable') != 'true'):
+		report('error', 'Applications must have an Exec key, unless '
+			   'DBusActivatable is true')
+
+	if entry_type == 'Link' and get('URL') is None:
+		report('error', 'Links must have a URL key')
+
+	actions = [action for action in (get('Actions') or '').split(';')
+			   if action]
+
+	for action in actions:
+		group = groups.get('Desktop Action %s' % action)
+
+		if group is None:
+			report('error', 'Action %s has no [Desktop Action %s] group' %
+				   (action, action), main['Actions'][1])
+
+		elif 'Name' not in group:
+			report('error', 'Action %s has no Name' % action)
+
+	for group_name in groups:
+		if (group_name.startswith('Desktop Action ') and
+				group_name[len('Desktop Action '):] not in actions):
+			report('warning', 'Group [%s] is not listed in Actions' %
+				   group_name)
+
+	findings.sort(key=lambda finding: (finding.line is None, finding.line or 0))
+
+	return findings
+
+
+def validate(desktop_file_or_string):
+	'''Validate a .desktop file.
+
+	Check a .desktop file against the `Desktop Entry Specification <https://specifications.freedesktop.org/desktop-entry-spec/latest/>`_,
+	in process and without running ``desktop-file-validate``: group and key names, required keys, types, boolean and list values,
+	and the quoting and field codes of ``Exec``.
+
+	Args:
+			desktop_file_or_string (str): Either the path to a .desktop file or a string with a .desktop file as its contents.
+
+	Returns:
+			list: The :class:`Finding` objects, in the order of the file. Empty if the file is valid.
+	'''
+
+	try:
+		is_file = os.path.isfile(desktop_file_or_string)
+	except (TypeError, ValueError):
+		is_file = False
+
+	if not is_file:
+		return _validate_text(desktop_file_or_string, None)
+
+	with io.open(desktop_file_or_string, 'rb') as f:
+		data = f.read()
+
+	try:
+		text = data.decode('utf-8')
+	except UnicodeDecodeError as e:
+		text = data.decode('utf-8', 'replace')
+
+		return ([Finding(desktop_file_or_string,
+						 data[:e.start].count(b'\n') + 1, 'error',
+						 'Invalid UTF-8')] +
+				_validate_text(text, desktop_file_or_string))
+
+	return _validate_text(text, desktop_file_or_string)
+
+
+def _validate_chunk(paths):
+	findings = []
+
+	for path in paths:
+		try:
+			findings.extend(validate(path))
+		except (IOError, OSError) as e:
+			findings.append(Finding(path, None, 'error', str(e)))
+
+	return findings
+
+
+def validate_tree(directory, workers=None, threads=False):
+	'''Validate every .desktop file in a directory tree.
+
+	The files are validated across a pool of processes (see :func:`validate`), and findings
+	are yielded as soon as each batch of files is done, not in any particular order.
+
+	Args:
+			directory (str) : The directory to validate.
+			workers   (int) : The number of processes (or threads) to use. Defaults to the number of CPUs.
+			threads   (bool): Use a pool of threads instead, which is cheaper to start for small trees. Defaults to ``False``.
+
+	Yields:
+			Finding: The problems found.
+	'''
+
+	paths = []
+
+	for root, dirs, files in os.walk(directory):
+		dirs.sort()
+		paths.extend(os.path.join(root, name) for name in sorted(files)
+					 if name.endswith('.desktop'))
+
+	if workers is None:
+		workers = os.cpu_count() or 1
+
+	# Large enough to make sending a chunk cheap compared to validating it,
+	# small enough for findings to come in steadily
+	chunksize = max(1, min(64, len(paths) // (workers * 4)))
+	chunks = [paths[i:i + chunksize] for i in range(0, len(paths), chunksize)]
+
+	if threads:
+		executor = concurrent.futures.ThreadPoolExecutor(workers)
+	else:
+		executor = concurrent.futures.ProcessPoolExecutor(workers)
+
+	with executor:
+		futures = [executor.submit(_validate_chunk, chunk) for chunk in chunks]
+
+		try:
+			for future in concurrent.futures.as_completed(futures):
+				for finding in future.result():
+					yield finding
+
+		finally:
+			# The caller may stop early
+			for future in futures:
+				future.cancel()
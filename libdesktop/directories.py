@@ -26,6 +26,7 @@
 
 
 import os
+import sys
 from libdesktop import system
 
 __WINDOWS_FOLDER_GUIDS = {
@@ -302,6 +303,80 @@ def get_config_file(program, system_wide=False):
 	return config_files
 
 
+def get_config_dirs():
+	'''Get the XDG configuration directories.
+
+	Get the directories searched for configuration files as defined by the `XDG Base Directory Specification <https://specifications.freedesktop.org/basedir-spec/latest/>`_,
+	that is, ``$XDG_CONFIG_HOME`` followed by every entry of ``$XDG_CONFIG_DIRS``. See also :func:`get_config_dir()`.
+
+	Returns:
+			list: A list of the configuration directories, most important first.
+	'''
+
+	return __get_xdg_dirs('XDG_CONFIG_HOME', '~/.config',
+						 'XDG_CONFIG_DIRS', '/etc/xdg')
+
+
+def get_data_dirs():
+	'''Get the data directories.
+
+	Get the directories searched for data files as defined by the `XDG Base Directory Specification <https://specifications.freedesktop.org/basedir-spec/latest/>`_,
+	that is, ``$XDG_DATA_HOME`` followed by every entry of ``$XDG_DATA_DIRS``.
+
+	Returns:
+			list: A list of the data directories, most important first.
+	'''
+
+	return __get_xdg_dirs('XDG_DATA_HOME', '~/.local/share',
+						 'XDG_DATA_DIRS', '/usr/local/share:/usr/share')
+
+
+def __get_xdg_dirs(home_var, default_home, dirs_var, default_dirs):
+	xdg_dirs = [os.getenv(home_var) or os.path.expanduser(default_home)]
+
+	for xdg_dir in (os.getenv(dirs_var) or default_dirs).split(':'):
+		# Relative paths are invalid and must be ignored
+		if os.path.isabs(xdg_dir):
+			xdg_dir = os.path.normpath(xdg_dir)
+
+			if xdg_dir not in xdg_dirs:
+				xdg_dirs.append(xdg_dir)
+
+	return xdg_dirs
+
+
+def get_cache_dir(program=''):
+	'''Get the user cache directory.
+
+	Get the directory for storing user-specific non-essential (cached) data, optionally for a specific program.
+
+	Note:
+			The directory is not created if it does not exist.
+
+	Args:
+			program (str): The name of the program whose cache directory is wanted.
+
+	Returns:
+			str: The path to the cache directory.
+	'''
+
+	if os.name == 'nt':
+		import winreg
+		cache_home = winreg.ExpandEnvironmentStrings('%LOCALAPPDATA%')
+
+	elif sys.platform == 'darwin':
+		cache_home = os.path.expanduser('~/Library/Caches')
+
+	else:
+		cache_home = os.getenv('XDG_CACHE_HOME') or os.path.expanduser(
+			'~/.cache')
+
+	if program:
+		return os.path.join(cache_home, program)
+
+	return cache_home
+
+
 def windows_get_program_files_dir():
 	'''Get the Windows system Program Files directory.
 
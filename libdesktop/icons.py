@@ -0,0 +1,589 @@
+# coding: utf-8
+
+# This file is part of libdesktop
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Bharadwaj Raju
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import io
+import mmap
+import time
+import struct
+import threading
+
+from libdesktop import desktopfile
+from libdesktop import directories
+
+try:
+	import configparser
+except ImportError:
+	import ConfigParser as configparser
+
+EXTENSIONS = ['png', 'svg', 'xpm']
+
+# Flags of an image in icon-theme.cache
+_CACHE_FLAGS = [('xpm', 1), ('svg', 2), ('png', 4)]
+
+_CACHE_HEADER = struct.Struct('>HHII')
+_CARD16 = struct.Struct('>H')
+_CARD32 = struct.Struct('>I')
+_IMAGE = struct.Struct('>HHI')
+
+# Theme directories, icon lookups and the like are checked for changes at
+# most this often (in seconds)
+_VALIDATE_INTERVAL = 2
+
+_lock = threading.RLock()
+
+# (name, size, scale, theme) → path
+_lookups = {}
+
+# theme name → Theme
+_themes = {}
+
+# theme directory → (mtime, IconCache or directory index)
+_indexes = {}
+
+_validated = 0
+
+# The user's icon theme, see get_theme_name()
+_theme_name = None
+
+
+def _hash(name):
+	# g_str_hash() as used by gtk-update-icon-cache, over signed chars
+	h = 0
+
+	for i, byte in enumerate(bytearray(name.encode('utf-8'))):
+		if byte > 127:
+			byte -= 256
+
+		h = byte if i == 0 else h * 31 + byte
+		h &= 0xffffffff
+
+	return h
+
+
+class IconCache(object):
+	'''A reader for the ``icon-theme.cache`` files generated by ``gtk-update-icon-cache``.
+
+	The file is memory-mapped and only the parts needed for a lookup are read.
+
+	Args:
+			path (str): The path to the ``icon-theme.cache`` file.
+
+	Attributes:
+			directories (list): The subdirectories of the theme listed in the cache.
+
+	Raises:
+			ValueError: If the file is not an icon theme cache.
+	'''
+
+	def __init__(self, path):
+		with open(path, 'rb') as f:
+			self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+		try:
+			major, minor, self._hash_offset, directory_list_offset = \
+				_CACHE_HEADER.unpack_from(self._map, 0)
+
+			if major != 1:
+				raise ValueError('Unsupported icon cache version %d.%d' %
+								 (major, minor))
+
+			count = self._card32(directory_list_offset)
+
+			self.directories = [
+				self._string(self._card32(directory_list_offset + 4 + 4 * i))
+				for i in range(count)]
+
+			self._buckets = self._card32(self._hash_offset)
+
+		except struct.error:
+			self._map.close()
+			raise ValueError('Truncated icon cache: %s' % path)
+
+	def _card32(self, offset):
+		return _CARD32.unpack_from(self._map, offset)[0]
+
+	def _string(self, offset):
+		return self._map[offset:self._map.find(b'\0', offset)].decode(
+			'utf-8', 'replace')
+
+	def lookup(self, name):
+		'''Find the images of an icon.
+
+		Args:
+				name (str): The icon name, without an extension.
+
+		Returns:
+				dict: Maps each subdirectory with an image of the icon to its extensions (a ``list``, in the order of :data:`EXTENSIONS`).
+		'''
+
+		if not self._buckets:
+			return {}
+
+		encoded = name.encode('utf-8')
+		offset = self._card32(self._hash_offset + 4 +
+							  4 * (_hash(name) % self._buckets))
+
+		while offset != 0xffffffff:
+			chain_offset = self._card32(offset)
+			name_offset = self._card32(offset + 4)
+
+			if self._map[name_offset:name_offset + len(encoded) + 1] == \
+					encoded + b'\0':
+				return self._images(self._card32(offset + 8))
+
+			offset = chain_offset
+
+		return {}
+
+	def _images(self, offset):
+		images = {}
+
+		for i in range(self._card32(offset)):
+			directory_index, flags, _ = _IMAGE.unpack_from(
+				self._map, offset + 4 + i * _IMAGE.size)
+
+			extensions = [extension for extension, flag in _CACHE_FLAGS
+						  if flags & flag]
+
+			if extensions:
+				images[self.directories[directory_index]] = sorted(
+					extensions, key=EXTENSIONS.index)
+
+		return images
+
+	def close(self):
+		self._map.close()
+
+
+class _DirectoryIndex(object):
+	# Used when a theme has no (up to date) icon-theme.cache: one listdir()
+	# per subdirectory, instead of a stat() per candidate file
+	def __init__(self, path):
+		self._images = {}
+
+		for root, subdirs, files in os.walk(path):
+			subdir = os.path.relpath(root, path)
+
+			if subdir == '.':
+				continue
+
+			for filename in files:
+				name, _, extension = filename.rpartition('.')
+
+				if extension in EXTENSIONS:
+					self._images.setdefault(name, {}).setdefault(
+						subdir, []).append(extension)
+
+		for images in self._images.values():
+			for extensions in images.values():
+				extensions.sort(key=EXTENSIONS.index)
+
+	def lookup(self, name):
+		return self._images.get(name, {})
+
+
+def _mtime(path):
+	try:
+		return os.stat(path).st_mtime_ns
+
+	except OSError:
+		return None
+
+
+def _get_index(theme_dir):
+	with _lock:
+		return _get_index_locked(theme_dir)
+
+
+def _get_index_locked(theme_dir):
+	mtime = _mtime(theme_dir)
+	cached = _indexes.get(theme_dir)
+
+	if cached is not None and cached[0] == mtime:
+		return cached[1]
+
+	if cached is not None and isinstance(cached[1], IconCache):
+		cached[1].close()
+
+	index = None
+	cache_file = os.path.join(theme_dir, 'icon-theme.cache')
+	cache_mtime = _mtime(cache_file)
+
+	# Like GTK, only trust a cache at least as new as the theme directory
+	if cache_mtime is not None and cache_mtime >= mtime:
+		try:
+			index = IconCache(cache_file)
+		except (IOError, OSError, ValueError):
+			pass
+
+	if index is None:
+		index = _DirectoryIndex(theme_dir)
+
+	_indexes[theme_dir] = (mtime, index)
+
+	return index
+
+
+def get_base_dirs():
+	'''Get the directories which contain icon themes.
+
+	As defined by the `Icon Theme Specification <https://specifications.freedesktop.org/icon-theme-spec/latest/>`_:
+	``~/.icons``, ``icons`` in each data directory (see :func:`libdesktop.directories.get_data_dirs`) and ``/usr/share/pixmaps``.
+
+	Returns:
+			list: The directories, most important first.
+	'''
+
+	return ([os.path.expanduser('~/.icons')] +
+			[os.path.join(data_dir, 'icons')
+			 for data_dir in directories.get_data_dirs()] +
+			['/usr/share/pixmaps'])
+
+
+def get_theme_name():
+	'''Get the name of the user's icon theme.
+
+	Read from the GTK settings (``gtk-icon-theme-name``) or the KDE settings (``[Icons] Theme``), without starting any program.
+
+	Returns:
+			str: The name of the icon theme, or ``hicolor`` if none is set.
+	'''
+
+	config_dirs = directories.get_config_dirs()
+
+	candidates = [(os.path.join(config_dir, gtk, 'settings.ini'),
+				   'Settings', 'gtk-icon-theme-name')
+				  for gtk in ['gtk-4.0', 'gtk-3.0'] for config_dir in config_dirs]
+
+	candidates += [(os.path.join(config_dir, 'kdeglobals'), 'Icons', 'Theme')
+				   for config_dir in config_dirs]
+
+	for path, section, key in candidates:
+		if not os.path.isfile(path):
+			continue
+
+		config = configparser.RawConfigParser(strict=False)
+
+		try:
+			with io.open(path, encoding='utf-8', errors='replace') as f:
+				config.read_file(f)
+
+			value = config.get(section, key).strip().strip('"\'')
+
+		except (configparser.Error, IOError, OSError):
+			continue
+
+		if value:
+			return value
+
+	return 'hicolor'
+
+
+class Theme(object):
+	'''An icon theme.
+
+	Args:
+			name (str): The name of the theme (the name of its directory, like ``hicolor``).
+
+	Attributes:
+			name		(str) : The name of the theme.
+			dirs		(list): The directories of the theme (one per base directory it exists in).
+			parents	 (list): The names of the themes this theme inherits from.
+			directories (list): The subdirectories of the theme, each a ``dict`` with its ``Size``, ``Scale``, ``Type``,
+								``MinSize``, ``MaxSize`` and ``Threshold``.
+	'''
+
+	def __init__(self, name):
+		self.name = name
+		self.dirs = [os.path.join(base_dir, name) for base_dir in get_base_dirs()
+					 if os.path.isdir(os.path.join(base_dir, name))]
+		self.parents = []
+		self.directories = []
+
+		for theme_dir in self.dirs:
+			index_file = os.path.join(theme_dir, 'index.theme')
+
+			if os.path.isfile(index_file):
+				self._read_index(desktopfile.parse(index_file))
+				break
+
+	def _read_index(self, index):
+		theme = index.group('Icon Theme')
+
+		self.parents = [parent.strip() for parent in
+						theme.get('Inherits', '').split(',') if parent.strip()]
+
+		names = (theme.get('Directories', '').split(',') +
+				 theme.get('ScaledDirectories', '').split(','))
+
+		for name in names:
+			name = name.strip()
+			group = index.group(name)
+
+			if not name or not group:
+				continue
+
+			try:
+				size = int(group['Size'])
+				directory = {
+					'name': name,
+					'Size': size,
+					'Scale': int(group.get('Scale', 1)),
+					'Type': group.get('Type', 'Threshold'),
+					'MinSize': int(group.get('MinSize', size)),
+					'MaxSize': int(group.get('MaxSize', size)),
+					'Threshold': int(group.get('Threshold', 2)),
+				}
+
+			except (KeyError, ValueError):
+				continue
+
+			self.directories.append(directory)
+
+	def lookup(self, name, size, scale=1):
+		'''Find an icon in this theme only (not the ones it inherits from).
+
+		Args:
+				name  (str): The icon name, without an extension.
+				size  (int): The wanted size, in pixels.
+				scale (int): The wanted scale (``2`` on HiDPI screens). Defaults to ``1``.
+
+		Returns:
+				str: The path to the closest matching image, or ``None`` if the theme has no such icon.
+		'''
+
+		found = []
+
+		for theme_dir in self.dirs:
+			images = _get_index(theme_dir).lookup(name)
+
+			if images:
+				found.append((theme_dir, images))
+
+		if not found:
+			return None
+
+		closest = None
+		closest_distance = None
+
+		for directory in self.directories:
+			for theme_dir, images in found:
+				extensions = images.get(directory['name'])
+
+				if not extensions:
+					continue
+
+				path = os.path.join(theme_dir, directory['name'],
+									'%s.%s' % (name, extensions[0]))
+
+				if _matches_size(directory, size, scale):
+					return path
+
+				distance = _size_distance(directory, size, scale)
+
+				if closest_distance is None or distance < closest_distance:
+					closest = path
+					closest_distance = distance
+
+		return closest
+
+
+def _matches_size(directory, size, scale):
+	if directory['Scale'] != scale:
+		return False
+
+	if directory['Type'] == 'Fixed':
+		return directory['Size'] == size
+
+	if directory['Type'] == 'Scalable':
+		return directory['MinSize'] <= size <= directory['MaxSize']
+
+	return (directory['Size'] - directory['Threshold'] <= size <=
+			directory['Size'] + directory['Threshold'])
+
+
+def _size_distance(directory, size, scale):
+	wanted = size * scale
+	dir_scale = directory['Scale']
+
+	if directory['Type'] == 'Fixed':
+		return abs(directory['Size'] * dir_scale - wanted)
+
+	if directory['Type'] == 'Scalable':
+		low, high = directory['MinSize'], directory['MaxSize']
+	else:
+		low = directory['Size'] - directory['Threshold']
+		high = directory['Size'] + directory['Threshold']
+
+	if wanted < low * dir_scale:
+		return low * dir_scale - wanted
+
+	if wanted > high * dir_scale:
+		return wanted - high * dir_scale
+
+	return 0
+
+
+def get_theme(name):
+	'''Get an icon theme.
+
+	Args:
+			name (str): The name of the theme.
+
+	Returns:
+			Theme: The theme (cached).
+	'''
+
+	with _lock:
+		_validate()
+
+		theme = _themes.get(name)
+
+		if theme is None:
+			theme = _themes[name] = Theme(name)
+
+		return theme
+
+
+def _validate():
+	# Drop everything if any theme directory changed
+	global _validated, _theme_name
+
+	now = time.monotonic()
+
+	if now - _validated < _VALIDATE_INTERVAL:
+		return
+
+	_validated = now
+
+	theme_name = get_theme_name()
+
+	if theme_name != _theme_name:
+		_theme_name = theme_name
+		_lookups.clear()
+
+	for theme_dir, (mtime, _) in list(_indexes.items()):
+		if _mtime(theme_dir) != mtime:
+			clear_cache()
+			return
+
+
+def _find(name, size, scale, theme_name, seen):
+	if theme_name in seen:
+		return None
+
+	seen.add(theme_name)
+
+	theme = get_theme(theme_name)
+	path = theme.lookup(name, size, scale)
+
+	if path is not None:
+		return path
+
+	for parent in theme.parents:
+		path = _find(name, size, scale, parent, seen)
+
+		if path is not None:
+			return path
+
+	return None
+
+
+def lookup(name, size=48, scale=1, theme=None):
+	'''Find the image file of an icon.
+
+	Find an icon (like the ``Icon`` key of a .desktop file) as described by the `Icon Theme Specification <https://specifications.freedesktop.org/icon-theme-spec/latest/>`_:
+	in the theme and the themes it inherits from, then ``hicolor``, then the base directories themselves (like ``/usr/share/pixmaps``).
+	An exact size match is preferred, otherwise the closest size is used.
+
+	Themes with an up to date ``icon-theme.cache`` are looked up through it (see :class:`IconCache`), others through an index of
+	their directories. Results are cached.
+
+	Args:
+			name  (str): The icon name (without an extension), or an absolute path which is returned as is.
+			size  (int): The wanted size, in pixels. Defaults to ``48``.
+			scale (int): The wanted scale (``2`` on HiDPI screens). Defaults to ``1``.
+			theme (str): The icon theme. Defaults to the user's (see :func:`get_theme_name`).
+
+	Returns:
+			str: The path to the image, or ``None`` if there is no such icon.
+	'''
+
+	if os.path.isabs(name):
+		return name if os.path.isfile(name) else None
+
+	with _lock:
+		_validate()
+
+		key = (name, size, scale, theme or _theme_name)
+
+		if key in _lookups:
+			return _lookups[key]
+
+		seen = set()
+		path = _find(name, size, scale, key[3], seen)
+
+		if path is None:
+			path = _find(name, size, scale, 'hicolor', seen)
+
+		if path is None:
+			path = _lookup_fallback(name)
+
+		_lookups[key] = path
+
+		return path
+
+
+def _lookup_fallback(name):
+	for base_dir in get_base_dirs():
+		for extension in EXTENSIONS:
+			path = os.path.join(base_dir, '%s.%s' % (name, extension))
+
+			if os.path.isfile(path):
+				return path
+
+	return None
+
+
+def clear_cache():
+	'''Forget all cached themes and lookups.
+
+	Changes to icon themes are noticed within a few seconds anyway, this makes them visible at once.
+	'''
+
+	with _lock:
+		for _, index in _indexes.values():
+			if isinstance(index, IconCache):
+				index.close()
+
+		_lookups.clear()
+		_themes.clear()
+		_indexes.clear()
+
+		global _validated
+		_validated = 0
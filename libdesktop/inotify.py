@@ -0,0 +1,187 @@
+# coding: utf-8
+
+# This file is part of libdesktop
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Bharadwaj Raju
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import sys
+import errno
+import struct
+import select
+import ctypes
+import ctypes.util
+from collections import namedtuple
+
+IN_ACCESS = 0x00000001
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_CLOSE_NOWRITE = 0x00000010
+IN_OPEN = 0x00000020
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+
+IN_UNMOUNT = 0x00002000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+Event = namedtuple('Event', ['wd', 'mask', 'cookie', 'name'])
+'''An inotify event: the watch descriptor, event mask, cookie (pairs up moves) and file name (``''`` for the watched directory itself).'''
+
+_libc = None
+
+
+def _get_libc():
+	global _libc
+
+	if _libc is None:
+		if not sys.platform.startswith('linux'):
+			raise OSError(errno.ENOSYS, 'inotify is only available on Linux')
+
+		libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+						   use_errno=True)
+
+		libc.inotify_init1.argtypes = [ctypes.c_int]
+		libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+										   ctypes.c_uint32]
+		libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+
+		_libc = libc
+
+	return _libc
+
+
+def _check(result):
+	if result < 0:
+		error = ctypes.get_errno()
+		raise OSError(error, os.strerror(error))
+
+	return result
+
+
+def is_available():
+	'''Check if inotify can be used.
+
+	Returns:
+			bool: Is inotify supported on this system?
+	'''
+
+	try:
+		_get_libc()
+	except (OSError, AttributeError):
+		return False
+
+	return True
+
+
+class Inotify(object):
+	'''An inotify instance, through ``ctypes``.
+
+	Raises:
+			OSError: if inotify is not available.
+	'''
+
+	def __init__(self):
+		self._libc = _get_libc()
+		self.fd = _check(self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+
+	def fileno(self):
+		return self.fd
+
+	def add_watch(self, path, mask):
+		'''Watch a path.
+
+		Args:
+				path (str): The path to watch.
+				mask (int): The events to watch for (``IN_*`` flags).
+
+		Returns:
+				int: The watch descriptor.
+		'''
+
+		return _check(self._libc.inotify_add_watch(
+			self.fd, os.fsencode(path), mask))
+
+	def rm_watch(self, wd):
+		'''Stop watching a watch descriptor.'''
+
+		_check(self._libc.inotify_rm_watch(self.fd, wd))
+
+	def read_events(self, timeout=None):
+		'''Read pending events.
+
+		Args:
+				timeout (float): Seconds to wait for events. Defaults to ``None`` (wait forever).
+
+		Returns:
+				list: A list of :data:`Event` s (empty if the timeout expired).
+		'''
+
+		if timeout is None or timeout > 0:
+			readable = select.select([self.fd], [], [], timeout)[0]
+
+			if not readable:
+				return []
+
+		try:
+			data = os.read(self.fd, 65536)
+		except OSError as e:
+			if e.errno == errno.EAGAIN:
+				return []
+			raise
+
+		events = []
+		offset = 0
+
+		while offset + _EVENT_HEADER.size <= len(data):
+			wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+			offset += _EVENT_HEADER.size
+
+			name = data[offset:offset + length].rstrip(b'\0')
+			offset += length
+
+			events.append(Event(wd, mask, cookie, os.fsdecode(name)))
+
+		return events
+
+	def close(self):
+		if self.fd >= 0:
+			os.close(self.fd)
+			self.fd = -1
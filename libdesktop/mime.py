@@ -0,0 +1,371 @@
+# coding: utf-8
+
+# This file is part of libdesktop
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Bharadwaj Raju
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+
+import os
+import fnmatch
+import threading
+
+from libdesktop import catalog
+from libdesktop import desktopfile
+from libdesktop import directories
+from libdesktop import processes
+from libdesktop import system
+
+_lock = threading.Lock()
+
+# mime type → (stamp, default, applications)
+_resolved = {}
+
+# path → (mtime, parsed contents) of shared-mime-info files
+_mime_files = {}
+
+
+def _mtime(path):
+	try:
+		return os.stat(path).st_mtime_ns
+
+	except OSError:
+		return None
+
+
+def _current_desktops():
+	return [desktop.lower() for desktop in
+			os.getenv('XDG_CURRENT_DESKTOP', '').split(':') if desktop]
+
+
+def get_mimeapps_files():
+	'''Get the files which define the default applications.
+
+	Get the ``mimeapps.list`` files (and the ``mimeinfo.cache`` files generated by ``update-desktop-database``) in the
+	order defined by the `Association between MIME types and applications <https://specifications.freedesktop.org/mime-apps-spec/latest/>`_
+	specification, most important first. Desktop-specific files (like ``gnome-mimeapps.list``) are included for every
+	desktop in ``$XDG_CURRENT_DESKTOP``.
+
+	Returns:
+			list: A list of lists of paths (which may not exist), one list per directory. Each is in order of importance.
+	'''
+
+	desktops = _current_desktops()
+
+	levels = []
+
+	for config_dir in directories.get_config_dirs():
+		levels.append(
+			[os.path.join(config_dir, '%s-mimeapps.list' % desktop)
+			 for desktop in desktops] +
+			[os.path.join(config_dir, 'mimeapps.list')])
+
+	for apps_dir in catalog.get_application_dirs():
+		levels.append(
+			[os.path.join(apps_dir, '%s-mimeapps.list' % desktop)
+			 for desktop in desktops] +
+			[os.path.join(apps_dir, 'mimeapps.list'),
+			 os.path.join(apps_dir, 'mimeinfo.cache')])
+
+	return levels
+
+
+def _read_groups(path, mtime):
+	if mtime is None:
+		return {}
+
+	return desktopfile.parse(path).groups
+
+
+def _split(value):
+	return [desktop_id for desktop_id in value.split(';') if desktop_id]
+
+
+def _resolve(mime_type, levels, installed):
+
+	default = None
+	applications = []
+	removed = set()
+
+	for level in levels:
+		for path, mtime in level:
+			groups = _read_groups(path, mtime)
+
+			if path.endswith('mimeinfo.cache'):
+				added = groups.get('MIME Cache', {})
+			else:
+				added = groups.get('Added Associations', {})
+
+			if default is None:
+				for desktop_id in _split(groups.get(
+						'Default Applications', {}).get(mime_type, '')):
+					if desktop_id in installed and desktop_id not in removed:
+						default = desktop_id
+						break
+
+			for desktop_id in _split(added.get(mime_type, '')):
+				if (desktop_id in installed and desktop_id not in removed and
+						desktop_id not in applications):
+					applications.append(desktop_id)
+
+			# Removals apply to the files after this one only
+			removed.update(_split(groups.get(
+				'Removed Associations', {}).get(mime_type, '')))
+
+	if default is None and applications:
+		default = applications[0]
+
+	return default, applications
+
+
+def _lookup(mime_type):
+	levels = [[(path, _mtime(path)) for path in level]
+			  for level in get_mimeapps_files()]
+
+	# The catalog is part of the stamp, as entries must be installed
+	installed = catalog.get_installed()
+	stamp = (tuple(tuple(level) for level in levels), installed._version)
+
+	with _lock:
+		cached = _resolved.get(mime_type)
+
+		if cached is not None and cached[0] == stamp:
+			return cached[1], cached[2]
+
+		default, applications = _resolve(mime_type, levels, installed)
+
+		_resolved[mime_type] = (stamp, default, applications)
+
+	return default, applications
+
+
+def _read_mime_file(path, parse_line):
+	mtime = _mtime(path)
+
+	cached = _mime_files.get(path)
+
+	if cached is not None and cached[0] == mtime:
+		return cached[1]
+
+	result = []
+
+	if mtime is not None:
+		with open(path) as f:
+			for line in f:
+				if line.strip() and not line.startswith('#'):
+					parsed = parse_line(line.rstrip('\n'))
+
+					if parsed is not None:
+						result.append(parsed)
+
+	_mime_files[path] = (mtime, result)
+
+	return result
+
+
+def _mime_data_files(name):
+	return [os.path.join(data_dir, 'mime', name)
+			for data_dir in directories.get_data_dirs()]
+
+
+def _parse_pair(line):
+	pair = line.split()
+
+	return tuple(pair) if len(pair) == 2 else None
+
+
+def get_parent_types(mime_type):
+	'''Get the MIME types a MIME type is a subclass of.
+
+	Uses the ``aliases`` and ``subclasses`` files from `shared-mime-info <https://specifications.freedesktop.org/shared-mime-info-spec/latest/>`_.
+
+	Args:
+			mime_type (str): The MIME type, for example ``text/x-python``.
+
+	Returns:
+			list: The canonical MIME type followed by its ancestors, closest first (for example ``['text/x-python', 'text/plain']``).
+	'''
+
+	aliases = {}
+	subclasses = {}
+
+	with _lock:
+		for path in _mime_data_files('aliases'):
+			for alias, canonical in _read_mime_file(path, _parse_pair):
+				aliases.setdefault(alias, canonical)
+
+		for path in _mime_data_files('subclasses'):
+			for child, parent in _read_mime_file(path, _parse_pair):
+				subclasses.setdefault(child, []).append(parent)
+
+	result = [aliases.get(mime_type, mime_type)]
+
+	for current in result:
+		for parent in subclasses.get(current, []):
+			parent = aliases.get(parent, parent)
+
+			if parent not in result:
+				result.append(parent)
+
+	# Every text file can be handled as plain text, everything as a stream of bytes
+	if mime_type.startswith('text/') and 'text/plain' not in result:
+		result.append('text/plain')
+
+	return result
+
+
+def get_default_application(mime_type):
+	'''Get the default application for a MIME type.
+
+	Get the user's preferred application for a MIME type, without running ``xdg-mime``. Results are
+	cached, and recomputed only when one of the files from :func:`get_mimeapps_files` changes.
+
+	If no application is associated with the MIME type itself, the MIME types it is a subclass of
+	are tried (see :func:`get_parent_types`).
+
+	Args:
+			mime_type (str): The MIME type, for example ``text/plain``.
+
+	Returns:
+			str: The desktop ID (for example ``org.gnome.gedit.desktop``) of the application, or ``None`` if there is none.
+	'''
+
+	for candidate in get_parent_types(mime_type):
+		default = _lookup(candidate)[0]
+
+		if default is not None:
+			return default
+
+	return None
+
+
+def get_applications(mime_type):
+	'''Get all applications for a MIME type.
+
+	Args:
+			mime_type (str): The MIME type, for example ``text/plain``.
+
+	Returns:
+			list: The desktop IDs of the applications associated with the MIME type, most preferred first.
+	'''
+
+	return list(_lookup(mime_type)[1])
+
+
+def _parse_glob(line):
+	fields = line.split(':')
+
+	if len(fields) < 3:
+		return None
+
+	case_sensitive = len(fields) > 3 and 'cs' in fields[3].split(',')
+
+	return int(fields[0]), fields[1], fields[2], case_sensitive
+
+
+_glob_index = (None, None)
+
+
+def _get_glob_index():
+	'''Sort the globs into simple extensions (``*.txt``), looked up by the
+	name's suffixes, and everything else, matched one by one.'''
+
+	global _glob_index
+
+	paths = _mime_data_files('globs2')
+	stamp = tuple(_mtime(path) for path in paths)
+
+	if _glob_index[0] == stamp:
+		return _glob_index[1]
+
+	extensions = {}
+	patterns = []
+
+	for path in paths:
+		for glob in _read_mime_file(path, _parse_glob):
+			pattern = glob[2]
+
+			if (pattern.startswith('*.') and
+					not any(char in pattern[2:] for char in '*?[')):
+				key = pattern[2:] if glob[3] else pattern[2:].lower()
+				extensions.setdefault(key, []).append(glob)
+
+			else:
+				patterns.append(glob)
+
+	_glob_index = (stamp, (extensions, patterns))
+
+	return _glob_index[1]
+
+
+@processes.driven
+def get_file_type(file_path):
+	'''Get the MIME type of a file.
+
+	Get the MIME type of a file from its name, using the ``globs2`` files of `shared-mime-info <https://specifications.freedesktop.org/shared-mime-info-spec/latest/>`_.
+	If the name does not match any pattern, falls back to ``xdg-mime query filetype`` (which looks at the contents).
+
+	Args:
+			file_path (str): The path to the file.
+
+	Returns:
+			str: The MIME type of the file.
+	'''
+
+	if os.path.isdir(file_path):
+		return 'inode/directory'
+
+	name = os.path.basename(file_path)
+	lower_name = name.lower()
+
+	with _lock:
+		extensions, patterns = _get_glob_index()
+
+	candidates = []
+
+	# Every suffix after a dot, for example tar.gz and gz for foo.tar.gz
+	for i, char in enumerate(name):
+		if char == '.':
+			for glob in extensions.get(name[i + 1:], []):
+				if glob[3]:
+					candidates.append(glob)
+
+			for glob in extensions.get(lower_name[i + 1:], []):
+				if not glob[3]:
+					candidates.append(glob)
+
+	for glob in patterns:
+		if glob[3]:
+			matched = fnmatch.fnmatchcase(name, glob[2])
+		else:
+			matched = fnmatch.fnmatchcase(lower_name, glob[2].lower())
+
+		if matched:
+			candidates.append(glob)
+
+	if candidates:
+		# Higher weights win, then longer (more specific) patterns
+		return max(candidates, key=lambda glob: (glob[0], len(glob[2])))[1]
+
+	return (yield from system._run_until_success(
+		[['xdg-mime', 'query', 'filetype', file_path]], check=True)).stdout
@@ -0,0 +1,2072 @@
+# coding: utf-8
+
+# This file is part of libdesktop
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2016 Bharadwaj Raju
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import os
+import sys
+import time
+import errno
+import functools
+import signal
+import json
+import select
+import socket
+import threading
+import traceback
+import contextvars
+import subprocess as sp
+from collections import namedtuple, deque
+
+PIPE = sp.PIPE
+DEVNULL = sp.DEVNULL
+STDOUT = sp.STDOUT
+
+
+SpawnRecord = namedtuple('SpawnRecord', ['args', 'api', 'started', 'duration',
+										 'returncode'])
+SpawnRecord.__doc__ = '''A program started by libdesktop, see :func:`get_spawn_records`.
+
+Attributes:
+		args	   (list) : The arguments (or the command, for a shell).
+		api		(str)  : The libdesktop function which was called to start it, for example ``libdesktop.volume.mute``.
+		started	(float): When it was started, as a :func:`time.time` timestamp.
+		duration   (float): The number of seconds from starting the program until it exited (or failed to start).
+		returncode (int)  : The exit status, or ``None`` if the program could not be started or was double-forked (see :func:`spawn`).
+'''
+
+# The most recent records, and (count, seconds) per API
+_MAX_RECORDS = 1000
+_records = deque(maxlen=_MAX_RECORDS)
+_totals = {}
+_hooks = []
+_stats_lock = threading.Lock()
+
+# The public function being run, set by driven() and libdesktop.aio
+_api = contextvars.ContextVar('libdesktop_api', default=None)
+
+# The SpawnCounters active in this thread or task
+_counters = contextvars.ContextVar('libdesktop_spawn_counters', default=())
+
+
+class SpawnCounter(object):
+	'''Counts the programs started in a block of code, see :func:`count_spawns`.
+
+	Attributes:
+			count	(int)  : The number of programs started.
+			duration (float): The total number of seconds they ran for (so far, for programs which still run).
+			records  (list) : A :class:`SpawnRecord` for each program which exited.
+	'''
+
+	def __init__(self):
+		self.count = 0
+		self.duration = 0.0
+		self.records = []
+		self._lock = threading.Lock()
+		self._token = None
+
+	def __enter__(self):
+		self._token = _counters.set(_counters.get() + (self,))
+		return self
+
+	def __exit__(self, *exc_info):
+		_counters.reset(self._token)
+
+	def __repr__(self):
+		return '<SpawnCounter %d programs, %.3fs>' % (self.count, self.duration)
+
+
+def count_spawns():
+	'''Count the programs started in a block of code.
+
+	Only counts programs started by the current thread (or :mod:`asyncio` task), including those started by nested calls.
+	Programs started in the background add their running time once they exit, even after the end of the block.
+
+	Example:
+			>>> with count_spawns() as spawns:
+			...     libdesktop.volume.mute()
+			>>> assert spawns.count <= 1
+
+	Returns:
+			SpawnCounter: The counter, to use in a ``with`` statement.
+	'''
+
+	return SpawnCounter()
+
+
+def _get_api(frame):
+	# The outermost libdesktop function on the stack, which is the one the
+	# user called
+	outermost = None
+
+	while frame is not None:
+		if frame.f_globals.get('__name__', '').startswith('libdesktop.'):
+			outermost = frame
+
+		frame = frame.f_back
+
+	if outermost is None:
+		return None
+
+	return '%s.%s' % (outermost.f_globals['__name__'],
+					  outermost.f_code.co_name)
+
+
+def _spawn_started(args):
+	# Returns the accounting for a program about to be started, to pass to
+	# _spawn_exited()
+	counters = _counters.get()
+
+	for counter in counters:
+		with counter._lock:
+			counter.count += 1
+
+	return (args, _api.get() or _get_api(sys._getframe(1)), time.time(),
+			time.monotonic(), counters)
+
+
+def _spawn_exited(accounting, returncode):
+	args, api, started, start, counters = accounting
+	record = SpawnRecord(args, api, started, time.monotonic() - start,
+						 returncode)
+
+	with _stats_lock:
+		_records.append(record)
+		count, duration = _totals.get(api, (0, 0.0))
+		_totals[api] = (count + 1, duration + record.duration)
+		hooks = list(_hooks)
+
+	for counter in counters:
+		with counter._lock:
+			counter.duration += record.duration
+			counter.records.append(record)
+
+	for hook in hooks:
+		try:
+			hook(record)
+		except Exception:
+			# Must not break the program (or the reaper thread)
+			traceback.print_exc()
+
+
+def get_spawn_records():
+	'''Get the programs libdesktop started, most recent last.
+
+	Only the last 1000 are kept. A program is recorded when it exits.
+
+	Returns:
+			list: :class:`SpawnRecord` objects.
+	'''
+
+	with _stats_lock:
+		return list(_records)
+
+
+def get_spawn_totals():
+	'''Get the number of programs started, and for how long they ran, per libdesktop function.
+
+	Returns:
+			dict: ``{api: (count, seconds)}``, where ``api`` is a name like ``libdesktop.volume.mute``.
+	'''
+
+	with _stats_lock:
+		return dict(_totals)
+
+
+def reset_spawn_stats():
+	'''Forget the records and totals, see :func:`get_spawn_records` and :func:`get_spawn_totals`.'''
+
+	with _stats_lock:
+		_records.clear()
+		_totals.clear()
+
+
+def add_spawn_hook(hook):
+	'''Call a function whenever a program started by libdesktop exits.
+
+	Hooks for programs started in the background run in the reaper thread, so they should be quick.
+
+	Args:
+			hook (function): Called with a :class:`SpawnRecord`.
+	'''
+
+	with _stats_lock:
+		_hooks.append(hook)
+
+
+def remove_spawn_hook(hook):
+	'''Stop calling a function added with :func:`add_spawn_hook`.'''
+
+	with _stats_lock:
+		_hooks.remove(hook)
+
+
+class Child(object):
+	'''A program started by :func:`spawn`.
+
+	Works like a (smaller) :class:`subprocess.Popen`.
+
+	Attributes:
+			args	   (list): The arguments the program was started with.
+			pid		(int) : The process ID.
+			returncode (int) : The exit status, ``None`` while the program runs or if the exit status was lost (the program was reaped elsewhere). Negative if it was killed by a signal.
+			stdin	  (file): The program's input if ``stdin`` was :data:`PIPE`, else ``None``. Likewise for ``stdout`` and ``stderr``.
+			detached   (bool): Whether the program was started with ``detach``.
+	'''
+
+	def __init__(self, args, pid, popen=None, stdin=None, stdout=None,
+				 stderr=None, detached=False, orphaned=False):
+		self.args = args
+		self.pid = pid
+		self.returncode = None
+		self.stdin = stdin
+		self.stdout = stdout
+		self.stderr = stderr
+		self.detached = detached
+
+		self._popen = popen
+		self._pidfd = None
+		self._lock = threading.Lock()
+		self._exited = threading.Event()
+
+		# A double-forked program is not our child, its exit status can not
+		# be known
+		self._orphaned = orphaned
+
+		# Set once the reaper is responsible for waiting
+		self._reaped_in_background = False
+
+		# See _spawn_started()
+		self._accounting = None
+
+	def __repr__(self):
+		return '<Child %d %s>' % (self.pid, self.args)
+
+	def _reap(self, block):
+		if self._orphaned or self._exited.is_set():
+			return self.returncode
+
+		if not self._lock.acquire(block):
+			return None
+
+		try:
+			if self._exited.is_set():
+				return self.returncode
+
+			if self._popen is not None:
+				returncode = self._popen.wait() if block else self._popen.poll()
+
+			else:
+				try:
+					pid, status = os.waitpid(
+						self.pid, 0 if block else os.WNOHANG)
+
+				except ChildProcessError:
+					# Reaped by someone else, the status is lost. It exited,
+					# but not necessarily successfully
+					pid, status = self.pid, None
+
+				if pid == 0:
+					return None
+
+				returncode = None if status is None else _exit_code(status)
+
+			if returncode is None and self._popen is not None:
+				return None
+
+			self.returncode = returncode
+
+			if self._pidfd is not None:
+				os.close(self._pidfd)
+				self._pidfd = None
+
+			self._exited.set()
+
+			if self._accounting is not None:
+				_spawn_exited(self._accounting, returncode)
+
+			return returncode
+
+		finally:
+			self._lock.release()
+
+	def poll(self):
+		'''Check if the program has exited.
+
+		Returns:
+				int: The exit status, or ``None`` if the program is still running.
+		'''
+
+		if self._reaped_in_background:
+			return self.returncode
+
+		return self._reap(False)
+
+	def wait(self, timeout=None):
+		'''Wait for the program to exit.
+
+		Args:
+				timeout (float): The maximum number of seconds to wait. Defaults to ``None`` (no limit).
+
+		Returns:
+				int: The exit status (``None`` for double-forked programs, see :func:`spawn`, and if the exit status was lost).
+
+		Raises:
+				subprocess.TimeoutExpired: If the program is still running after ``timeout`` seconds.
+		'''
+
+		if self._orphaned:
+			return None
+
+		if self._reaped_in_background:
+			if not self._exited.wait(timeout):
+				raise sp.TimeoutExpired(self.args, timeout)
+
+			return self.returncode
+
+		if timeout is None:
+			return self._reap(True)
+
+		if self._popen is not None:
+			self._popen.wait(timeout)
+			return self._reap(True)
+
+		deadline = time.monotonic() + timeout
+
+		# The same backoff as subprocess, unless the kernel can tell us
+		delay = 0.0005
+		pidfd = _pidfd_open(self.pid)
+
+		try:
+			while self._reap(False) is None and not self._exited.is_set():
+				remaining = deadline - time.monotonic()
+
+				if remaining <= 0:
+					raise sp.TimeoutExpired(self.args, timeout)
+
+				if pidfd is not None:
+					select.select([pidfd], [], [], remaining)
+				else:
+					delay = min(delay * 2, remaining, 0.05)
+					time.sleep(delay)
+
+		finally:
+			if pidfd is not None:
+				os.close(pidfd)
+
+		return self.returncode
+
+	def communicate(self, timeout=None):
+		'''Read all of the program's output, and wait for it to exit.
+
+		Reads :attr:`stdout` and :attr:`stderr` at the same time, so that neither can fill up and block the program.
+
+		Args:
+				timeout (float): The maximum number of seconds to wait. Defaults to ``None`` (no limit).
+
+		Returns:
+				tuple: What the program wrote to ``stdout`` and to ``stderr`` (``None`` for those which are not :data:`PIPE`).
+
+		Raises:
+				subprocess.TimeoutExpired: If the program is still running after ``timeout`` seconds, with the output read so far.
+		'''
+
+		if os.name == 'nt' and self._popen is not None:
+			output = self._popen.communicate(timeout=timeout)
+			self.wait()
+			return output
+
+		deadline = None if timeout is None else time.monotonic() + timeout
+		pipes = [pipe for pipe in [self.stdout, self.stderr] if pipe is not None]
+		chunks = dict((pipe, []) for pipe in pipes)
+
+		def output(pipe):
+			if pipe is None:
+				return None
+
+			return b''.join(chunks[pipe])
+
+		poller = select.poll()
+
+		for pipe in pipes:
+			poller.register(pipe, select.POLLIN)
+
+		open_pipes = dict((pipe.fileno(), pipe) for pipe in pipes)
+
+		while open_pipes:
+			if deadline is None:
+				events = poller.poll()
+			else:
+				remaining = deadline - time.monotonic()
+
+				if remaining <= 0:
+					raise sp.TimeoutExpired(self.args, timeout,
+											output=output(self.stdout),
+											stderr=output(self.stderr))
+
+				events = poller.poll(remaining * 1000)
+
+			for fd, event in events:
+				data = os.read(fd, 65536)
+
+				if data:
+					chunks[open_pipes[fd]].append(data)
+
+				else:
+					poller.unregister(fd)
+					open_pipes.pop(fd).close()
+
+		try:
+			self.wait(None if deadline is None else
+					  max(deadline - time.monotonic(), 0))
+
+		except sp.TimeoutExpired:
+			raise sp.TimeoutExpired(self.args, timeout,
+									output=output(self.stdout),
+									stderr=output(self.stderr))
+
+		return output(self.stdout), output(self.stderr)
+
+	def send_signal(self, sig):
+		'''Send a signal to the program, unless it already exited.'''
+
+		if self.returncode is None:
+			try:
+				os.kill(self.pid, sig)
+			except ProcessLookupError:
+				pass
+
+	def terminate(self):
+		'''Ask the program to exit (``SIGTERM``).'''
+
+		if os.name == 'nt' and self._popen is not None:
+			self._popen.terminate()
+		else:
+			self.send_signal(signal.SIGTERM)
+
+	def kill(self):
+		'''Kill the program (``SIGKILL``).'''
+
+		if os.name == 'nt' and self._popen is not None:
+			self._popen.kill()
+		else:
+			self.send_signal(signal.SIGKILL)
+
+
+def _exit_code(status):
+	if os.WIFSIGNALED(status):
+		return -os.WTERMSIG(status)
+
+	return os.WEXITSTATUS(status)
+
+
+def _pidfd_open(pid):
+	# pidfds (Linux 5.3+) become readable when the process exits
+	if not hasattr(os, 'pidfd_open'):
+		return None
+
+	try:
+		return os.pidfd_open(pid)
+	except OSError:
+		return None
+
+
+class _Reaper(object):
+	'''Waits for background children so that they do not become zombies.
+
+	A single thread polls the pidfds of all the children. Where pidfds are not available,
+	every child gets a thread of its own, blocked in ``waitpid()``.
+	'''
+
+	def __init__(self):
+		self._children = {}
+		self._deadlines = {}
+		self._lock = threading.Lock()
+		self._wakeup_read, self._wakeup_write = os.pipe()
+		self._poll = select.poll()
+		self._poll.register(self._wakeup_read, select.POLLIN)
+
+		self._thread = threading.Thread(target=self._run,
+										name='libdesktop-reaper')
+		self._thread.daemon = True
+		self._thread.start()
+
+	def add(self, child, timeout=None):
+		child._reaped_in_background = True
+		pidfd = _pidfd_open(child.pid)
+
+		if pidfd is None:
+			self._add_thread(child, timeout)
+			return
+
+		with self._lock:
+			child._pidfd = pidfd
+			self._children[pidfd] = child
+
+			if timeout is not None:
+				self._deadlines[pidfd] = time.monotonic() + timeout
+
+			self._poll.register(pidfd, select.POLLIN)
+
+		os.write(self._wakeup_write, b'\0')
+
+	def _add_thread(self, child, timeout):
+		timer = None
+
+		if timeout is not None:
+			timer = threading.Timer(timeout, child.kill)
+			timer.daemon = True
+			timer.start()
+
+		def wait():
+			child._reap(True)
+
+			if timer is not None:
+				timer.cancel()
+
+		thread = threading.Thread(target=wait,
+								  name='libdesktop-reaper-%d' % child.pid)
+		thread.daemon = True
+		thread.start()
+
+	def _run(self):
+		while True:
+			with self._lock:
+				deadline = min(self._deadlines.values()) \
+					if self._deadlines else None
+
+			if deadline is None:
+				timeout = None
+			else:
+				timeout = max(0, int((deadline - time.monotonic()) * 1000) + 1)
+
+			for fd, _ in self._poll.poll(timeout):
+				if fd == self._wakeup_read:
+					os.read(fd, 4096)
+					continue
+
+				with self._lock:
+					child = self._children.pop(fd, None)
+					self._deadlines.pop(fd, None)
+					self._poll.unregister(fd)
+
+				if child is not None:
+					# Closes the pidfd as well
+					child._reap(True)
+
+			now = time.monotonic()
+
+			with self._lock:
+				expired = [self._children[fd]
+						   for fd, deadline in self._deadlines.items()
+						   if deadline <= now]
+
+				for child in expired:
+					del self._deadlines[child._pidfd]
+
+			for child in expired:
+				child.kill()
+
+
+_reaper = None
+_reaper_lock = threading.Lock()
+
+
+def _get_reaper():
+	global _reaper
+
+	with _reaper_lock:
+		if _reaper is None:
+			_reaper = _Reaper()
+
+		return _reaper
+
+
+def _forget_reaper():
+	# The reaper thread does not survive a fork()
+	global _reaper, _reaper_lock
+
+	_reaper = None
+	_reaper_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=_forget_reaper)
+
+
+def _open_stream(fd, target, file_actions, parent_ends):
+	# Sets up one of the child's standard streams for posix_spawn(), and
+	# returns the parent's end if it is a pipe
+	if target is None:
+		return None
+
+	if target == DEVNULL:
+		file_actions.append((os.POSIX_SPAWN_OPEN, fd, os.devnull,
+							 os.O_RDWR, 0))
+		return None
+
+	if target == STDOUT:
+		file_actions.append((os.POSIX_SPAWN_DUP2, 1, fd))
+		return None
+
+	if target == PIPE:
+		read_end, write_end = os.pipe()
+
+		if fd == 0:
+			child_end, parent_end = read_end, write_end
+		else:
+			child_end, parent_end = write_end, read_end
+
+		file_actions.append((os.POSIX_SPAWN_DUP2, child_end, fd))
+		parent_ends.append(child_end)
+
+		return parent_end
+
+	if not isinstance(target, int):
+		target = target.fileno()
+
+	file_actions.append((os.POSIX_SPAWN_DUP2, target, fd))
+
+	return None
+
+
+def _posix_spawn(args, env, stdin, stdout, stderr, detach):
+	file_actions = []
+	child_ends = []
+
+	try:
+		stdin_fd = _open_stream(0, stdin, file_actions, child_ends)
+		stdout_fd = _open_stream(1, stdout, file_actions, child_ends)
+		stderr_fd = _open_stream(2, stderr, file_actions, child_ends)
+
+		# The parent's pipe ends are close-on-exec, so they do not leak into
+		# the child
+		pid = os.posix_spawnp(args[0], args,
+							  os.environ if env is None else env,
+							  file_actions=file_actions, setsid=detach)
+
+	except BaseException:
+		for fd in child_ends:
+			os.close(fd)
+
+		raise
+
+	for fd in child_ends:
+		os.close(fd)
+
+	return Child(args, pid,
+				 stdin=os.fdopen(stdin_fd, 'wb') if stdin_fd is not None else None,
+				 stdout=os.fdopen(stdout_fd, 'rb') if stdout_fd is not None else None,
+				 stderr=os.fdopen(stderr_fd, 'rb') if stderr_fd is not None else None,
+				 detached=detach)
+
+
+def _double_fork(args, env, stdin, stdout, stderr):
+	# The classic daemon launch: the program ends up a child of init, so it
+	# never needs to be reaped by us. Only used where posix_spawn() is not
+	# available
+	streams = []
+
+	for fd, target in [(0, stdin), (1, stdout), (2, stderr)]:
+		if target == DEVNULL:
+			target = os.open(os.devnull, os.O_RDWR)
+		elif target == STDOUT:
+			target = 1
+		elif target == PIPE:
+			raise ValueError('Detached programs can not have pipes')
+		elif target is not None and not isinstance(target, int):
+			target = target.fileno()
+
+		streams.append((fd, target))
+
+	status_read, status_write = os.pipe()
+	pid = os.fork()
+
+	if pid == 0:
+		try:
+			os.close(status_read)
+			os.setsid()
+
+			if os.fork() != 0:
+				os.write(status_write, ('pid %d\n' % os.getpid()).encode())
+				os._exit(0)
+
+			os.write(status_write, ('pid %d\n' % os.getpid()).encode())
+
+			for fd, target in streams:
+				if target is not None and target != fd:
+					os.dup2(target, fd)
+
+			# status_write is close-on-exec: EOF tells the parent that
+			# exec() worked
+			if env is None:
+				os.execvp(args[0], args)
+			else:
+				os.execvpe(args[0], args, env)
+
+		except OSError as e:
+			os.write(status_write, ('errno %d\n' % e.errno).encode())
+
+		finally:
+			os._exit(127)
+
+	os.close(status_write)
+
+	for fd, target in streams:
+		if target is not None and target not in [0, 1, 2]:
+			os.close(target)
+
+	status = b''
+
+	while True:
+		data = os.read(status_read, 4096)
+
+		if not data:
+			break
+
+		status += data
+
+	os.close(status_read)
+	os.waitpid(pid, 0)
+
+	grandchild = None
+
+	for line in status.decode().splitlines():
+		key, _, value = line.partition(' ')
+
+		if key == 'errno':
+			error = int(value)
+			raise OSError(error, os.strerror(error), args[0])
+
+		# The intermediate child and the program both report the same pid
+		grandchild = int(value)
+
+	return Child(args, grandchild, detached=True, orphaned=True)
+
+
+def spawn(args, background=False, detach=False, timeout=None, input=None,
+		  stdin=None, stdout=None, stderr=None, shell=False, env=None,
+		  cwd=None, creationflags=0):
+	'''Start a program.
+
+	Start a program as cheaply as possible, and make sure it is waited for.
+
+	Programs are started with ``posix_spawn()`` where available, which does not copy the
+	memory of this process the way ``fork()`` does, so starting a program costs the same
+	from a large process as from a small one. Otherwise, :class:`subprocess.Popen` is used.
+
+	Programs started in the background are waited for by a reaper thread (using pidfds on Linux),
+	so they never linger as zombies, even if the returned :class:`Child` is dropped.
+
+	Args:
+			args	   (list): The arguments, or a ``str`` with ``shell``.
+			background (bool): Return as soon as the program started, instead of waiting for it to exit. Defaults to ``False``.
+			detach	 (bool): Start the program in a session of its own, so that it keeps running when this process exits or its terminal is closed.
+							   Implies ``background``. Where ``posix_spawn()`` is not available, the program is double-forked. Defaults to ``False``.
+			timeout	(float): Kill the program if it is still running after this many seconds. Defaults to ``None`` (no limit).
+			input	  (bytes): Data to write to the program's input, which is closed afterwards. Defaults to ``None``.
+			stdin	  (int)  : What to connect the program's input to: :data:`PIPE`, :data:`DEVNULL`, a file or a file descriptor. Defaults to ``None`` (inherited).
+			stdout	 (int)  : Likewise, for the program's output.
+			stderr	 (int)  : Likewise, for the program's error output. Can also be :data:`STDOUT`.
+			shell	  (bool): Run ``args`` through the shell. Defaults to ``False``.
+			env		(dict) : The environment. Defaults to ``None`` (inherited).
+			cwd		(str)  : The working directory. Defaults to ``None`` (inherited).
+			creationflags (int): Windows only, see :class:`subprocess.Popen`. Defaults to ``0``.
+
+	Note:
+			Without ``background``, a timeout raises :class:`subprocess.TimeoutExpired` after killing the program.
+
+	Returns:
+			Child: The started program. Without ``background``, it has already exited.
+
+	Raises:
+			OSError: If the program could not be started.
+	'''
+
+	background = background or detach
+
+	child = _start(args, detach, input, stdin, stdout, stderr, shell, env, cwd,
+				   creationflags)
+
+	if child._orphaned:
+		return child
+
+	if background:
+		_get_reaper().add(child, timeout)
+		return child
+
+	try:
+		child.wait(timeout)
+
+	except sp.TimeoutExpired:
+		child.kill()
+		child.wait()
+		raise
+
+	return child
+
+
+def _start(args, detach, input, stdin, stdout, stderr, shell, env, cwd,
+		   creationflags):
+	if input is not None:
+		stdin = PIPE
+
+	if shell:
+		if isinstance(args, str):
+			args = [args]
+
+		if os.name != 'nt':
+			args = ['/bin/sh', '-c'] + list(args)
+			shell = False
+
+	args = list(args) if not isinstance(args, str) else args
+
+	use_posix_spawn = (hasattr(os, 'posix_spawnp') and not shell and
+					   cwd is None)
+
+	accounting = _spawn_started(args)
+
+	try:
+		if use_posix_spawn:
+			child = _posix_spawn(args, env, stdin, stdout, stderr, detach)
+
+		elif detach and hasattr(os, 'fork') and cwd is None:
+			child = _double_fork(args, env, stdin, stdout, stderr)
+
+		else:
+			kwargs = {}
+
+			if detach and os.name != 'nt':
+				kwargs['start_new_session'] = True
+
+			if creationflags:
+				kwargs['creationflags'] = creationflags
+
+			popen = sp.Popen(args, stdin=stdin, stdout=stdout, stderr=stderr,
+							 shell=shell, env=env, cwd=cwd, **kwargs)
+
+			child = Child(args, popen.pid, popen=popen, stdin=popen.stdin,
+						  stdout=popen.stdout, stderr=popen.stderr,
+						  detached=detach)
+
+	except OSError:
+		_spawn_exited(accounting, None)
+		raise
+
+	if child._orphaned:
+		# Its exit can not be seen
+		_spawn_exited(accounting, None)
+	else:
+		child._accounting = accounting
+
+	if input is not None:
+		try:
+			child.stdin.write(input)
+		except BrokenPipeError:
+			pass
+
+		child.stdin.close()
+
+	return child
+
+
+# Runs in the fork server, a small Python process started with -S -E, so
+# that starting a program copies its memory rather than ours. Requests come
+# over a SOCK_SEQPACKET socket on fd 0, each with the write end of a pipe for
+# the program's output and a socket for the replies; the output goes straight
+# to the client, never through the fork server.
+_FORKSERVER_SOURCE = '''
+import os, sys, json, socket, threading, subprocess
+
+control = socket.socket(fileno=0)
+
+def run(request, stdout, replies):
+	replies = socket.socket(fileno=replies)
+
+	try:
+		try:
+			child = subprocess.Popen(request['args'], stdin=subprocess.DEVNULL,
+									 stdout=stdout, env=request['env'],
+									 cwd=request['cwd'])
+		except OSError as e:
+			replies.send(json.dumps({'errno': e.errno, 'strerror': e.strerror,
+									 'filename': e.filename}).encode())
+			return
+		finally:
+			os.close(stdout)
+
+		replies.send(json.dumps({'pid': child.pid}).encode())
+		replies.send(json.dumps({'returncode': child.wait()}).encode())
+	except OSError:
+		pass
+	finally:
+		replies.close()
+
+while True:
+	try:
+		message, fds, _, _ = socket.recv_fds(control, 1 << 20, 2)
+	except OSError:
+		break
+
+	# The client exited
+	if not message:
+		break
+
+	if len(fds) != 2:
+		for fd in fds:
+			os.close(fd)
+		continue
+
+	thread = threading.Thread(target=run, args=(json.loads(message.decode()),) + tuple(fds))
+	thread.daemon = True
+	thread.start()
+'''
+
+
+class _ForkServer(object):
+	'''Starts programs on behalf of this process, from a small helper process.'''
+
+	def __init__(self):
+		self._socket, theirs = socket.socketpair(socket.AF_UNIX,
+												 socket.SOCK_SEQPACKET)
+
+		try:
+			self._child = spawn([sys.executable, '-S', '-E', '-c',
+								 _FORKSERVER_SOURCE],
+								background=True, stdin=theirs.fileno())
+		except BaseException:
+			self._socket.close()
+			raise
+		finally:
+			theirs.close()
+
+	def is_alive(self):
+		self._child.poll()
+		return not self._child._exited.is_set()
+
+	def start(self, args, env, cwd):
+		# Returns the read end of the program's output, and the socket the
+		# replies come from
+		request = json.dumps({'args': args,
+							  'env': dict(os.environ if env is None else env),
+							  'cwd': os.getcwd() if cwd is None else cwd})
+
+		read_end, write_end = os.pipe()
+		replies, theirs = socket.socketpair(socket.AF_UNIX,
+											socket.SOCK_SEQPACKET)
+
+		try:
+			socket.send_fds(self._socket, [request.encode('utf-8',
+														  'surrogateescape')],
+							[write_end, theirs.fileno()])
+		except BaseException:
+			os.close(read_end)
+			replies.close()
+			raise
+		finally:
+			os.close(write_end)
+			theirs.close()
+
+		return read_end, replies
+
+	def close(self):
+		# The fork server exits when it sees the end of its socket
+		self._socket.close()
+
+
+_forkserver = None
+_forkserver_enabled = os.environ.get('LIBDESKTOP_FORKSERVER') == '1'
+_forkserver_lock = threading.Lock()
+
+
+def use_forkserver(enabled=True):
+	'''Start programs for :func:`check_output` from a fork server.
+
+	The fork server is a small helper process, started once, which starts programs on request.
+	Their output is sent straight back through a pipe. Starting a program from it costs the same however
+	large this process is. That only helps where a plain ``fork()`` would be used instead of ``posix_spawn()``,
+	as with ``cwd``: otherwise it is about twice as slow as starting the program directly.
+
+	Also enabled by setting the ``LIBDESKTOP_FORKSERVER`` environment variable to ``1``.
+
+	Note:
+			Not used on Windows, or for calls with a ``timeout``. If the fork server can not be started,
+			programs are started directly.
+
+	Args:
+			enabled (bool): Use the fork server (``True``), or start programs directly (``False``, the default), stopping the fork server if it is running.
+	'''
+
+	global _forkserver, _forkserver_enabled
+
+	with _forkserver_lock:
+		_forkserver_enabled = enabled
+
+		if not enabled and _forkserver is not None:
+			_forkserver.close()
+			_forkserver = None
+
+
+def _get_forkserver():
+	global _forkserver
+
+	with _forkserver_lock:
+		if _forkserver is not None and not _forkserver.is_alive():
+			_forkserver.close()
+			_forkserver = None
+
+		if _forkserver is None:
+			_forkserver = _ForkServer()
+
+		return _forkserver
+
+
+def _forget_forkserver():
+	# The fork server belongs to the parent
+	global _forkserver, _forkserver_lock
+
+	if _forkserver is not None:
+		_forkserver._socket.close()
+
+	_forkserver = None
+	_forkserver_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+	os.register_at_fork(after_in_child=_forget_forkserver)
+
+
+def _check_output_forkserver(args, env, cwd):
+	# Returns the exit status and the output, or None if the fork server is
+	# not available
+	try:
+		read_end, replies = _get_forkserver().start(args, env, cwd)
+	except OSError:
+		return None
+
+	# Counted once the fork server answers: if it died, check_output()
+	# starts the program itself, which counts it then
+	accounting = None
+	returncode = None
+
+	try:
+		with replies:
+			reply = replies.recv(4096)
+
+			if not reply:
+				# The fork server died
+				os.close(read_end)
+				return None
+
+			accounting = _spawn_started(args)
+			reply = json.loads(reply.decode('utf-8'))
+
+			if 'errno' in reply:
+				os.close(read_end)
+				raise OSError(reply['errno'], reply['strerror'],
+							  reply['filename'])
+
+			with os.fdopen(read_end, 'rb') as f:
+				output = f.read()
+
+			reply = replies.recv(4096)
+
+			if not reply:
+				# Too late to start the program again
+				raise OSError(errno.EPIPE, 'The fork server exited while %s '
+							  'was running' % args[0])
+
+			returncode = json.loads(reply.decode('utf-8'))['returncode']
+
+			return returncode, output
+
+	finally:
+		if accounting is not None:
+			_spawn_exited(accounting, returncode)
+
+
+def check_output(args, shell=False, timeout=None, env=None, cwd=None):
+	'''Get the output of a program.
+
+	Like :func:`subprocess.check_output`, but started with :func:`spawn` (or from the fork server, see :func:`use_forkserver`).
+
+	Args:
+			args	(list) : The arguments, or a ``str`` with ``shell``.
+			shell   (bool) : Run ``args`` through the shell. Defaults to ``False``.
+			timeout (float): Kill the program if it is still running after this many seconds. Defaults to ``None`` (no limit).
+			env	 (dict) : The environment. Defaults to ``None`` (inherited).
+			cwd	 (str)  : The working directory. Defaults to ``None`` (inherited).
+
+	Returns:
+			bytes: What the program wrote to its output.
+
+	Raises:
+			subprocess.CalledProcessError: If the program exited with a non-zero status.
+			subprocess.TimeoutExpired: If the program was killed after ``timeout`` seconds.
+	'''
+
+	if _forkserver_enabled and timeout is None and os.name != 'nt':
+		if shell:
+			command = ['/bin/sh', '-c'] + ([args] if isinstance(args, str)
+										   else list(args))
+		else:
+			command = list(args)
+
+		result = _check_output_forkserver(command, env, cwd)
+
+		if result is not None:
+			returncode, output = result
+
+			if returncode != 0:
+				raise sp.CalledProcessError(returncode, args, output=output)
+
+			return output
+
+	child = _start(args, False, None, None, PIPE, None, shell, env, cwd, 0)
+
+	if timeout is not None:
+		# The reaper kills the program if the output does not end in time
+		_get_reaper().add(child, timeout)
+
+	with child.stdout:
+		output = child.stdout.read()
+
+	if child.wait() != 0:
+		if timeout is not None and child.returncode == -signal.SIGKILL:
+			raise sp.TimeoutExpired(args, timeout, output=output)
+
+		raise sp.CalledProcessError(child.returncode, args, output=output)
+
+	return output
+
+
+Process = namedtuple('Process', ['pid', 'name', 'exe', 'cmdline'])
+Process.__doc__ = '''A running process, as seen by :func:`iter_processes`.
+
+Attributes:
+		pid	 (int) : The process ID.
+		name	(str) : The name of the process (on Linux, ``/proc/<pid>/comm``, which the kernel cuts to 15 characters).
+		exe	 (str) : The path of the executable, or ``None`` if it can not be read (processes of other users).
+		cmdline (list): The arguments the process was started with. Empty for a moment while a process is replacing its program.
+'''
+
+_MATCHES = ['name', 'basename', 'cmdline']
+
+
+def _read_file(path):
+	try:
+		with open(path, 'rb') as f:
+			return f.read()
+	except (IOError, OSError):
+		return None
+
+
+# PF_KTHREAD, in the flags of /proc/<pid>/stat
+_KERNEL_THREAD = 0x00200000
+
+# Where starttime (field 22 of /proc/<pid>/stat) is in the fields _read_stat()
+# returns
+_STARTTIME = 19
+
+
+def _read_stat(pid):
+	# The fields of /proc/<pid>/stat after the name (which can contain spaces
+	# and parentheses), starting with the state
+	stat = _read_file('/proc/%d/stat' % pid)
+
+	if stat is None:
+		return None
+
+	return stat[stat.rfind(b')') + 2:].split()
+
+
+def _read_starttime(pid):
+	fields = _read_stat(pid)
+
+	return None if fields is None else fields[_STARTTIME]
+
+
+# A process without a command line which started less than this many
+# seconds ago is taken to be in the middle of exec(), and waited for. Older
+# ones (like programs which clear their arguments) cost nothing extra
+_EXEC_GRACE = 0.05
+
+
+def _age(fields):
+	# Seconds since the process started, from its stat fields. The start
+	# time counts clock ticks since boot
+	now = time.clock_gettime(getattr(time, 'CLOCK_BOOTTIME',
+									 time.CLOCK_MONOTONIC))
+
+	return now - int(fields[_STARTTIME]) / os.sysconf('SC_CLK_TCK')
+
+
+def _read_process(pid):
+	# Returns None for processes which exit while being read, zombies and
+	# kernel threads
+	directory = '/proc/%d/' % pid
+
+	cmdline = _read_file(directory + 'cmdline')
+	delay = 0.0005
+
+	while not cmdline:
+		# Either a kernel thread, a zombie, or a process in the middle of
+		# exec() (which spawn() can return before the end of)
+		fields = _read_stat(pid)
+
+		if fields is None or fields[0] == b'Z' or \
+				int(fields[6]) & _KERNEL_THREAD:
+			return None
+
+		if _age(fields) > _EXEC_GRACE:
+			# Not exec(), the command line is really empty
+			break
+
+		# exec() only takes a moment to finish
+		time.sleep(delay)
+		delay = min(delay * 2, 0.005)
+		cmdline = _read_file(directory + 'cmdline')
+
+	comm = _read_file(directory + 'comm')
+
+	if comm is None:
+		return None
+
+	try:
+		exe = os.readlink(directory + 'exe')
+	except OSError:
+		exe = None
+	else:
+		if exe.endswith(' (deleted)'):
+			exe = exe[:-len(' (deleted)')]
+
+	cmdline = os.fsdecode(cmdline).rstrip('\0').split('\0') if cmdline else []
+
+	return Process(pid, os.fsdecode(comm).rstrip('\n'), exe, cmdline)
+
+
+def _iter_ps():
+	# Systems without /proc; the command line is split on spaces, so
+	# arguments containing spaces are not kept together
+	output = check_output(['ps', '-A', '-ww', '-o', 'pid=', '-o', 'args='])
+
+	for line in output.decode('utf-8', 'replace').splitlines():
+		pid, _, args = line.strip().partition(' ')
+		args = args.split()
+
+		# [...] are kernel threads
+		if not args or args[0].startswith('['):
+			continue
+
+		yield Process(int(pid), os.path.basename(args[0]), None, args)
+
+
+def _iter_pids():
+	for entry in os.scandir('/proc'):
+		if entry.name.isdigit():
+			yield int(entry.name)
+
+
+def iter_processes():
+	'''Get the running processes.
+
+	On Linux, ``/proc`` is read directly, without starting any programs. Elsewhere, ``ps`` is used.
+
+	Note:
+			Kernel threads (like ``kthreadd``) are excluded.
+
+	Yields:
+			Process: The running processes.
+	'''
+
+	if not os.path.isdir('/proc/self'):
+		for process in _iter_ps():
+			yield process
+
+		return
+
+	for pid in _iter_pids():
+		process = _read_process(pid)
+
+		if process is not None:
+			yield process
+
+
+def _names(process):
+	# What the process can be found by: its name and the base names of its
+	# executable and first argument
+	names = set([process.name])
+
+	if process.cmdline:
+		names.add(os.path.basename(process.cmdline[0]))
+
+	if process.exe is not None:
+		names.add(os.path.basename(process.exe))
+
+	return names
+
+
+def _paths(process):
+	paths = set(process.cmdline[:1])
+
+	if process.exe is not None:
+		paths.add(process.exe)
+
+	return paths
+
+
+def _matches_comm(process, name):
+	# comm is cut to 15 characters, so a longer name only matches it when there
+	# is nothing better to go by (neither the executable nor the arguments are
+	# readable)
+	return (len(name) > 15 and name[:15] == process.name and
+			process.exe is None and not process.cmdline)
+
+
+def _matches(process, name, match):
+	if match == 'cmdline':
+		return name in ' '.join(process.cmdline)
+
+	names = _names(process)
+
+	if match == 'basename':
+		name = os.path.basename(name)
+
+	return (name in names or _matches_comm(process, name) or
+			(match == 'name' and name in _paths(process)))
+
+
+def find_processes(name, match='name'):
+	'''Find running processes.
+
+	Args:
+			name  (str): What to look for.
+			match (str): How to look:
+
+			 * ``name``: ``name`` is the name of the process, or the name or full path of its executable or of its first argument (default).
+			 * ``basename``: Like ``name``, but only the base name of ``name`` is used, so ``/usr/bin/python3`` also finds ``/opt/bin/python3``.
+			 * ``cmdline``: ``name`` is a part of the command line (the arguments, separated by spaces).
+
+	Returns:
+			list: The process IDs, in ascending order.
+	'''
+
+	if match not in _MATCHES:
+		raise ValueError('match must be one of %s, not %r' %
+						 (', '.join(_MATCHES), match))
+
+	return sorted(process.pid for process in iter_processes()
+				  if _matches(process, name, match))
+
+
+class ProcessSnapshot(object):
+	'''A view of the running processes which can be refreshed cheaply.
+
+	Meant for checking for many processes, often. :meth:`refresh` only reads ``/proc`` for
+	the processes which started since the last refresh, and forgets the ones which exited.
+	The processes are indexed by name, so :meth:`find` and :meth:`is_running` do not go through
+	all of them (except with ``match='cmdline'``).
+
+	Note:
+			A process which replaces its program (``exec()``) keeps its old name and command line in
+			the snapshot, unless that happens within a second of it starting (which covers the usual
+			``fork()`` and ``exec()``). ``refresh(full=True)`` reads all the processes again.
+
+	Example:
+			>>> snapshot = ProcessSnapshot()
+			>>> while True:
+			...     snapshot.refresh()
+			...     running = [name for name in names if snapshot.is_running(name)]
+			...     time.sleep(1)
+	'''
+
+	def __init__(self):
+		self._processes = {}
+		# Processes which started recently, which are read again in case
+		# they were caught between fork() and exec()
+		self._young = {}
+		self._names = {}
+		self._paths = {}
+		self._refreshed = None
+		self._lock = threading.Lock()
+		self.refresh()
+
+	def _index(self, index, key, pid, add):
+		if add:
+			index.setdefault(key, set()).add(pid)
+			return
+
+		pids = index.get(key)
+
+		if pids is not None:
+			pids.discard(pid)
+
+			if not pids:
+				del index[key]
+
+	def _update(self, process, add):
+		for name in _names(process):
+			self._index(self._names, name, process.pid, add)
+
+		for path in _paths(process):
+			self._index(self._paths, path, process.pid, add)
+
+	def _remove(self, pid):
+		_, process = self._processes.pop(pid)
+		self._young.pop(pid, None)
+
+		if process is not None:
+			self._update(process, False)
+
+	def _read(self, pid, identity):
+		process = _read_process(pid)
+		# Kernel threads and zombies are remembered as None, so they are not read again
+		self._processes[pid] = (identity, process)
+
+		if process is not None:
+			self._update(process, True)
+
+		return process
+
+	def refresh(self, full=False):
+		'''Bring the snapshot up to date.
+
+		Args:
+				full (bool): Read all the processes again, not only the new ones. Defaults to ``False``.
+
+		Returns:
+				tuple: Two ``set`` objects: the IDs of the processes which started, and of the ones which exited, since the last refresh.
+		'''
+
+		with self._lock:
+			if not os.path.isdir('/proc/self'):
+				return self._refresh_ps()
+
+			now = time.monotonic()
+			# Processes which were running before the first refresh are not
+			# treated as just started
+			first = self._refreshed is None
+			seen = set()
+			started = set()
+
+			for entry in os.scandir('/proc'):
+				if not entry.name.isdigit():
+					continue
+
+				pid = int(entry.name)
+				seen.add(pid)
+
+				# A reused process ID is told apart from the old process by
+				# its start time. The inode number of /proc/<pid> comes free
+				# with the directory listing, and the process is the same while
+				# it does not change, but it also changes when the kernel
+				# drops the entry from its cache; only then is the start time
+				# read
+				try:
+					inode = entry.inode()
+				except OSError:
+					continue
+
+				known = self._processes.get(pid)
+
+				if known is not None and known[0][0] != inode:
+					starttime = _read_starttime(pid)
+
+					if starttime is not None and starttime == known[0][1]:
+						known = ((inode, starttime), known[1])
+						self._processes[pid] = known
+
+				if known is not None and known[0][0] == inode:
+					started_at = self._young.get(pid)
+
+					if started_at is None and not full:
+						continue
+
+					if started_at is not None and now - started_at >= 1:
+						del self._young[pid]
+
+					if known[1] is not None:
+						self._update(known[1], False)
+
+					self._read(pid, known[0])
+					continue
+
+				if known is not None:
+					self._remove(pid)
+
+				starttime = _read_starttime(pid)
+
+				if starttime is None:
+					# Already exited
+					continue
+
+				started.add(pid)
+				process = self._read(pid, (inode, starttime))
+
+				# A process without a command line is in the middle of exec()
+				if not first or (process is not None and not process.cmdline):
+					self._young[pid] = now
+
+			exited = set(self._processes) - seen
+
+			for pid in exited:
+				self._remove(pid)
+
+			self._refreshed = now
+
+			return started, exited
+
+	def _refresh_ps(self):
+		old = set(self._processes)
+
+		self._processes = {}
+		self._young = {}
+		self._names = {}
+		self._paths = {}
+
+		for process in _iter_ps():
+			self._processes[process.pid] = (None, process)
+			self._update(process, True)
+
+		new = set(self._processes)
+
+		return new - old, old - new
+
+	def _refresh_pids(self, pids):
+		# Like refresh(), but without listing /proc: reads the given process
+		# IDs, which were just assigned, and the young processes again.
+		# Exited processes are only forgotten by the next refresh()
+		with self._lock:
+			now = time.monotonic()
+
+			for pid, started_at in list(self._young.items()):
+				identity, process = self._processes[pid]
+
+				if now - started_at >= 1:
+					del self._young[pid]
+
+				if process is not None:
+					self._update(process, False)
+
+				self._read(pid, identity)
+
+			for pid in pids:
+				if pid in self._processes:
+					# Exited, and its ID was reused
+					self._remove(pid)
+
+				if not _is_process(pid):
+					continue
+
+				starttime = _read_starttime(pid)
+
+				if starttime is None:
+					continue
+
+				try:
+					inode = os.stat('/proc/%d' % pid).st_ino
+				except OSError:
+					continue
+
+				self._read(pid, (inode, starttime))
+				self._young[pid] = now
+
+	def find(self, name, match='name'):
+		'''Find running processes.
+
+		Args:
+				name  (str): What to look for.
+				match (str): How to look. See :func:`find_processes`. Defaults to ``name``.
+
+		Returns:
+				list: The process IDs, in ascending order.
+		'''
+
+		if match not in _MATCHES:
+			raise ValueError('match must be one of %s, not %r' %
+							 (', '.join(_MATCHES), match))
+
+		with self._lock:
+			if match == 'cmdline':
+				return sorted(pid for pid, (_, process) in
+							  self._processes.items()
+							  if process is not None and
+							  _matches(process, name, match))
+
+			if match == 'basename':
+				name = os.path.basename(name)
+
+			pids = set(self._names.get(name, ()))
+
+			if match == 'name':
+				pids.update(self._paths.get(name, ()))
+
+			if len(name) > 15:
+				pids.update(pid for pid in self._names.get(name[:15], ())
+							if _matches_comm(self._processes[pid][1], name))
+
+			return sorted(pids)
+
+	def is_running(self, name, match='name'):
+		'''Check if a process is running.
+
+		Args:
+				name  (str): What to look for.
+				match (str): How to look. See :func:`find_processes`. Defaults to ``name``.
+
+		Returns:
+				bool: Was the process running at the last refresh?
+		'''
+
+		return bool(self.find(name, match))
+
+	def get(self, pid):
+		'''Get a process by its ID.
+
+		Args:
+				pid (int): The process ID.
+
+		Returns:
+				Process: The process, or ``None`` if it is not running or is a kernel thread.
+		'''
+
+		with self._lock:
+			return self._processes.get(pid, (None, None))[1]
+
+	def __iter__(self):
+		with self._lock:
+			processes = [process for _, process in self._processes.values()
+						 if process is not None]
+
+		return iter(sorted(processes))
+
+	def __len__(self):
+		with self._lock:
+			return sum(1 for _, process in self._processes.values()
+					   if process is not None)
+
+	def __contains__(self, pid):
+		return self.get(pid) is not None
+
+
+def _last_pid():
+	# The most recently assigned process ID, which changes whenever a
+	# process (or thread) starts: a much cheaper check than listing /proc
+	loadavg = _read_file('/proc/loadavg')
+
+	return int(loadavg.split()[-1]) if loadavg else None
+
+
+# Reading more new process IDs than this one by one costs more than listing
+# /proc
+_MAX_NEW_PIDS = 256
+
+
+def _new_pids(old_last_pid, last_pid):
+	# The process IDs assigned since old_last_pid, or None if they are not
+	# known (the IDs wrapped around, or too many were assigned)
+	if (old_last_pid is None or last_pid is None or
+			not 0 < last_pid - old_last_pid <= _MAX_NEW_PIDS):
+		return None
+
+	return range(old_last_pid + 1, last_pid + 1)
+
+
+def _is_process(pid):
+	# /proc/<id> exists for threads too, although it is not listed
+	status = _read_file('/proc/%d/status' % pid)
+
+	if status is None:
+		return False
+
+	for line in status.splitlines():
+		if line.startswith(b'Tgid:'):
+			return int(line.split()[1]) == pid
+
+	return False
+
+
+class _ProcessWaiter(object):
+	'''Checks for a process to start, refreshing a :class:`ProcessSnapshot` only when something started.'''
+
+	def __init__(self, name, match):
+		if match not in _MATCHES:
+			raise ValueError('match must be one of %s, not %r' %
+							 (', '.join(_MATCHES), match))
+
+		self.name = name
+		self.match = match
+		self.procfs = os.path.isdir('/proc/self')
+		# Without /proc, every check runs ps
+		self.interval = 0.005 if self.procfs else 0.25
+		self._last_pid = _last_pid()
+		self._snapshot = ProcessSnapshot()
+
+	def poll(self):
+		if self.procfs:
+			last_pid = _last_pid()
+
+			if last_pid != self._last_pid:
+				# Threads start all the time on a desktop, so only the new
+				# IDs are read rather than all of /proc, where possible
+				new_pids = _new_pids(self._last_pid, last_pid)
+				self._last_pid = last_pid
+
+				if new_pids is None:
+					self._snapshot.refresh()
+				else:
+					self._snapshot._refresh_pids(new_pids)
+
+			elif self._snapshot._young:
+				# Processes which just started may still change their name
+				self._snapshot._refresh_pids(())
+
+		else:
+			self._snapshot.refresh()
+
+		return self._snapshot.find(self.name, self.match)
+
+
+def wait_for_process(name, timeout=None, match='name'):
+	'''Wait for a process to start.
+
+	Returns within a few milliseconds of the process starting (or immediately, if it is running already).
+	On Linux, only the process IDs assigned since the last check are read from ``/proc``, so waiting is cheap.
+
+	Args:
+			name	(str)  : What to look for.
+			timeout (float): Give up after this many seconds. Defaults to ``None`` (wait forever).
+			match   (str)  : How to look. See :func:`find_processes`. Defaults to ``name``.
+
+	Returns:
+			list: The IDs of the matching processes, or an empty ``list`` if ``timeout`` ran out first.
+	'''
+
+	waiter = _ProcessWaiter(name, match)
+	deadline = None if timeout is None else time.monotonic() + timeout
+
+	while True:
+		pids = waiter.poll()
+
+		if pids:
+			return pids
+
+		delay = waiter.interval
+
+		if deadline is not None:
+			remaining = deadline - time.monotonic()
+
+			if remaining <= 0:
+				return []
+
+			delay = min(delay, remaining)
+
+		time.sleep(delay)
+
+
+def _is_alive(pid):
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		return False
+	except PermissionError:
+		pass
+
+	return True
+
+
+def _watch_exits(name_or_pid, match):
+	# Returns pidfds for the processes to wait for, and the IDs of the ones
+	# which have to be polled instead
+	if isinstance(name_or_pid, int):
+		pids = [name_or_pid]
+	else:
+		pids = find_processes(name_or_pid, match)
+
+	pidfds = []
+	polled = []
+
+	for pid in pids:
+		pidfd = _pidfd_open(pid)
+
+		if pidfd is not None:
+			pidfds.append(pidfd)
+		elif _is_alive(pid):
+			polled.append(pid)
+
+	return pidfds, polled
+
+
+def wait_for_exit(name_or_pid, timeout=None, match='name'):
+	'''Wait for processes to exit.
+
+	On Linux 5.3 and later, this uses pidfds, so it returns as soon as the processes have exited, without polling.
+
+	Args:
+			name_or_pid (str or int): A process ID, or what to look for (see :func:`find_processes`). With a name, all the processes running at the time of the call are waited for.
+			timeout	 (float)	 : Give up after this many seconds. Defaults to ``None`` (wait forever).
+			match	   (str)	   : How to look. Defaults to ``name``.
+
+	Returns:
+			bool: ``True`` if the processes exited (or none were running), ``False`` if ``timeout`` ran out first.
+	'''
+
+	pidfds, polled = _watch_exits(name_or_pid, match)
+	deadline = None if timeout is None else time.monotonic() + timeout
+	poll = select.poll()
+
+	for pidfd in pidfds:
+		poll.register(pidfd, select.POLLIN)
+
+	try:
+		while pidfds or polled:
+			delay = 0.01 if polled else None
+
+			if deadline is not None:
+				remaining = max(0, deadline - time.monotonic())
+				delay = remaining if delay is None else min(delay, remaining)
+
+			for fd, _ in poll.poll(None if delay is None
+								   else int(delay * 1000) + 1):
+				poll.unregister(fd)
+				pidfds.remove(fd)
+				os.close(fd)
+
+			polled = [pid for pid in polled if _is_alive(pid)]
+
+			if (pidfds or polled) and deadline is not None and \
+					time.monotonic() >= deadline:
+				return False
+
+		return True
+
+	finally:
+		for pidfd in pidfds:
+			os.close(pidfd)
+
+
+def wait_for_process_async(name, timeout=None, match='name'):
+	'''Wait for a process to start, in an :mod:`asyncio` event loop.
+
+	Like :func:`wait_for_process`, but returns an awaitable instead of blocking.
+
+	Example:
+			>>> pids = await wait_for_process_async('pulseaudio', timeout=5)
+
+	Args:
+			name	(str)  : What to look for.
+			timeout (float): Give up after this many seconds. Defaults to ``None`` (wait forever).
+			match   (str)  : How to look. See :func:`find_processes`. Defaults to ``name``.
+
+	Returns:
+			asyncio.Future: Resolves to the IDs of the matching processes, or an empty ``list`` if ``timeout`` ran out first.
+	'''
+
+	import asyncio
+
+	loop = asyncio.get_running_loop()
+	future = loop.create_future()
+	waiter = _ProcessWaiter(name, match)
+	deadline = None if timeout is None else loop.time() + timeout
+
+	def check():
+		if future.done():
+			# Cancelled
+			return
+
+		pids = waiter.poll()
+
+		if pids or (deadline is not None and loop.time() >= deadline):
+			future.set_result(pids)
+			return
+
+		delay = waiter.interval
+
+		if deadline is not None:
+			delay = min(delay, deadline - loop.time())
+
+		loop.call_later(delay, check)
+
+	check()
+
+	return future
+
+
+def wait_for_exit_async(name_or_pid, timeout=None, match='name'):
+	'''Wait for processes to exit, in an :mod:`asyncio` event loop.
+
+	Like :func:`wait_for_exit`, but returns an awaitable instead of blocking. The pidfds are watched by the event loop itself.
+
+	Args:
+			name_or_pid (str or int): A process ID, or what to look for (see :func:`find_processes`).
+			timeout	 (float)	 : Give up after this many seconds. Defaults to ``None`` (wait forever).
+			match	   (str)	   : How to look. Defaults to ``name``.
+
+	Returns:
+			asyncio.Future: Resolves to ``True`` if the processes exited (or none were running), ``False`` if ``timeout`` ran out first.
+	'''
+
+	import asyncio
+
+	loop = asyncio.get_running_loop()
+	future = loop.create_future()
+	pidfds, polled = _watch_exits(name_or_pid, match)
+	pending = set(pidfds)
+	handles = []
+
+	def finish(result):
+		if not future.done():
+			future.set_result(result)
+
+	def exited(pidfd):
+		loop.remove_reader(pidfd)
+		pending.discard(pidfd)
+
+		if not pending and not polled:
+			finish(True)
+
+	def check():
+		polled[:] = [pid for pid in polled if _is_alive(pid)]
+
+		if polled:
+			handles.append(loop.call_later(0.01, check))
+		elif not pending:
+			finish(True)
+
+	def cleanup(future):
+		for pidfd in pidfds:
+			if pidfd in pending:
+				loop.remove_reader(pidfd)
+
+			os.close(pidfd)
+
+		for handle in handles:
+			handle.cancel()
+
+	future.add_done_callback(cleanup)
+
+	for pidfd in pidfds:
+		loop.add_reader(pidfd, exited, pidfd)
+
+	if timeout is not None:
+		handles.append(loop.call_later(timeout, finish, False))
+
+	check()
+
+	return future
+
+
+Call = namedtuple('Call', ['function', 'args', 'kwargs'])
+Call.__doc__ = '''A step of a :func:`driven` function: a call to make, see :func:`call`.'''
+
+
+def call(function, *args, **kwargs):
+	'''Describe a call for a :func:`driven` function to yield.
+
+	Args:
+			function (function): Usually :func:`spawn`, :func:`check_output` or :func:`libdesktop.system.get_cmd_out`.
+			*args, **kwargs	 : The arguments to call it with.
+
+	Returns:
+			Call: The call, to be yielded. The result of the call (or the exception it raised) comes back from the ``yield``.
+	'''
+
+	return Call(function, args, kwargs)
+
+
+def drive(steps):
+	'''Run the steps of a :func:`driven` function, making each call as it comes.
+
+	Args:
+			steps (generator): The generator returned by the ``steps`` of a :func:`driven` function.
+
+	Returns:
+			The value the generator returns.
+	'''
+
+	result = None
+	error = None
+
+	while True:
+		try:
+			if error is None:
+				step = steps.send(result)
+			else:
+				step = steps.throw(error)
+
+		except StopIteration as e:
+			return e.value
+
+		finally:
+			# Do not keep the traceback (and its frames) alive
+			error = None
+
+		try:
+			result = step.function(*step.args, **step.kwargs)
+		except Exception as e:
+			result = None
+			error = e
+
+
+def driven(function):
+	'''Make a function out of a generator which yields the programs it runs.
+
+	libdesktop's backends are written as generators which yield a :func:`call` for every program they
+	run and wait for, instead of running it. The decorated function runs the generator with :func:`drive`,
+	so it works like a plain function. The generator itself is kept as the ``steps`` attribute,
+	so that :mod:`libdesktop.aio` can run the same steps on an event loop.
+
+	Example:
+			>>> @driven
+			... def get_volume():
+			...     volume = yield call(system.get_cmd_out, ['get-volume'])
+			...     return int(volume)
+
+	Args:
+			function (function): The generator function.
+
+	Returns:
+			function: A function which runs the steps and returns their result.
+	'''
+
+	name = '%s.%s' % (function.__module__, function.__name__)
+
+	@functools.wraps(function)
+	def run(*args, **kwargs):
+		if _api.get() is not None:
+			return drive(function(*args, **kwargs))
+
+		# Programs started by the steps are accounted to the function the
+		# user called: this one, or one further up the stack
+		token = _api.set(_get_api(sys._getframe(1)) or name)
+
+		try:
+			return drive(function(*args, **kwargs))
+		finally:
+			_api.reset(token)
+
+	run.steps = function
+
+	return run
@@ -28,13 +28,14 @@
 import os
 import sys
 import plistlib
-import subprocess as sp
 import shutil
 from libdesktop import system
+from libdesktop import processes
 from libdesktop import desktopfile
 from libdesktop import applications
 from libdesktop import directories
 
+@processes.driven
 def add_item(name, command, system_wide=False):
 
 	'''Adds a program to startup.
@@ -58,7 +59,7 @@ def add_item(name, command, system_wide=False):
 
 		if not desktop_env == 'windows':
 			# Will not exit program if insufficient permissions
-			sp.Popen(['chmod +x %s' % command], shell=True)
+			yield processes.call(processes.spawn, ['chmod', '+x', command])
 
 	if desktop_env == 'windows':
 		import winreg
@@ -75,7 +76,8 @@ def add_item(name, command, system_wide=False):
 			shutil.copy(command, startup_dir)
 
 	elif desktop_env == 'mac':
-		sp.Popen(['launchctl submit -l %s -- %s'] % (name, command), shell=True)
+		processes.spawn('launchctl submit -l %s -- %s' % (name, command),
+						shell=True, background=True)
 		# system-wide will be handled by running the above as root
 		# which will auto-happen if current process is root.
 
@@ -101,11 +103,11 @@ def add_item(name, command, system_wide=False):
 				# .desktop files' Terminal option uses an independent method to find terminal emulator
 				desktop_str = desktopfile.construct(name=name, exec_=command, additional_opts={'X-GNOME-Autostart-enabled': 'true'})
 
-				with open(startup_file, 'w') as f:
-					f.write(desktop_str)
+				desktopfile.write_many([(startup_file, desktop_str)])
 			except:
 				pass
 
+@processes.driven
 def list_items(system_wide=False):
 
 	'''List startup programs.
@@ -142,7 +144,8 @@ def list_items(system_wide=False):
 			result.append({ 'name': file, 'command': os.path.join(startup_dir, file) })
 
 	elif desktop_env == 'mac':
-		items_list = system.get_cmd_out('launchtl list | awk \'{print $3}\'')
+		items_list = yield processes.call(system.get_cmd_out,
+										  'launchtl list | awk \'{print $3}\'')
 		for item in items_list.split('\n'):
 			# launchd stores each job as a .plist file (pseudo-xml)
 			launchd_plist_paths = ['~/Library/LaunchAgents',
@@ -261,7 +264,7 @@ def remove_item(name, system_wide=False):
 				os.remove(os.path.join(startup_dir, startup_file))
 
 	elif desktop_env == 'mac':
-		sp.Popen(['launchctl', 'remove', name])
+		processes.spawn(['launchctl', 'remove', name], background=True)
 		# system-wide will be handled by running the above as root
 		# which will auto-happen if current process is root.
 
@@ -29,6 +29,16 @@ import subprocess as sp
 import subprocess
 import os
 import sys
+import shlex
+import signal
+import socket
+import threading
+import time
+import contextvars
+import concurrent.futures
+from collections import namedtuple, OrderedDict
+
+from libdesktop import processes
 
 
 def get_cmd_out(command):
@@ -45,14 +55,518 @@ def get_cmd_out(command):
 	Returns:
 			str: The ``stdout`` of the command.'''
 
-	if isinstance(command, list):
-		result = sp.check_output(command)
-	else:
-		result = sp.check_output(command, shell=True)
+	result = processes.check_output(command,
+									shell=not isinstance(command, list))
 
 	return result.decode('utf-8').rstrip()
 
 
+def iter_cmd_lines(command, binary=False, timeout=None):
+	'''Get the output of a command, line by line.
+
+	Yields each line of the ``stdout`` of a given command as soon as the command writes it, instead of
+	waiting for all of it like :func:`get_cmd_out`. Stopping early (with ``break``, or by closing the
+	generator) kills the command, for when the first few lines are enough.
+
+	Args:
+			command (str or list): A string of the command, or a list of the arguments. A ``str`` is run through the shell.
+			binary  (bool)	   : Yield ``bytes`` instead of decoding every line. Defaults to ``False``.
+			timeout (float)	  : Kill the command if it is still running after this many seconds. Defaults to ``None`` (no limit).
+
+	Yields:
+			str: Each line, without the line ending (``bytes`` with ``binary``).
+
+	Raises:
+			OSError: If the command could not be started.
+			subprocess.CalledProcessError: If the command exited with a non-zero status (only checked if all of the output was read).
+			subprocess.TimeoutExpired: If the command was killed after ``timeout`` seconds.
+	'''
+
+	child = processes.spawn(command, background=True, timeout=timeout,
+							stdout=processes.PIPE,
+							shell=not isinstance(command, list))
+
+	finished = False
+
+	try:
+		for line in child.stdout:
+			line = line.rstrip(b'\r\n')
+			yield line if binary else line.decode('utf-8')
+
+		finished = True
+
+	finally:
+		if not finished:
+			# The caller has what it needs
+			child.kill()
+
+		child.stdout.close()
+		returncode = child.wait()
+
+	if returncode != 0:
+		if timeout is not None and returncode == -signal.SIGKILL:
+			raise sp.TimeoutExpired(command, timeout)
+
+		raise sp.CalledProcessError(returncode, command)
+
+
+CommandResult = namedtuple('CommandResult', ['command', 'stdout', 'stderr',
+											 'returncode', 'duration',
+											 'timed_out'])
+CommandResult.__doc__ = '''The result of one of the commands run by :func:`run_cmds`.
+
+Attributes:
+		command	(str or list): The command, as given.
+		stdout	 (str)		: What the command wrote to ``stdout``, decoded and without trailing whitespace like :func:`get_cmd_out`.
+		stderr	 (str)		: Likewise, for ``stderr``. If the command could not be started, the reason.
+		returncode (int)		: The exit status, negative if the command was killed. ``None`` if it could not be started, or the batch ran out of time first.
+		duration   (float)	  : How many seconds the command ran for.
+		timed_out  (bool)	   : Whether the command was killed (or never started) because it ran out of time.
+'''
+
+
+def _next_line(lines):
+	# The next line of what iter_cmd_lines() returned, or None at the end.
+	# Backends read lines with this step (see libdesktop.processes.driven)
+	# rather than a for loop, so that libdesktop.aio reads them on the event
+	# loop as they come
+	return next(lines, None)
+
+
+def _decode_output(output):
+	# Killed programs can leave half a character behind
+	return (output or b'').decode('utf-8', 'replace').rstrip()
+
+
+def _run_cmd(command, timeout, deadline):
+	if deadline is not None:
+		remaining = deadline - time.monotonic()
+
+		if remaining <= 0:
+			return CommandResult(command, '', '', None, 0.0, True)
+
+		timeout = remaining if timeout is None else min(timeout, remaining)
+
+	start = time.monotonic()
+
+	try:
+		child = processes.spawn(command, background=True,
+								stdin=processes.DEVNULL,
+								stdout=processes.PIPE, stderr=processes.PIPE,
+								shell=not isinstance(command, list))
+
+	except OSError as e:
+		return CommandResult(command, '', str(e), None,
+							 time.monotonic() - start, False)
+
+	try:
+		stdout, stderr = child.communicate(timeout)
+		timed_out = False
+
+	except sp.TimeoutExpired as e:
+		child.kill()
+		child.wait()
+
+		for pipe in [child.stdout, child.stderr]:
+			pipe.close()
+
+		stdout, stderr = e.output, e.stderr
+		timed_out = True
+
+	return CommandResult(command, _decode_output(stdout),
+						 _decode_output(stderr), child.returncode,
+						 time.monotonic() - start, timed_out)
+
+
+def run_cmds(commands, max_parallel=4, timeout=None, total_timeout=None):
+	'''Run several commands at the same time.
+
+	Runs a batch of independent commands, at most ``max_parallel`` at a time, and waits for all of them.
+	Unlike :func:`get_cmd_out`, a command failing (or hanging) does not raise an exception, see the
+	``returncode`` and ``timed_out`` of its result.
+
+	Args:
+			commands	  (list) : The commands, each a ``str`` (run through the shell) or a list of arguments, as in :func:`get_cmd_out`.
+			max_parallel  (int)  : The maximum number of commands to run at the same time. Defaults to ``4``.
+			timeout	   (float): Kill each command if it is still running after this many seconds. Defaults to ``None`` (no limit).
+			total_timeout (float): Kill any command still running, and do not start any more, after this many seconds for the whole batch. Defaults to ``None`` (no limit).
+
+	Returns:
+			list: A :class:`CommandResult` for each command, in the same order.
+	'''
+
+	if not commands:
+		return []
+
+	deadline = None
+
+	if total_timeout is not None:
+		deadline = time.monotonic() + total_timeout
+
+	if len(commands) == 1 or max_parallel <= 1:
+		return [_run_cmd(command, timeout, deadline) for command in commands]
+
+	# The commands are accounted to the caller, not to the worker threads
+	# (see libdesktop.processes.get_spawn_records)
+	token = processes._api.set(processes._api.get() or
+							   processes._get_api(sys._getframe()))
+
+	try:
+		with concurrent.futures.ThreadPoolExecutor(
+				min(max_parallel, len(commands))) as executor:
+			futures = [executor.submit(contextvars.copy_context().run,
+									   _run_cmd, command, timeout, deadline)
+					   for command in commands]
+
+			return [future.result() for future in futures]
+
+	finally:
+		processes._api.reset(token)
+
+
+# Seconds the backends wait for a settings or query program (gsettings hangs if
+# the session bus does not answer), so that one which hangs can not block
+# the caller forever
+_TIMEOUT = 10
+
+
+def _run_until_success(commands, check=False):
+	# Steps (see libdesktop.processes.driven) which run the commands one
+	# after another until one succeeds, and return the result of the last
+	# one run. With check, raises if none succeeded.
+	for command in commands:
+		result = (yield processes.call(run_cmds, [command],
+									   timeout=_TIMEOUT))[0]
+
+		if result.returncode == 0:
+			return result
+
+	if check:
+		if result.timed_out:
+			raise sp.TimeoutExpired(result.command, _TIMEOUT,
+									output=result.stdout)
+
+		elif result.returncode is None:
+			raise OSError(result.stderr)
+
+		raise sp.CalledProcessError(result.returncode, result.command,
+									output=result.stdout,
+									stderr=result.stderr)
+
+	return result
+
+
+def join_cmd(args):
+	'''Turn a list of arguments into a command string.
+
+	Quote the arguments so that the default shell (``cmd.exe`` on Windows) splits the command back into the same arguments.
+
+	Args:
+			args (list): The arguments (as would be used in :class:`subprocess.Popen`).
+
+	Returns:
+			str: The command.
+	'''
+
+	if os.name == 'nt':
+		return sp.list2cmdline(args)
+
+	return ' '.join(shlex.quote(arg) for arg in args)
+
+
+DesktopInfo = namedtuple('DesktopInfo', ['name', 'session_type', 'source',
+										 'confidence'])
+DesktopInfo.__doc__ = '''The result of :func:`get_desktop_info`.
+
+Attributes:
+		name		 (str): The name of the desktop environment or OS, as returned by :func:`get_name`.
+		session_type (str): ``x11``, ``wayland``, ``mir`` or ``tty`` on Linux and other Unix-like systems, ``None`` if unknown or on Windows and Mac OS X.
+		source	   (str): What the name was detected from: ``platform``, the name of an environment variable, ``socket`` (a compositor's socket in ``$XDG_RUNTIME_DIR``), ``process`` (by looking at the user's running processes), or ``None`` if it could not be detected.
+		confidence   (float): How sure the detection is, from ``0.0`` (not detected) to ``1.0``. Environment variables set by the session score ``0.8`` or more, left-over sockets and processes can mislead and score less.
+'''
+
+# Everything the detection depends on, apart from sockets and running
+# processes
+_DETECTION_ENVIRON = ['XDG_CURRENT_DESKTOP', 'DESKTOP_SESSION',
+					  'KDE_FULL_SESSION', 'GNOME_DESKTOP_SESSION_ID',
+					  'SWAYSOCK', 'HYPRLAND_INSTANCE_SIGNATURE',
+					  'XDG_SESSION_TYPE', 'WAYLAND_DISPLAY', 'DISPLAY',
+					  'XDG_RUNTIME_DIR']
+
+# Wayland compositors, which can not be the desktop of an X11 session
+_WAYLAND_DESKTOPS = ['sway', 'hyprland', 'river', 'wlroots']
+
+_desktop_info = {}
+_desktop_info_lock = threading.Lock()
+
+
+def _get_session_type():
+	if sys.platform in ['win32', 'cygwin', 'darwin']:
+		return None
+
+	session_type = (os.environ.get('XDG_SESSION_TYPE') or '').lower()
+
+	if session_type in ['x11', 'wayland', 'mir', 'tty']:
+		return session_type
+
+	if os.environ.get('WAYLAND_DISPLAY'):
+		return 'wayland'
+
+	if os.environ.get('DISPLAY'):
+		return 'x11'
+
+	return None
+
+
+# Processes which give away the desktop environment, by their (truncated)
+# /proc/<pid>/comm, most telling first
+_DESKTOP_PROCESSES = [('sway', 'sway'), ('Hyprland', 'hyprland'),
+					  ('river', 'river'), ('wayfire', 'wlroots'),
+					  ('labwc', 'wlroots'), ('cage', 'wlroots'),
+					  ('dwl', 'wlroots'), ('hikari', 'wlroots'),
+					  ('xfce-mcs-manage', 'xfce4'), ('ksmserver', 'kde')]
+
+
+def _detect_from_sockets():
+	# The IPC sockets compositors create in $XDG_RUNTIME_DIR
+	runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+
+	if not runtime_dir:
+		return None
+
+	try:
+		names = os.listdir(runtime_dir)
+	except OSError:
+		return None
+
+	for name in names:
+		# sway-ipc.<uid>.<pid>.sock
+		parts = name.split('.')
+
+		if (len(parts) == 4 and parts[0] == 'sway-ipc' and parts[3] == 'sock'
+				and parts[1] == str(os.getuid())):
+			if os.path.isdir('/proc/%s' % parts[2]):
+				return 'sway', 0.8
+
+			if not os.path.isdir('/proc/self'):
+				# Can not tell if it is left over
+				return 'sway', 0.6
+
+	if 'hypr' in names:
+		try:
+			instances = os.listdir(os.path.join(runtime_dir, 'hypr'))
+		except OSError:
+			instances = []
+
+		for instance in instances:
+			if _is_hyprland_running(os.path.join(runtime_dir, 'hypr',
+												 instance)):
+				return 'hyprland', 0.8
+
+	return None
+
+
+def _is_hyprland_running(instance_dir):
+	# Instances of earlier sessions are left behind, so check the compositor
+	# is still there: hyprland.lock starts with its process ID
+	lock = processes._read_file(os.path.join(instance_dir, 'hyprland.lock'))
+
+	if lock is not None and os.path.isdir('/proc/self'):
+		pid = lock.split(b'\n', 1)[0].strip()
+
+		return pid.isdigit() and os.path.isdir('/proc/%d' % int(pid))
+
+	# Only a running compositor accepts connections
+	sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+	try:
+		sock.connect(os.path.join(instance_dir, '.socket.sock'))
+		return True
+	except OSError:
+		return False
+	finally:
+		sock.close()
+
+
+def _detect_from_processes(session_type):
+	# Only the user's own processes, found without starting ps
+	if not os.path.isdir('/proc/self'):
+		return None
+
+	uid = os.getuid()
+	found = set()
+
+	for entry in os.scandir('/proc'):
+		try:
+			if not entry.name.isdigit() or entry.stat().st_uid != uid:
+				continue
+
+		except OSError:
+			continue
+
+		comm = processes._read_file('/proc/%s/comm' % entry.name)
+
+		if comm is not None:
+			found.add(comm.rstrip(b'\n').decode('utf-8', 'replace'))
+
+	for comm, name in _DESKTOP_PROCESSES:
+		if comm in found and not (session_type in ['x11', 'tty'] and
+								  name in _WAYLAND_DESKTOPS):
+			return name
+
+	return None
+
+
+def _detect():
+	# Returns the name, what it was detected from and how sure that is.
+	# Never starts a program.
+	if sys.platform in ['win32', 'cygwin']:
+		return 'windows', 'platform', 1.0
+
+	elif sys.platform == 'darwin':
+		return 'mac', 'platform', 1.0
+
+	else:
+		source = 'XDG_CURRENT_DESKTOP'
+		desktop_session = os.environ.get(source)
+
+		if not desktop_session:
+			source = 'DESKTOP_SESSION'
+			desktop_session = os.environ.get(source)
+
+		# Set by the session, rather than guessed from it
+		confidence = 0.9 if source == 'XDG_CURRENT_DESKTOP' else 0.8
+
+		if desktop_session is not None:
+			desktop_session = desktop_session.lower()
+
+			# Fix for X-Cinnamon etc
+			if desktop_session.startswith('x-'):
+				desktop_session = desktop_session.replace('x-', '')
+
+			if desktop_session in ['gnome', 'unity', 'cinnamon', 'mate',
+								   'xfce4', 'lxde', 'fluxbox',
+								   'blackbox', 'openbox', 'icewm', 'jwm',
+								   'afterstep', 'trinity', 'kde', 'pantheon',
+								   'i3', 'lxqt', 'awesome', 'enlightenment',
+								   'sway', 'hyprland', 'river', 'wlroots']:
+
+				return desktop_session, source, confidence
+
+			#-- Special cases --#
+
+			# Canonical sets environment var to Lubuntu rather than
+			# LXDE if using LXDE.
+			# There is no guarantee that they will not do the same
+			# with the other desktop environments.
+
+			confidence -= 0.2
+
+			if 'xfce' in desktop_session:
+				return 'xfce4', source, confidence
+
+			elif desktop_session.startswith('ubuntu'):
+				return 'unity', source, confidence
+
+			elif desktop_session.startswith('xubuntu'):
+				return 'xfce4', source, confidence
+
+			elif desktop_session.startswith('lubuntu'):
+				return 'lxde', source, confidence
+
+			elif desktop_session.startswith('kubuntu'):
+				return 'kde', source, confidence
+
+			elif desktop_session.startswith('razor'):
+				return 'razor-qt', source, confidence
+
+			elif desktop_session.startswith('wmaker'):
+				return 'windowmaker', source, confidence
+
+		# Compositors which do not set XDG_CURRENT_DESKTOP
+		if os.environ.get('SWAYSOCK'):
+			return 'sway', 'SWAYSOCK', 0.9
+
+		elif os.environ.get('HYPRLAND_INSTANCE_SIGNATURE'):
+			return 'hyprland', 'HYPRLAND_INSTANCE_SIGNATURE', 0.9
+
+		elif os.environ.get('KDE_FULL_SESSION') == 'true':
+			return 'kde', 'KDE_FULL_SESSION', 0.8
+
+		elif os.environ.get('GNOME_DESKTOP_SESSION_ID'):
+			if not 'deprecated' in os.environ.get('GNOME_DESKTOP_SESSION_ID'):
+				return 'gnome2', 'GNOME_DESKTOP_SESSION_ID', 0.7
+
+		session_type = _get_session_type()
+		detected = None
+
+		if session_type not in ['x11', 'tty']:
+			detected = _detect_from_sockets()
+
+		if detected is not None:
+			return detected[0], 'socket', detected[1]
+
+		name = _detect_from_processes(session_type)
+
+		if name is not None:
+			# Could belong to another session of the same user
+			if session_type == 'wayland' and name in _WAYLAND_DESKTOPS:
+				return name, 'process', 0.6
+
+			return name, 'process', 0.5
+
+		return 'unknown', None, 0.0
+
+
+def get_desktop_info():
+	'''Get details about the desktop environment or OS.
+
+	Only environment variables, the compositor sockets in ``$XDG_RUNTIME_DIR`` (Sway, Hyprland) and
+	``/proc`` are looked at, no programs are started.
+
+	Detection is done once, and the result is reused for as long as the relevant environment variables
+	stay the same (see :func:`refresh`), so calling this (or :func:`get_name`) repeatedly is cheap.
+
+	Returns:
+			DesktopInfo: The name of the desktop environment or OS, the session type, how the name was detected and how sure that is.
+	'''
+
+	fingerprint = tuple(map(os.environ.get, _DETECTION_ENVIRON))
+
+	info = _desktop_info.get(fingerprint)
+
+	if info is None:
+		with _desktop_info_lock:
+			info = _desktop_info.get(fingerprint)
+
+			if info is None:
+				name, source, confidence = _detect()
+				info = DesktopInfo(name, _get_session_type(), source,
+								   confidence)
+				_desktop_info[fingerprint] = info
+
+	return info
+
+
+def refresh():
+	'''Forget the detected desktop environment and the programs in ``PATH``.
+
+	The next call to :func:`get_name` or :func:`get_desktop_info` will detect the desktop environment again.
+	Only needed if it was detected by looking at sockets or running processes (and they may have changed),
+	since changes to the environment variables are noticed automatically.
+	Likewise, :func:`which` and :func:`is_in_path` will read the ``PATH`` directories again.
+	'''
+
+	global _path_index
+
+	with _desktop_info_lock:
+		_desktop_info.clear()
+
+	with _path_index_lock:
+		_path_index = None
+		_path_dirs.clear()
+
+
 def get_name():
 	'''Get desktop environment or OS.
 
@@ -99,79 +613,161 @@ def get_name():
 	+-------------------------+---------------+
 	| WindowMaker			 | windowmaker   |
 	+-------------------------+---------------+
+	| Sway					| sway		  |
+	+-------------------------+---------------+
+	| Hyprland				| hyprland	  |
+	+-------------------------+---------------+
+	| river				   | river		 |
+	+-------------------------+---------------+
+	| Other wlroots-based	 | wlroots	   |
+	+-------------------------+---------------+
 	| [Other]				 | unknown	   |
 	+-------------------------+---------------+
 
+	Note:
+			No programs are started to find out. The result is cached. See :func:`get_desktop_info` and :func:`refresh`.
+
 	Returns:
 			str: The name of the desktop environment or OS.
 	'''
 
-	if sys.platform in ['win32', 'cygwin']:
-		return 'windows'
+	return get_desktop_info().name
 
-	elif sys.platform == 'darwin':
-		return 'mac'
 
-	else:
-		desktop_session = os.environ.get(
-			'XDG_CURRENT_DESKTOP') or os.environ.get('DESKTOP_SESSION')
+# How often, at most, the PATH directories are checked for changes
+_PATH_VALIDATE_INTERVAL = 2
 
-		if desktop_session is not None:
-			desktop_session = desktop_session.lower()
+# directory → (mtime, {name: path}) for the files in it. Whether they are
+# executable is checked on lookup, as chmod does not change the mtime
+_path_dirs = {}
 
-			# Fix for X-Cinnamon etc
-			if desktop_session.startswith('x-'):
-				desktop_session = desktop_session.replace('x-', '')
+# ($PATH, {directory: mtime}, {name: [path, ...]}, time of the last check)
+_path_index = None
+_path_index_lock = threading.Lock()
 
-			if desktop_session in ['gnome', 'unity', 'cinnamon', 'mate',
-								   'xfce4', 'lxde', 'fluxbox',
-								   'blackbox', 'openbox', 'icewm', 'jwm',
-								   'afterstep', 'trinity', 'kde', 'pantheon',
-								   'i3', 'lxqt', 'awesome', 'enlightenment']:
 
-				return desktop_session
+def _is_executable(path):
+	if os.name == 'nt':
+		return os.path.isfile(path)
 
-			#-- Special cases --#
+	return os.path.isfile(path) and os.access(path, os.X_OK)
 
-			# Canonical sets environment var to Lubuntu rather than
-			# LXDE if using LXDE.
-			# There is no guarantee that they will not do the same
-			# with the other desktop environments.
 
-			elif 'xfce' in desktop_session:
-				return 'xfce4'
+def _scan_path_dir(directory):
+	files = {}
 
-			elif desktop_session.startswith('ubuntu'):
-				return 'unity'
+	try:
+		entries = list(os.scandir(directory))
+	except OSError:
+		return files
 
-			elif desktop_session.startswith('xubuntu'):
-				return 'xfce4'
+	for entry in entries:
+		try:
+			if not entry.is_file():
+				continue
+		except OSError:
+			continue
 
-			elif desktop_session.startswith('lubuntu'):
-				return 'lxde'
+		if os.name == 'nt':
+			# Names are not case-sensitive
+			files[entry.name.lower()] = entry.path
+		else:
+			files[entry.name] = entry.path
 
-			elif desktop_session.startswith('kubuntu'):
-				return 'kde'
+	return files
 
-			elif desktop_session.startswith('razor'):
-				return 'razor-qt'
 
-			elif desktop_session.startswith('wmaker'):
-				return 'windowmaker'
+def _get_path_index():
+	global _path_index
 
-		if os.environ.get('KDE_FULL_SESSION') == 'true':
-			return 'kde'
+	path = os.environ.get('PATH', os.defpath)
+	now = time.monotonic()
+	index = _path_index
 
-		elif os.environ.get('GNOME_DESKTOP_SESSION_ID'):
-			if not 'deprecated' in os.environ.get('GNOME_DESKTOP_SESSION_ID'):
-				return 'gnome2'
+	if (index is not None and index[0] == path and
+			now - index[3] < _PATH_VALIDATE_INTERVAL):
+		return index[2]
+
+	with _path_index_lock:
+		mtimes = OrderedDict()
+
+		for directory in os.get_exec_path():
+			if directory in mtimes:
+				continue
+
+			try:
+				mtimes[directory] = os.stat(directory).st_mtime_ns
+			except OSError:
+				pass
+
+		if index is not None and index[0] == path and index[1] == mtimes:
+			_path_index = (path, mtimes, index[2], now)
+			return index[2]
+
+		files = {}
+
+		# Every file with the name, first directory first
+		for directory, mtime in mtimes.items():
+			cached = _path_dirs.get(directory)
+
+			if cached is None or cached[0] != mtime:
+				cached = (mtime, _scan_path_dir(directory))
+				_path_dirs[directory] = cached
+
+			for name, file_path in cached[1].items():
+				files.setdefault(name, []).append(file_path)
 
-		elif is_running('xfce-mcs-manage'):
-			return 'xfce4'
-		elif is_running('ksmserver'):
-			return 'kde'
+		_path_index = (path, mtimes, files, now)
 
-		return 'unknown'
+		return files
+
+
+def _find_executable(paths):
+	# The first of the files which is executable (usually the only one)
+	for path in paths:
+		if os.name == 'nt' or os.access(path, os.X_OK):
+			return path
+
+	return None
+
+
+def which(program):
+	'''Find a program in the system ``PATH``.
+
+	Like the ``which`` command, and :func:`shutil.which`, but the ``PATH`` directories are only read when
+	``PATH`` or one of the directories changes, so a lookup usually costs a ``dict`` lookup and one check
+	that the file is executable.
+
+	Note:
+			Programs added to a ``PATH`` directory are found within a few seconds. Call :func:`refresh` to find them at once.
+
+	Args:
+			program (str): The name of the program. If it is a path, it is returned if it is an executable file.
+
+	Returns:
+			str: The path to the program, or ``None`` if it is not in ``PATH`` (or not executable).
+	'''
+
+	if os.path.dirname(program):
+		return program if _is_executable(program) else None
+
+	files = _get_path_index()
+
+	if os.name != 'nt':
+		return _find_executable(files.get(program, ()))
+
+	program = program.lower()
+
+	if program in files:
+		return _find_executable(files[program])
+
+	for extension in os.environ.get('PATHEXT', '.COM;.EXE;.BAT;.CMD').split(';'):
+		path = _find_executable(files.get(program + extension.lower(), ()))
+
+		if path is not None:
+			return path
+
+	return None
 
 
 def is_in_path(program):
@@ -187,22 +783,11 @@ def is_in_path(program):
 			bool: Is the program in ``PATH``?
 	'''
 
-	if sys.version_info.major == 2:
-		path = os.getenv('PATH')
-		if os.name == 'nt':
-			path = path.split(';')
-		else:
-			path = path.split(':')
-	else:
-		path = os.get_exec_path()
-
-	for i in path:
-		if os.path.isdir(i):
-			if program in os.listdir(i):
-				return True
+	return which(program) is not None
 
 
-def is_running(process):
+@processes.driven
+def is_running(process, match='name'):
 	'''
 	Check if process is running.
 
@@ -212,32 +797,27 @@ def is_running(process):
 			On a Linux system, kernel threads (like	``kthreadd`` etc.)
 			are excluded.
 
+			To get the process IDs, use :func:`libdesktop.processes.find_processes`.
+
 	Args:
 			process (str): The name of the process.
+			match   (str): How to match ``process``. See :func:`libdesktop.processes.find_processes`. Defaults to ``name``.
 
 	Returns:
 			bool: Is the process running?
 	'''
 
 	if os.name == 'nt':
-		process_list = get_cmd_out(['tasklist', '/v'])
-		return process in process_list
+		lines = yield processes.call(iter_cmd_lines, ['tasklist', '/v'])
 
-	else:
-		process_list = get_cmd_out('ps axw | awk \'{print $5}\'')
-
-		for i in process_list.split('\n'):
-			# 'COMMAND' is the column heading
-			# [*] indicates kernel-level processes like \
-			# kthreadd, which manages threads in the Linux kernel
-			if not i == 'COMMAND' or i.startswith('['):
-				if i == process:
-					return True
-
-				elif os.path.basename(i) == process:
-					# check i without executable path
-					# for example, if 'process' arguments is 'sshd'
-					# and '/usr/bin/sshd' is listed in ps, return True
-					return True
-
-	return False  # finally
+		while True:
+			line = yield processes.call(_next_line, lines)
+
+			if line is None:
+				return False
+
+			if process in line:
+				lines.close()
+				return True
+
+	return bool(processes.find_processes(process, match))
@@ -26,9 +26,44 @@
 
 
 import subprocess as sp
+
+from libdesktop import capabilities
+from libdesktop import processes
 from libdesktop import system
 
 
+def _unix_get_master():
+	# The fields of the first line of "amixer get Master" with the volume
+	# percentage in it, like "Front Left: Playback 39321 [60%] [on]"
+	lines = yield processes.call(system.iter_cmd_lines,
+								 ['amixer', 'get', 'Master'], binary=True,
+								 timeout=system._TIMEOUT)
+
+	while True:
+		line = yield processes.call(system._next_line, lines)
+
+		if line is None:
+			raise ValueError('amixer did not report the volume of Master')
+
+		if b'%' in line:
+			# Stops amixer printing the other channels
+			lines.close()
+			return line.decode('utf-8').split()
+
+
+def _run(command):
+	# Like starting the command with spawn() and waiting for it, the exit
+	# status is not checked, but it has to finish in time
+	result = yield from system._run_until_success([command])
+
+	if result.timed_out:
+		raise sp.TimeoutExpired(command, system._TIMEOUT)
+
+	if result.returncode is None:
+		raise OSError(result.stderr)
+
+
+@processes.driven
 def set_volume(percentage):
 	'''Set the volume.
 
@@ -44,23 +79,24 @@ def set_volume(percentage):
 	if percentage > 100 or percentage < 0:
 		raise ValueError('percentage must be an integer between 0 and 100')
 
-	if system.get_name() == 'windows':
+	if capabilities.get_capabilities().desktop == 'windows':
 		# TODO: Implement volume for Windows. Looks like WinAPI is the
 		# solution...
 		pass
 
-	elif system.get_name() == 'mac':
+	elif capabilities.get_capabilities().desktop == 'mac':
 		# OS X uses 0-10 instead of percentage
 		volume_int = percentage / 10
 
-		sp.Popen(['osascript', '-e', 'set Volume %d' % volume_int]).wait()
+		yield from _run(['osascript', '-e', 'set Volume %d' % volume_int])
 
 	else:
 		# Linux/Unix
 		formatted = str(percentage) + '%'
-		sp.Popen(['amixer', '--quiet', 'sset', 'Master', formatted]).wait()
+		yield from _run(['amixer', '--quiet', 'sset', 'Master', formatted])
 
 
+@processes.driven
 def get_volume():
 	'''Get the volume.
 
@@ -70,24 +106,25 @@ def get_volume():
 			int: The current volume (percentage, between 0 and 100).
 	'''
 
-	if system.get_name() == 'windows':
+	if capabilities.get_capabilities().desktop == 'windows':
 		# TODO: Implement volume for Windows. Looks like WinAPI is the
 		# solution...
 		pass
 
-	elif system.get_name() == 'mac':
-		volume = system.get_cmd_out(
-			['osascript', '-e', 'set ovol to output volume of (get volume settings); return the quoted form of ovol'])
+	elif capabilities.get_capabilities().desktop == 'mac':
+		volume = (yield from system._run_until_success(
+			[['osascript', '-e', 'set ovol to output volume of (get volume settings); return the quoted form of ovol']],
+			check=True)).stdout
 		return int(volume) * 10
 
 	else:
 		# Linux/Unix
-		volume = system.get_cmd_out(
-				('amixer get Master |grep % |awk \'{print $5}\'|'
-				 'sed -e \'s/\[//\' -e \'s/\]//\' | head -n1'))
-		return int(volume.replace('%', ''))
+		volume = [field for field in (yield from _unix_get_master())
+				  if field.endswith('%]')][0]
+		return int(volume.strip('[]%'))
 
 
+@processes.driven
 def increase_volume(percentage):
 	'''Increase the volume.
 
@@ -103,30 +140,31 @@ def increase_volume(percentage):
 	if percentage > 100 or percentage < 0:
 		raise ValueError('percentage must be an integer between 0 and 100')
 
-	if system.get_name() == 'windows':
+	if capabilities.get_capabilities().desktop == 'windows':
 		# TODO: Implement volume for Windows. Looks like WinAPI is the
 		# solution...
 		pass
 
-	elif system.get_name() == 'mac':
+	elif capabilities.get_capabilities().desktop == 'mac':
 		volume_int = percentage / 10
-		old_volume = get()
+		old_volume = (yield from get_volume.steps()) / 10
 
 		new_volume = old_volume + volume_int
 
 		if new_volume > 10:
 			new_volume = 10
 
-		set_volume(new_volume * 10)
+		yield from set_volume.steps(new_volume * 10)
 
 	else:
 		# Linux/Unix
 		formatted = '%d%%+' % percentage
 		# + or - increases/decreases in amixer
 
-		sp.Popen(['amixer', '--quiet', 'sset', 'Master', formatted]).wait()
+		yield from _run(['amixer', '--quiet', 'sset', 'Master', formatted])
 
 
+@processes.driven
 def decrease_volume(percentage):
 	'''Decrease the volume.
 
@@ -142,28 +180,28 @@ def decrease_volume(percentage):
 	if percentage > 100 or percentage < 0:
 		raise ValueError('percentage must be an integer between 0 and 100')
 
-	if system.get_name() == 'windows':
+	if capabilities.get_capabilities().desktop == 'windows':
 		# TODO: Implement volume for Windows. Looks like WinAPI is the
 		# solution...
 		pass
 
-	elif system.get_name() == 'mac':
+	elif capabilities.get_capabilities().desktop == 'mac':
 		volume_int = percentage / 10
-		old_volume = get()
+		old_volume = (yield from get_volume.steps()) / 10
 
 		new_volume = old_volume - volume_int
 
 		if new_volume < 0:
 			new_volume = 0
 
-		set_volume(new_volume * 10)
+		yield from set_volume.steps(new_volume * 10)
 
 	else:
 		# Linux/Unix
 		formatted = '%d%%-' % percentage
 		# + or - increases/decreases in amixer
 
-		sp.Popen(['amixer', '--quiet', 'sset', 'Master', formatted]).wait()
+		yield from _run(['amixer', '--quiet', 'sset', 'Master', formatted])
 
 
 def unix_is_pulseaudio_server():
@@ -175,9 +213,10 @@ def unix_is_pulseaudio_server():
 			bool: Is PulseAudio the sound server?
 	'''
 
-	return bool(system.is_running('pulseaudio'))
+	return capabilities.get_capabilities().pulseaudio
 
 
+@processes.driven
 def mute():
 	'''Mute the volume.
 
@@ -186,24 +225,25 @@ def mute():
 
 	# NOTE: mute != 0 volume
 
-	if system.get_name() == 'windows':
+	if capabilities.get_capabilities().desktop == 'windows':
 		# TODO: Implement volume for Windows. Looks like WinAPI is the
 		# solution...
 		pass
 
-	elif system.get_name() == 'mac':
-		sp.Popen(['osascript', '-e', 'set volume output muted true']).wait()
+	elif capabilities.get_capabilities().desktop == 'mac':
+		yield from _run(['osascript', '-e', 'set volume output muted true'])
 
 	else:
 		# Linux/Unix
 		if unix_is_pulseaudio_server():
-			sp.Popen(['amixer', '--quiet', '-D', 'pulse', 'sset',
-					  'Master', 'mute']).wait()  # sset is *not* a typo
+			yield from _run(['amixer', '--quiet', '-D', 'pulse', 'sset',
+							 'Master', 'mute'])  # sset is *not* a typo
 
 		else:
-			sp.Popen(['amixer', '--quiet', 'sset', 'Master', 'mute']).wait()
+			yield from _run(['amixer', '--quiet', 'sset', 'Master', 'mute'])
 
 
+@processes.driven
 def unmute():
 	'''Unmute the volume.
 
@@ -213,24 +253,25 @@ def unmute():
 			On some systems, volume is restored to its previous level after unmute, or set to 100.
 	'''
 
-	if system.get_name() == 'windows':
+	if capabilities.get_capabilities().desktop == 'windows':
 		# TODO: Implement volume for Windows. Looks like WinAPI is the
 		# solution...
 		pass
 
-	elif system.get_name() == 'mac':
-		sp.Popen(['osascript', '-e', 'set volume output muted false']).wait()
+	elif capabilities.get_capabilities().desktop == 'mac':
+		yield from _run(['osascript', '-e', 'set volume output muted false'])
 
 	else:
 		# Linux/Unix
 		if unix_is_pulseaudio_server():
-			sp.Popen(['amixer', '--quiet', '-D', 'pulse', 'sset',
-					  'Master', 'unmute']).wait()  # sset is *not* a typo
+			yield from _run(['amixer', '--quiet', '-D', 'pulse', 'sset',
+							 'Master', 'unmute'])  # sset is *not* a typo
 
 		else:
-			sp.Popen(['amixer', '--quiet', 'sset', 'Master', 'unmute']).wait()
+			yield from _run(['amixer', '--quiet', 'sset', 'Master', 'unmute'])
 
 
+@processes.driven
 def is_muted():
 	'''Check if volume is muted.
 
@@ -241,21 +282,23 @@ def is_muted():
 
 	Returns:
 			bool: Is the volume muted?
+
+	Raises:
+			OSError: if ``amixer`` is not installed (on Linux/Unix).
 	'''
 
-	if system.get_name() == 'windows':
+	if capabilities.get_capabilities().desktop == 'windows':
 		# TODO: Implement volume for Windows. Looks like WinAPI is the
 		# solution...
 		pass
 
-	elif system.get_name() == 'mac':
-		return system.get_cmd_out(
-			['osascript',
-			 '-e',
-			 'set ismuted to volume output muted; return ismuted']) == 'true'
+	elif capabilities.get_capabilities().desktop == 'mac':
+		return (yield from system._run_until_success(
+			[['osascript',
+			  '-e',
+			  'set ismuted to volume output muted; return ismuted']],
+			check=True)).stdout == 'true'
 
 	else:
 		# Linux/Unix
-		return system.get_cmd_out(
-				('amixer get Master | awk \'$0~/%/{print $6}\' |'
-				 ' tr -d \'[]\' | head -n1')) != 'on'
+		return '[on]' not in (yield from _unix_get_master())
@@ -36,14 +36,16 @@ except ImportError:
 
 import traceback
 import ctypes
+from libdesktop import capabilities
 from libdesktop import system
+from libdesktop import processes
 from libdesktop import directories
 import tempfile
 import shutil
 import subprocess as sp
 from textwrap import dedent
 
-
+@processes.driven
 def get_wallpaper():
 	'''Get the desktop wallpaper.
 
@@ -53,7 +55,8 @@ def get_wallpaper():
 			str: The path to the current wallpaper.
 	'''
 
-	desktop_env = system.get_name()
+	session = capabilities.get_capabilities()
+	desktop_env = session.desktop
 
 	if desktop_env in ['gnome', 'unity', 'cinnamon', 'pantheon', 'mate']:
 		SCHEMA = 'org.gnome.desktop.background'
@@ -69,19 +72,23 @@ def get_wallpaper():
 			gsettings = Gio.Settings.new(SCHEMA)
 			return gsettings.get_string(KEY).replace('file://', '')
 		except ImportError:
-			try:
-				return system.get_cmd_out(
-					['gsettings', 'get', SCHEMA, KEY]).replace('file://', '')
-			except:  # MATE < 1.6
-				return system.get_cmd_out(
-						['mateconftool-2', '-t', 'string', '--get',
-						 '/desktop/mate/background/picture_filename']
-						).replace('file://', '')
+			commands = []
+
+			if session.programs['gsettings']:
+				commands.append(['gsettings', 'get', SCHEMA, KEY])
+
+			# MATE < 1.6
+			commands.append(['mateconftool-2', '-t', 'string', '--get',
+							 '/desktop/mate/background/picture_filename'])
+
+			result = yield from system._run_until_success(commands, check=True)
+			return result.stdout.replace('file://', '')
 
 	elif desktop_env == 'gnome2':
 		args = ['gconftool-2', '-t', 'string', '--get',
 				'/desktop/gnome/background/picture_filename']
-		return system.get_cmd_out(args).replace('file://', '')
+		result = yield from system._run_until_success([args], check=True)
+		return result.stdout.replace('file://', '')
 
 	elif desktop_env == 'kde':
 		conf_file = directories.get_config_file(
@@ -104,15 +111,26 @@ def get_wallpaper():
 	elif desktop_env == 'xfce4':
 		# XFCE4's image property is not image-path but last-image (What?)
 
-		list_of_properties = system.get_cmd_out(
+		list_of_properties = yield processes.call(system.iter_cmd_lines,
 			['xfconf-query', '-R', '-l', '-c', 'xfce4-desktop', '-p',
-			 '/backdrop'])
+			 '/backdrop'], timeout=system._TIMEOUT)
+
+		while True:
+			i = yield processes.call(system._next_line, list_of_properties)
+
+			if i is None:
+				return None
 
-		for i in list_of_properties.split('\n'):
 			if i.endswith('last-image') and 'workspace' in i:
 				# The property given is a background property
-				return system.get_cmd_out(
-					['xfconf-query', '-c', 'xfce4-desktop', '-p', i])
+				break
+
+		# Stops xfconf-query listing the rest
+		list_of_properties.close()
+
+		result = yield from system._run_until_success(
+			[['xfconf-query', '-c', 'xfce4-desktop', '-p', i]], check=True)
+		return result.stdout
 
 	elif desktop_env == 'razor-qt':
 		desktop_conf = configparser.ConfigParser()
@@ -225,7 +243,7 @@ def get_wallpaper():
 		WINDOWS_SCRIPT = ('reg query "HKEY_CURRENT_USER\Control'
 						  ' Panel\Desktop\Desktop"')
 
-		return system.get_cmd_out(WINDOWS_SCRIPT)
+		return (yield processes.call(system.get_cmd_out, WINDOWS_SCRIPT))
 
 	elif desktop_env == 'mac':
 		try:
@@ -235,9 +253,11 @@ def get_wallpaper():
 			OSX_SCRIPT = ('tell app "finder" to get posix path'
 						  ' of (get desktop picture as alias)')
 
-			return system.get_cmd_out(['osascript', OSX_SCRIPT])
+			return (yield processes.call(system.get_cmd_out,
+										 ['osascript', OSX_SCRIPT]))
 
 
+@processes.driven
 def set_wallpaper(image):
 	'''Set the desktop wallpaper.
 
@@ -247,7 +267,8 @@ def set_wallpaper(image):
 			image (str): The path to the image to be set as wallpaper.
 	'''
 
-	desktop_env = system.get_name()
+	session = capabilities.get_capabilities()
+	desktop_env = session.desktop
 
 	if desktop_env in ['gnome', 'unity', 'cinnamon', 'pantheon', 'mate']:
 		uri = 'file://%s' % image
@@ -267,36 +288,30 @@ def set_wallpaper(image):
 			gsettings = Gio.Settings.new(SCHEMA)
 			gsettings.set_string(KEY, uri)
 		except ImportError:
-			try:
-				gsettings_proc = sp.Popen(
-					['gsettings', 'set', SCHEMA, KEY, uri])
-			except:  # MATE < 1.6
-				sp.Popen(['mateconftool-2',
-						  '-t',
-						  'string',
-						  '--set',
-						  '/desktop/mate/background/picture_filename',
-						  '%s' % image],
-						 stdout=sp.PIPE)
-			finally:
-				gsettings_proc.communicate()
-
-				if gsettings_proc.returncode != 0:
-					sp.Popen(['mateconftool-2',
-							  '-t',
-							  'string',
-							  '--set',
-							  '/desktop/mate/background/picture_filename',
-							  '%s' % image])
+			commands = []
+
+			if session.programs['gsettings']:
+				commands.append(['gsettings', 'set', SCHEMA, KEY, uri])
+
+			# MATE < 1.6
+			commands.append(['mateconftool-2',
+							 '-t',
+							 'string',
+							 '--set',
+							 '/desktop/mate/background/picture_filename',
+							 '%s' % image])
+
+			yield from system._run_until_success(commands)
 
 	elif desktop_env == 'gnome2':
-		sp.Popen(
+		processes.spawn(
 			['gconftool-2',
 			 '-t',
 			 'string',
 			 '--set',
 			 '/desktop/gnome/background/picture_filename',
-			 image]
+			 image],
+			background=True
 		)
 
 	elif desktop_env == 'kde':
@@ -315,42 +330,53 @@ def set_wallpaper(image):
 		}}
 		''').format(image)
 
-		sp.Popen(
+		processes.spawn(
 				['dbus-send',
 				 '--session',
 				 '--dest=org.kde.plasmashell',
 				 '--type=method_call',
 				 '/PlasmaShell',
 				 'org.kde.PlasmaShell.evaluateScript',
-				 'string:{}'.format(kde_script)]
+				 'string:{}'.format(kde_script)],
+				background=True
 		)
 
 	elif desktop_env in ['kde3', 'trinity']:
 		args = 'dcop kdesktop KBackgroundIface setWallpaper 0 "%s" 6' % image
-		sp.Popen(args, shell=True)
+		processes.spawn(args, shell=True, background=True)
 
 	elif desktop_env == 'xfce4':
 		# XFCE4's image property is not image-path but last-image (What?)
 
-		list_of_properties = system.get_cmd_out(
+		list_of_properties = yield processes.call(system.iter_cmd_lines,
 				['xfconf-query',
 				 '-R',
 				 '-l',
 				 '-c',
 				 'xfce4-desktop',
 				 '-p',
-				 '/backdrop']
+				 '/backdrop'],
+				timeout=system._TIMEOUT
 		)
 
-		for i in list_of_properties.split('\n'):
+		# The background properties, one per monitor and workspace
+		properties = []
+
+		while True:
+			i = yield processes.call(system._next_line, list_of_properties)
+
+			if i is None:
+				break
+
 			if i.endswith('last-image'):
-				# The property given is a background property
-				sp.Popen(
-					['xfconf-query -c xfce4-desktop -p %s -s "%s"' %
-						(i, image)],
-					shell=True)
+				properties.append(i)
 
-				sp.Popen(['xfdesktop --reload'], shell=True)
+		yield processes.call(system.run_cmds,
+			[['xfconf-query', '-c', 'xfce4-desktop', '-p', i, '-s', image]
+			 for i in properties], timeout=system._TIMEOUT)
+
+		if properties:
+			processes.spawn(['xfdesktop', '--reload'], background=True)
 
 	elif desktop_env == 'razor-qt':
 		desktop_conf = configparser.ConfigParser()
@@ -377,43 +403,43 @@ def set_wallpaper(image):
 			pass
 
 	elif desktop_env in ['fluxbox', 'jwm', 'openbox', 'afterstep', 'i3']:
-		try:
+		if session.programs['feh']:
 			args = ['feh', '--bg-scale', image]
-			sp.Popen(args)
-		except:
+			processes.spawn(args, background=True)
+		else:
 			sys.stderr.write('Error: Failed to set wallpaper with feh!')
 			sys.stderr.write('Please make sre that You have feh installed.')
 
 	elif desktop_env == 'icewm':
 		args = ['icewmbg', image]
-		sp.Popen(args)
+		processes.spawn(args, background=True)
 
 	elif desktop_env == 'blackbox':
 		args = ['bsetbg', '-full', image]
-		sp.Popen(args)
+		processes.spawn(args, background=True)
 
 	elif desktop_env == 'lxde':
 		args = 'pcmanfm --set-wallpaper %s --wallpaper-mode=scaled' % image
-		sp.Popen(args, shell=True)
+		processes.spawn(args, shell=True, background=True)
 
 	elif desktop_env == 'lxqt':
 		args = 'pcmanfm-qt --set-wallpaper %s --wallpaper-mode=scaled' % image
-		sp.Popen(args, shell=True)
+		processes.spawn(args, shell=True, background=True)
 
 	elif desktop_env == 'windowmaker':
 		args = 'wmsetbg -s -u %s' % image
-		sp.Popen(args, shell=True)
+		processes.spawn(args, shell=True, background=True)
 
 	elif desktop_env == 'enlightenment':
 		args = 'enlightenment_remote -desktop-bg-add 0 0 0 0 %s' % image
-		sp.Popen(args, shell=True)
+		processes.spawn(args, shell=True, background=True)
 
 	elif desktop_env == 'awesome':
-		with sp.Popen("awesome-client", stdin=sp.PIPE) as awesome_client:
-			command = ('local gears = require("gears"); for s = 1,'
-						' screen.count() do gears.wallpaper.maximized'
-						'("%s", s, true); end;') % image
-			awesome_client.communicate(input=bytes(command, 'UTF-8'))
+		command = ('local gears = require("gears"); for s = 1,'
+					' screen.count() do gears.wallpaper.maximized'
+					'("%s", s, true); end;') % image
+		yield processes.call(processes.spawn, ['awesome-client'],
+							 input=bytes(command, 'UTF-8'))
 
 	elif desktop_env == 'windows':
 		WINDOWS_SCRIPT = dedent('''
@@ -429,7 +455,7 @@ def set_wallpaper(image):
 		with open(windows_script_file, 'w') as f:
 			f.write(WINDOWS_SCRIPT)
 
-		sp.Popen([windows_script_file], shell=True)
+		processes.spawn([windows_script_file], shell=True, background=True)
 
 		# Sometimes the method above works
 		# and sometimes the one below
@@ -453,10 +479,10 @@ def set_wallpaper(image):
 							 end repeat
 				 end tell''') % image
 
-			sp.Popen(['osascript', OSX_SCRIPT])
+			processes.spawn(['osascript', OSX_SCRIPT], background=True)
 	else:
 		try:
-			sp.Popen(['feh', '--bg-scale', image])
+			processes.spawn(['feh', '--bg-scale', image], background=True)
 			# feh is nearly a catch-all for Linux WMs
 		except:
 			pass
@@ -0,0 +1,137 @@
+from context import libdesktop
+import subprocess
+import asyncio
+import time
+import sys
+import os
+
+def run(coroutine):
+	loop = asyncio.new_event_loop()
+
+	try:
+		return loop.run_until_complete(coroutine)
+	finally:
+		loop.close()
+
+def test_aio_get_cmd_out():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	async def get_both():
+		return await asyncio.gather(
+			libdesktop.aio.system.get_cmd_out('sleep 0.3; echo one'),
+			libdesktop.aio.system.get_cmd_out(['sh', '-c', 'sleep 0.3; echo two']))
+
+	start = time.monotonic()
+
+	assert run(get_both()) == ['one', 'two']
+
+	# At the same time, not one after the other
+	assert time.monotonic() - start < 0.55
+
+	try:
+		run(libdesktop.aio.processes.check_output('exit 2', shell=True))
+		assert False
+
+	except subprocess.CalledProcessError as e:
+		assert e.returncode == 2
+
+	try:
+		run(libdesktop.aio.processes.check_output(['sleep', '10'], timeout=0.1))
+		assert False
+
+	except subprocess.TimeoutExpired:
+		pass
+
+def test_aio_driven():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	@libdesktop.processes.driven
+	def get_status(command):
+		try:
+			output = yield libdesktop.processes.call(libdesktop.system.get_cmd_out, command)
+		except subprocess.CalledProcessError:
+			return 'failed'
+
+		return output
+
+	assert get_status('echo ok') == 'ok'
+	assert get_status('exit 1') == 'failed'
+
+	mirrored = libdesktop.aio._mirror(get_status)
+
+	assert run(mirrored('echo ok')) == 'ok'
+	assert run(mirrored('exit 1')) == 'failed'
+
+	assert run(libdesktop.aio.system.is_running(sys.executable)) is True
+	assert run(libdesktop.aio.system.get_name()) == libdesktop.system.get_name()
+
+def test_aio_iter_cmd_lines():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	async def first_line(command):
+		lines = libdesktop.aio.system.iter_cmd_lines(command)
+
+		try:
+			async for line in lines:
+				return line
+		finally:
+			await lines.aclose()
+
+	async def all_lines(command, **kwargs):
+		return [line async for line in libdesktop.aio.system.iter_cmd_lines(command, **kwargs)]
+
+	assert run(all_lines(['printf', 'a\\nb\\n'])) == ['a', 'b']
+	assert run(all_lines('echo a', binary=True)) == [b'a']
+
+	start = time.monotonic()
+	assert run(first_line('echo first; exec sleep 10')) == 'first'
+	assert time.monotonic() - start < 5
+
+	try:
+		run(all_lines('echo a; exec sleep 10', timeout=0.1))
+		assert False
+
+	except subprocess.TimeoutExpired:
+		pass
+
+	@libdesktop.processes.driven
+	def get_first(command):
+		lines = yield libdesktop.processes.call(libdesktop.system.iter_cmd_lines, command)
+		line = yield libdesktop.processes.call(libdesktop.system._next_line, lines)
+		lines.close()
+
+		return line
+
+	assert get_first('echo a; echo b') == 'a'
+	assert run(libdesktop.aio._mirror(get_first)('echo a; echo b')) == 'a'
+
+	# Closing stops the command under asyncio too
+	start = time.monotonic()
+	assert run(libdesktop.aio._mirror(get_first)('echo a; exec sleep 10')) == 'a'
+	assert time.monotonic() - start < 5
+
+def test_aio_run_cmds():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	start = time.monotonic()
+	results = run(libdesktop.aio.system.run_cmds(['sleep 0.3; echo %d' % i for i in range(4)] + [['sleep', '10']], timeout=0.5))
+
+	assert time.monotonic() - start < 1.5
+	assert [result.stdout for result in results[:4]] == ['0', '1', '2', '3']
+	assert results[4].timed_out
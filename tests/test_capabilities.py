@@ -0,0 +1,59 @@
+from context import libdesktop
+import os
+
+def setup_session(tmpdir, monkeypatch):
+
+	monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmpdir))
+	monkeypatch.setenv('XDG_SESSION_ID', '42')
+	monkeypatch.setattr(libdesktop.capabilities, '_capabilities', None)
+
+def test_capabilities_get_capabilities(tmpdir, monkeypatch):
+
+	setup_session(tmpdir, monkeypatch)
+
+	capabilities = libdesktop.capabilities.get_capabilities()
+
+	assert capabilities.desktop == libdesktop.system.get_name()
+	assert set(capabilities.programs) == set(['feh', 'amixer', 'gsettings', 'xfconf-query'])
+	assert libdesktop.capabilities.get_capabilities() is capabilities
+
+	if os.name == 'nt':
+		return
+
+	assert libdesktop.capabilities.get_capabilities_file() == str(tmpdir.join('libdesktop', 'capabilities-42.json'))
+	assert os.path.isfile(libdesktop.capabilities.get_capabilities_file())
+
+def test_capabilities_saved(tmpdir, monkeypatch):
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	setup_session(tmpdir, monkeypatch)
+	monkeypatch.setenv('TERMINAL', 'libdesktop-terminal --flag')
+
+	capabilities = libdesktop.capabilities.get_capabilities()
+	assert capabilities.terminal == 'libdesktop-terminal --flag'
+
+	def probe():
+		raise AssertionError('probed again')
+
+	# Another process in the same session
+	monkeypatch.setattr(libdesktop.capabilities, '_capabilities', None)
+	monkeypatch.setattr(libdesktop.capabilities, '_probe', probe)
+
+	assert libdesktop.capabilities.get_capabilities() == capabilities
+	assert libdesktop.applications.terminal(return_cmd=True, argv=True)[:2] == ['libdesktop-terminal', '--flag']
+
+	monkeypatch.undo()
+	setup_session(tmpdir, monkeypatch)
+
+	# A different session, and a changed environment
+	monkeypatch.setenv('XDG_SESSION_ID', '43')
+	assert not os.path.isfile(libdesktop.capabilities.get_capabilities_file())
+
+	monkeypatch.setenv('XDG_SESSION_ID', '42')
+	monkeypatch.setenv('TERMINAL', 'xterm')
+
+	assert libdesktop.capabilities.get_capabilities().terminal == 'xterm'
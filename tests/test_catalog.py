@@ -0,0 +1,217 @@
+from context import libdesktop
+import os
+
+TEST_DESKTOP_FILE = '''[Desktop Entry]
+Type=Application
+Name=Libdesktop Test
+Exec=libdesktop-test %F
+'''
+
+
+def setup_home(tmpdir, monkeypatch):
+
+	monkeypatch.setenv('HOME', str(tmpdir))
+	monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('cache')))
+	monkeypatch.delenv('XDG_DATA_HOME', raising=False)
+	monkeypatch.setenv('XDG_DATA_DIRS', str(tmpdir.join('system')))
+
+	apps_dir = tmpdir.join('.local', 'share', 'applications')
+	apps_dir.ensure(dir=True)
+
+	return apps_dir
+
+
+def test_catalog_locate(tmpdir, monkeypatch):
+
+	apps_dir = setup_home(tmpdir, monkeypatch)
+	apps_dir.join('org.libdesktop.Test.desktop').write(TEST_DESKTOP_FILE)
+
+	expected = [str(apps_dir.join('org.libdesktop.Test.desktop'))]
+
+	assert libdesktop.desktopfile.locate('org.libdesktop.Test.desktop') == expected
+	assert libdesktop.desktopfile.locate('Test') == expected
+	assert libdesktop.desktopfile.locate('libdesktop test') == expected
+	assert libdesktop.desktopfile.locate('libdesktop-test') == expected
+	assert libdesktop.desktopfile.locate('libdesktop-no-such-app') == []
+
+
+def test_catalog_index(tmpdir, monkeypatch):
+
+	apps_dir = setup_home(tmpdir, monkeypatch)
+	apps_dir.join('first.desktop').write(TEST_DESKTOP_FILE)
+
+	catalog = libdesktop.catalog.get_catalog()
+
+	assert os.path.isfile(libdesktop.catalog.get_index_file())
+
+	# Unchanged directories are not scanned again
+	assert libdesktop.catalog.get_catalog() is catalog
+
+	apps_dir.join('second.desktop').write(TEST_DESKTOP_FILE)
+
+	assert len(libdesktop.desktopfile.locate('second')) == 1
+	assert len(libdesktop.desktopfile.locate('Libdesktop Test')) == 2
+
+
+def test_catalog_snapshot(tmpdir, monkeypatch):
+
+	apps_dir = setup_home(tmpdir, monkeypatch)
+	apps_dir.join('org.libdesktop.Test.desktop').write(TEST_DESKTOP_FILE)
+	tmpdir.join('system', 'applications', 'org.libdesktop.Test.desktop').write(
+		TEST_DESKTOP_FILE.replace('Libdesktop Test', 'Libdesktop System Test'), ensure=True)
+	tmpdir.join('system', 'applications', 'kde4', 'other.desktop').write(TEST_DESKTOP_FILE, ensure=True)
+
+	catalog = libdesktop.catalog.get_catalog()
+
+	assert os.path.isfile(libdesktop.catalog.get_snapshot_file())
+
+	snapshot = libdesktop.catalog.Snapshot(libdesktop.catalog.get_snapshot_file())
+
+	assert snapshot.is_current(libdesktop.catalog.get_application_dirs(), libdesktop.desktopfile.get_locale())
+	assert len(snapshot) == len(catalog) == 2
+
+	for name in ['org.libdesktop.Test.desktop', 'Test', 'libdesktop test', 'libdesktop-test',
+				 'kde4-other.desktop', 'other.desktop', 'libdesktop system test', 'libdesktop-no-such-app']:
+		assert snapshot.locate(name) == catalog.locate(name)
+
+	assert snapshot.get('kde4-other.desktop') == catalog.get('kde4-other.desktop')
+	assert snapshot.get('org.libdesktop.Test.desktop')['name'] == 'Libdesktop Test'
+	assert 'org.libdesktop.Test.desktop' in snapshot
+	assert 'other.desktop' not in snapshot
+
+	# A new process answers lookups from the snapshot
+	monkeypatch.setattr(libdesktop.catalog, '_catalog', None)
+
+	assert isinstance(libdesktop.catalog.get_installed(), libdesktop.catalog.Snapshot)
+	assert libdesktop.desktopfile.locate('libdesktop-test') == catalog.locate('libdesktop-test')
+
+	# Until the application directories change
+	apps_dir.join('second.desktop').write(TEST_DESKTOP_FILE)
+
+	assert not snapshot.is_current(libdesktop.catalog.get_application_dirs(), libdesktop.desktopfile.get_locale())
+	assert len(libdesktop.desktopfile.locate('libdesktop-test')) == 3
+
+	snapshot.close()
+
+
+def test_catalog_desktop_ids(tmpdir, monkeypatch):
+
+	apps_dir = setup_home(tmpdir, monkeypatch)
+	system_apps_dir = tmpdir.join('system', 'applications')
+
+	apps_dir.join('shadowed.desktop').write(TEST_DESKTOP_FILE)
+	system_apps_dir.join('shadowed.desktop').write(TEST_DESKTOP_FILE, ensure=True)
+	system_apps_dir.join('kde4', 'konsole.desktop').write(TEST_DESKTOP_FILE, ensure=True)
+
+	catalog = libdesktop.catalog.get_catalog()
+
+	assert sorted(catalog.entries) == ['kde4-konsole.desktop', 'shadowed.desktop']
+
+	# The user's entry wins over the system-wide one
+	assert catalog.get('shadowed.desktop')['path'] == str(apps_dir.join('shadowed.desktop'))
+	assert catalog.get('kde4-konsole.desktop')['path'] == str(system_apps_dir.join('kde4', 'konsole.desktop'))
+
+
+def test_catalog_symlink_loop(tmpdir, monkeypatch):
+
+	if os.name == 'nt':
+		return
+
+	apps_dir = setup_home(tmpdir, monkeypatch)
+	apps_dir.join('app.desktop').write(TEST_DESKTOP_FILE)
+	apps_dir.join('kde4', 'konsole.desktop').write(TEST_DESKTOP_FILE, ensure=True)
+
+	# Links back to directories being walked are not followed again
+	os.symlink('.', str(apps_dir.join('loop')))
+	os.symlink('..', str(apps_dir.join('kde4', 'up')))
+	# Nor is a link to itself a problem
+	os.symlink('self', str(apps_dir.join('self')))
+
+	catalog = libdesktop.catalog.get_catalog()
+
+	assert sorted(catalog.entries) == ['app.desktop', 'kde4-konsole.desktop']
+
+def test_catalog_watcher(tmpdir, monkeypatch):
+
+	if not libdesktop.inotify.is_available():
+		print('inotify is not available, skipping')
+		return
+
+	apps_dir = setup_home(tmpdir, monkeypatch)
+
+	watcher = libdesktop.catalog.CatalogWatcher()
+	changes = []
+
+	def broken(change, desktop_id, entry):
+		raise ValueError('does not stop the other subscribers')
+
+	watcher.subscribe(broken)
+	watcher.subscribe(lambda change, desktop_id, entry: changes.append((change, desktop_id)))
+
+	try:
+		apps_dir.join('watched.desktop').write(TEST_DESKTOP_FILE)
+		watcher.process_events(timeout=1)
+
+		assert changes == [('added', 'watched.desktop')]
+		assert watcher.catalog.get('watched.desktop')['name'] == 'Libdesktop Test'
+
+		apps_dir.join('watched.desktop').write(TEST_DESKTOP_FILE.replace('Libdesktop Test', 'Renamed'))
+		watcher.process_events(timeout=1)
+
+		assert changes[-1] == ('changed', 'watched.desktop')
+		assert libdesktop.desktopfile.locate('Renamed') == [str(apps_dir.join('watched.desktop'))]
+
+		apps_dir.join('sub').mkdir()
+		watcher.process_events(timeout=1)
+		apps_dir.join('sub', 'nested.desktop').write(TEST_DESKTOP_FILE)
+		watcher.process_events(timeout=1)
+
+		assert changes[-1] == ('added', 'sub-nested.desktop')
+
+		# Hard links only get IN_CREATE
+		tmpdir.join('linked.desktop').write(TEST_DESKTOP_FILE)
+		os.link(str(tmpdir.join('linked.desktop')), str(apps_dir.join('linked.desktop')))
+		watcher.process_events(timeout=1)
+
+		assert changes[-1] == ('added', 'linked.desktop')
+
+		apps_dir.join('watched.desktop').remove()
+		watcher.process_events(timeout=1)
+
+		assert changes[-1] == ('removed', 'watched.desktop')
+		assert libdesktop.desktopfile.locate('Renamed') == []
+
+	finally:
+		watcher.close()
+
+
+def test_catalog_search(tmpdir, monkeypatch):
+
+	apps_dir = setup_home(tmpdir, monkeypatch)
+	monkeypatch.setenv('LC_ALL', 'de_DE.UTF-8')
+
+	apps_dir.join('firefox.desktop').write('[Desktop Entry]\nName=Firefox\nGenericName=Web Browser\n'
+										   'GenericName[de]=Webbrowser\nKeywords=internet;www;\nExec=firefox %u\n')
+	apps_dir.join('files.desktop').write('[Desktop Entry]\nName=Files\nName[de]=Dateien\nExec=nautilus\n')
+	apps_dir.join('fire.desktop').write('[Desktop Entry]\nName=Fire Starter\nExec=fire\n')
+
+	def ids(results):
+		return [result['id'] for result in results]
+
+	assert ids(libdesktop.desktopfile.search('firefox')) == ['firefox.desktop']
+	assert sorted(ids(libdesktop.desktopfile.search('fire'))) == ['fire.desktop', 'firefox.desktop']
+	assert ids(libdesktop.desktopfile.search('webbrowser')) == ['firefox.desktop']
+	assert ids(libdesktop.desktopfile.search('dateien')) == ['files.desktop']
+	assert ids(libdesktop.desktopfile.search('nautilus')) == ['files.desktop']
+	assert ids(libdesktop.desktopfile.search('firefix')) == ['firefox.desktop']
+	assert libdesktop.desktopfile.search('') == []
+
+	session = libdesktop.catalog.SearchSession()
+
+	results = [ids(session.search(query)) for query in ['f', 'fi', 'fir', 'fire', 'firef']]
+
+	assert sorted(results[0]) == ['fire.desktop', 'firefox.desktop']
+	assert results[-1][0] == 'firefox.desktop'
+
+	# Going back (backspace) starts over
+	assert ids(session.search('dat')) == ['files.desktop']
@@ -75,10 +75,43 @@ def test_desktopfile_parse():
 
 	print('\n')
 
-	print(json.dumps(actual, indent=4))
+	print(json.dumps(dict(actual), indent=4))
 
 	assert expected == actual
 
+def test_desktopfile_parse_groups():
+
+	desktop_file_for_test = '''[Desktop Entry]
+	Name=Libdesktop Test
+	Exec=env LIBDESKTOP=1 ls
+	Actions=new-window;
+
+	[Desktop Action new-window]
+	Name=New Window
+	Exec=ls -a
+	'''.replace('\t', '')
+
+	actual = libdesktop.desktopfile.parse(desktop_file_for_test)
+
+	assert actual['Name'] == 'Libdesktop Test'
+	assert actual['Exec'] == 'env LIBDESKTOP=1 ls'
+	assert actual.group('Desktop Action new-window') == {'Name': 'New Window', 'Exec': 'ls -a'}
+	assert actual.get_localized('Name', 'de', group='Desktop Action new-window') == 'New Window'
+	assert actual.get_localized('Name', group='Desktop Action no-such-action') is None
+
+def test_desktopfile_parse_cache(tmpdir):
+
+	desktop_file = tmpdir.join('test.desktop')
+	desktop_file.write('[Desktop Entry]\nName=Libdesktop Test\n')
+
+	first = libdesktop.desktopfile.parse(str(desktop_file))
+
+	assert libdesktop.desktopfile.parse(str(desktop_file)) is first
+
+	desktop_file.write('[Desktop Entry]\nName=Libdesktop Test (changed)\n')
+
+	assert libdesktop.desktopfile.parse(str(desktop_file))['Name'] == 'Libdesktop Test (changed)'
+
 def test_desktopfile_execute():
 
 	if os.name in ['darwin', 'nt']:
@@ -112,3 +145,148 @@ def test_desktopfile_execute():
 
 	print('-' * 50)
 
+
+def test_desktopfile_parse_many(tmpdir):
+
+	paths = []
+
+	for i in range(20):
+		desktop_file = tmpdir.join('test-%d.desktop' % i)
+		desktop_file.write('[Desktop Entry]\nName=Libdesktop Test %d\n' % i)
+		paths.append(str(desktop_file))
+
+	paths.insert(5, str(tmpdir.join('missing.desktop')))
+
+	for processes in [False, True]:
+		actual = libdesktop.desktopfile.parse_many(paths, workers=4, processes=processes)
+
+		assert len(actual) == len(paths)
+		assert isinstance(actual[5], (IOError, OSError))
+
+		names = [entry['Name'] for entry in actual if not isinstance(entry, Exception)]
+
+		assert names == ['Libdesktop Test %d' % i for i in range(20)]
+
+def test_desktopfile_compile_exec():
+
+	assert libdesktop.desktopfile.compile_exec('gedit %U') == (('gedit',), (('U',),))
+	assert libdesktop.desktopfile.compile_exec(
+		'sh -c "echo \\\\"a b\\\\" \\\\$HOME" 100%% %d') == \
+		(('sh',), ('-c',), ('echo "a b" $HOME',), ('100%',))
+	assert libdesktop.desktopfile.compile_exec('app --file=%f') == \
+		(('app',), ('--file=', ('f',)))
+
+def test_desktopfile_get_exec_args(tmpdir):
+
+	desktop_file = tmpdir.join('test.desktop')
+	desktop_file.write('''[Desktop Entry]
+	Name=Libdesktop Test
+	Icon=libdesktop
+	Exec="/opt/my app/run" %i --name %c %k %F
+	'''.replace('\t', ''))
+
+	expected = ['/opt/my app/run', '--icon', 'libdesktop', '--name', 'Libdesktop Test',
+				str(desktop_file), 'a b.txt', '/tmp/c.txt']
+
+	actual = libdesktop.desktopfile.get_exec_args(str(desktop_file),
+												  ['a b.txt', 'file:///tmp/c.txt'])
+
+	assert actual == [expected]
+
+	# %f takes a single file, so one instance per file is started
+	single = '[Desktop Entry]\nExec=app %f\n'
+
+	assert libdesktop.desktopfile.get_exec_args(single, ['a', 'b']) == [['app', 'a'], ['app', 'b']]
+	assert libdesktop.desktopfile.get_exec_args(single) == [['app']]
+
+	# Without a field code, files are added at the end
+	assert libdesktop.desktopfile.get_exec_args('[Desktop Entry]\nExec=app\n', ['a', 'b']) == [['app', 'a', 'b']]
+
+	assert libdesktop.desktopfile.execute(single, files=['a b'], return_cmd=True) == "app 'a b'"
+	assert libdesktop.desktopfile.get_exec_cmds(single, ['a', 'b c']) == ['app a', "app 'b c'"]
+
+	try:
+		libdesktop.desktopfile.execute(single, files=['a', 'b'], return_cmd=True)
+	except ValueError:
+		pass
+	else:
+		assert False, 'execute(return_cmd=True) returned one command for two instances'
+
+def test_desktopfile_serialize():
+
+	expected = r'''[Desktop Entry]
+	Name=Files
+	Name[de]=Dateien
+	Exec=files\\%U
+	Terminal=false
+	Comment=\sLine one\nLine two
+	Categories=Utility;Text\;Files;
+
+	[Desktop Action new-window]
+	Name=New Window
+	'''.replace('\t', '')
+
+	actual = libdesktop.desktopfile.serialize(
+		{'Name': {'': 'Files', 'de': 'Dateien'}, 'Exec': 'files\\%U', 'Terminal': False,
+		 'Comment': ' Line one\nLine two', 'Categories': ['Utility', 'Text;Files']},
+		{'Desktop Action new-window': {'Name': 'New Window'}})
+
+	assert expected == actual
+
+	parsed = libdesktop.desktopfile.parse(actual)
+
+	assert libdesktop.desktopfile.serialize(parsed) == actual
+
+def test_desktopfile_write_many(tmpdir):
+
+	entries = (('test-%d.desktop' % i, {'Name': 'Libdesktop Test %d' % i, 'Exec': 'ls'}) for i in range(20))
+
+	written = libdesktop.desktopfile.write_many(entries, directory=str(tmpdir))
+
+	assert written == [os.path.join(str(tmpdir), 'test-%d.desktop' % i) for i in range(20)]
+	assert sorted(os.listdir(str(tmpdir))) == sorted('test-%d.desktop' % i for i in range(20))
+	assert libdesktop.desktopfile.parse(written[7])['Name'] == 'Libdesktop Test 7'
+
+	# Nothing is left behind when the batch fails
+	try:
+		libdesktop.desktopfile.write_many([('new.desktop', '[Desktop Entry]\n'),
+										   ('missing/new.desktop', '[Desktop Entry]\n')],
+										  directory=str(tmpdir))
+		assert False
+
+	except (IOError, OSError):
+		pass
+
+	assert len(os.listdir(str(tmpdir))) == 20
+
+	# The same path twice: the last one wins
+	written = libdesktop.desktopfile.write_many([('test-0.desktop', {'Name': 'First', 'Exec': 'ls'}),
+												 ('test-0.desktop', {'Name': 'Second', 'Exec': 'ls'})],
+												directory=str(tmpdir))
+
+	assert written == [os.path.join(str(tmpdir), 'test-0.desktop')] * 2
+	assert libdesktop.desktopfile.parse(written[0])['Name'] == 'Second'
+	assert len(os.listdir(str(tmpdir))) == 20
+
+def test_desktopfile_validate(tmpdir):
+
+	valid = '[Desktop Entry]\nType=Application\nName=Test\nExec=sh -c "echo \\\\$HOME" %F\nTerminal=false\nActions=new;\n\n[Desktop Action new]\nName=New\nExec=test --new\n'
+
+	assert libdesktop.desktopfile.validate(valid) == []
+
+	findings = libdesktop.desktopfile.validate('[Desktop Entry]\nType=Application\nExec=test "%f" | less\nTerminal=yes\n[Other]\n')
+	messages = [(finding.line, finding.severity) for finding in findings]
+
+	assert (3, 'error') in messages  # Field code in quotes, unquoted |
+	assert (4, 'error') in messages  # Not a boolean
+	assert (5, 'error') in messages  # Not an X- group
+	assert (None, 'error') in messages  # No Name
+
+	tmpdir.mkdir('sub').join('bad.desktop').write('[Desktop Entry]\nType=Link\nName=Test\n')
+	tmpdir.join('good.desktop').write(valid)
+
+	findings = list(libdesktop.desktopfile.validate_tree(str(tmpdir), workers=2))
+
+	assert len(findings) == 1
+	assert findings[0].path == str(tmpdir.join('sub', 'bad.desktop'))
+	assert 'URL' in str(findings[0])
@@ -0,0 +1,174 @@
+from context import libdesktop
+import struct
+import os
+
+INDEX_THEME = '''[Icon Theme]
+Name=%s
+Inherits=%s
+Directories=16x16/apps,48x48/apps,scalable/apps
+ScaledDirectories=48x48@2/apps
+
+[16x16/apps]
+Size=16
+Type=Fixed
+
+[48x48/apps]
+Size=48
+Type=Fixed
+
+[48x48@2/apps]
+Size=48
+Scale=2
+Type=Fixed
+
+[scalable/apps]
+Size=128
+MinSize=8
+MaxSize=512
+Type=Scalable
+'''
+
+
+def write_icon_cache(path, directories, icons):
+
+	# The format written by gtk-update-icon-cache: icons maps each icon name
+	# to a list of (directory index, flags)
+	strings = b''.join(directory.encode() + b'\0' for directory in directories)
+	dir_list_offset = 12 + len(strings)
+	hash_offset = dir_list_offset + 4 + 4 * len(directories)
+	n_buckets = 3
+	icon_offset = hash_offset + 4 + 4 * n_buckets
+
+	chains = [[] for i in range(n_buckets)]
+
+	for name in icons:
+		chains[libdesktop.icons._hash(name) % n_buckets].append(name)
+
+	# Icons are 12 bytes each, image lists and names follow them
+	offsets = {}
+	data_offset = icon_offset + 12 * len(icons)
+	data = b''
+
+	for name in icons:
+		offsets[name] = icon_offset + 12 * len(offsets)
+
+	icon_records = {}
+
+	for chain in chains:
+		for i, name in enumerate(chain):
+			next_offset = offsets[chain[i + 1]] if i + 1 < len(chain) else 0xffffffff
+			image_list = struct.pack('>I', len(icons[name])) + b''.join(
+				struct.pack('>HHI', index, flags, 0) for index, flags in icons[name])
+			image_list_offset = data_offset + len(data)
+			data += image_list
+			name_offset = data_offset + len(data)
+			data += name.encode() + b'\0'
+			icon_records[name] = struct.pack('>III', next_offset, name_offset, image_list_offset)
+
+	buckets = [offsets[chain[0]] if chain else 0xffffffff for chain in chains]
+
+	with open(path, 'wb') as f:
+		f.write(struct.pack('>HHII', 1, 0, hash_offset, dir_list_offset))
+		f.write(strings)
+		f.write(struct.pack('>I', len(directories)))
+
+		offset = 12
+
+		for directory in directories:
+			f.write(struct.pack('>I', offset))
+			offset += len(directory) + 1
+
+		f.write(struct.pack('>I', n_buckets))
+		f.write(b''.join(struct.pack('>I', bucket) for bucket in buckets))
+		f.write(b''.join(icon_records[name] for name in icons))
+		f.write(data)
+
+
+def setup_themes(tmpdir, monkeypatch):
+
+	monkeypatch.setenv('HOME', str(tmpdir))
+	monkeypatch.setenv('XDG_CONFIG_HOME', str(tmpdir.join('config')))
+	monkeypatch.setenv('XDG_CONFIG_DIRS', str(tmpdir.join('etc')))
+	monkeypatch.delenv('XDG_DATA_HOME', raising=False)
+	monkeypatch.setenv('XDG_DATA_DIRS', str(tmpdir.join('system')))
+
+	icons_dir = tmpdir.join('system', 'icons')
+
+	for theme, parent in [('Libdesktop', 'hicolor'), ('hicolor', '')]:
+		icons_dir.join(theme, 'index.theme').write(INDEX_THEME % (theme, parent), ensure=True)
+
+	icons_dir.join('hicolor', '48x48', 'apps', 'libdesktop-test.png').write('', ensure=True)
+	icons_dir.join('hicolor', 'scalable', 'apps', 'libdesktop-test.svg').write('', ensure=True)
+	icons_dir.join('Libdesktop', '16x16', 'apps', 'libdesktop-test.png').write('', ensure=True)
+
+	tmpdir.join('config', 'gtk-3.0', 'settings.ini').write(
+		'[Settings]\ngtk-icon-theme-name=Libdesktop\n', ensure=True)
+
+	libdesktop.icons.clear_cache()
+
+	return icons_dir
+
+
+def test_icons_lookup(tmpdir, monkeypatch):
+
+	icons_dir = setup_themes(tmpdir, monkeypatch)
+
+	assert libdesktop.icons.get_theme_name() == 'Libdesktop'
+
+	assert libdesktop.icons.lookup('libdesktop-test', 16) == str(
+		icons_dir.join('Libdesktop', '16x16', 'apps', 'libdesktop-test.png'))
+
+	# The closest size within the theme itself wins over its parents
+	assert libdesktop.icons.lookup('libdesktop-test', 48) == str(
+		icons_dir.join('Libdesktop', '16x16', 'apps', 'libdesktop-test.png'))
+
+	assert libdesktop.icons.lookup('libdesktop-test', 48, theme='hicolor') == str(
+		icons_dir.join('hicolor', '48x48', 'apps', 'libdesktop-test.png'))
+	assert libdesktop.icons.lookup('libdesktop-test', 256, theme='hicolor') == str(
+		icons_dir.join('hicolor', 'scalable', 'apps', 'libdesktop-test.svg'))
+
+	# Found through the theme it inherits from
+	icons_dir.join('hicolor', '48x48', 'apps', 'libdesktop-test-2.png').write('')
+	libdesktop.icons.clear_cache()
+
+	assert libdesktop.icons.lookup('libdesktop-test-2', 16) == str(
+		icons_dir.join('hicolor', '48x48', 'apps', 'libdesktop-test-2.png'))
+
+	assert libdesktop.icons.lookup('libdesktop-no-such-icon') is None
+
+	tmpdir.join('system', 'icons', 'libdesktop-fallback.xpm').write('')
+
+	assert libdesktop.icons.lookup('libdesktop-fallback') == str(
+		icons_dir.join('libdesktop-fallback.xpm'))
+
+def test_icons_cache(tmpdir, monkeypatch):
+
+	icons_dir = setup_themes(tmpdir, monkeypatch)
+
+	directories = ['16x16/apps', '48x48/apps', 'scalable/apps', '48x48@2/apps']
+	icons = dict(('libdesktop-test-%d' % i, [(1, 4)]) for i in range(10))
+	icons['libdesktop-test'] = [(3, 4), (2, 2)]
+
+	cache_file = icons_dir.join('hicolor', 'icon-theme.cache')
+	write_icon_cache(str(cache_file), directories, icons)
+
+	cache = libdesktop.icons.IconCache(str(cache_file))
+
+	assert cache.directories == directories
+	assert cache.lookup('libdesktop-test') == {'48x48@2/apps': ['png'], 'scalable/apps': ['svg']}
+	assert cache.lookup('libdesktop-test-7') == {'48x48/apps': ['png']}
+	assert cache.lookup('libdesktop-no-such-icon') == {}
+
+	cache.close()
+
+	# The cache is used instead of the directories (which do not have the
+	# @2 image)
+	assert libdesktop.icons.lookup('libdesktop-test', 48, scale=2, theme='hicolor') == str(
+		icons_dir.join('hicolor', '48x48@2', 'apps', 'libdesktop-test.png'))
+
+	# An outdated cache is ignored, the scalable image is the closest one
+	os.utime(str(cache_file), (0, 0))
+	libdesktop.icons.clear_cache()
+
+	assert libdesktop.icons.lookup('libdesktop-test', 48, scale=2, theme='hicolor') == str(
+		icons_dir.join('hicolor', 'scalable', 'apps', 'libdesktop-test.svg'))
@@ -0,0 +1,84 @@
+from context import libdesktop
+import os
+
+DESKTOP_FILE = '''[Desktop Entry]
+Type=Application
+Name=%s
+Exec=%s %%F
+'''
+
+
+def setup_xdg(tmpdir, monkeypatch):
+
+	monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('cache')))
+	monkeypatch.setenv('XDG_CONFIG_HOME', str(tmpdir.join('config')))
+	monkeypatch.setenv('XDG_CONFIG_DIRS', str(tmpdir.join('etc')))
+	monkeypatch.setenv('XDG_DATA_HOME', str(tmpdir.join('home')))
+	monkeypatch.setenv('XDG_DATA_DIRS', str(tmpdir.join('usr')))
+	monkeypatch.setenv('XDG_CURRENT_DESKTOP', 'Libdesktop')
+
+	apps_dir = tmpdir.join('usr', 'applications')
+
+	for name in ['editor', 'viewer', 'ide', 'removed']:
+		apps_dir.join(name + '.desktop').write(DESKTOP_FILE % (name, name), ensure=True)
+
+	apps_dir.join('mimeinfo.cache').write('[MIME Cache]\ntext/x-libdesktop=removed.desktop;ide.desktop;\n'
+										  'image/png=viewer.desktop;\n')
+
+	tmpdir.join('usr', 'mime', 'globs2').write('50:text/x-libdesktop:*.ldt\n50:image/png:*.png\n'
+											   '60:text/x-libdesktop-special:special.*:cs\n', ensure=True)
+	tmpdir.join('usr', 'mime', 'subclasses').write('text/x-libdesktop text/plain\n')
+
+	return tmpdir
+
+
+def test_mime_get_default_application(tmpdir, monkeypatch):
+
+	setup_xdg(tmpdir, monkeypatch)
+
+	tmpdir.join('etc', 'mimeapps.list').write('[Default Applications]\ntext/plain=missing.desktop;editor.desktop;\n'
+											  'image/png=ide.desktop\n', ensure=True)
+
+	assert libdesktop.mime.get_default_application('image/png') == 'ide.desktop'
+	assert libdesktop.mime.get_default_application('text/plain') == 'editor.desktop'
+
+	# No default, so the first association (minus removed ones)
+	tmpdir.join('config', 'mimeapps.list').write('[Removed Associations]\ntext/x-libdesktop=removed.desktop;\n', ensure=True)
+
+	assert libdesktop.mime.get_applications('text/x-libdesktop') == ['ide.desktop']
+	assert libdesktop.mime.get_default_application('text/x-libdesktop') == 'ide.desktop'
+
+	# Desktop-specific files come first
+	tmpdir.join('config', 'libdesktop-mimeapps.list').write('[Default Applications]\nimage/png=viewer.desktop;\n')
+
+	assert libdesktop.mime.get_default_application('image/png') == 'viewer.desktop'
+
+	assert libdesktop.mime.get_default_application('application/x-libdesktop-nothing') is None
+
+	# Uninstalled applications are dropped, even though the associations did not change
+	assert libdesktop.mime.get_applications('image/png') == ['viewer.desktop']
+
+	tmpdir.join('usr', 'applications', 'viewer.desktop').remove()
+
+	assert libdesktop.mime.get_applications('image/png') == []
+
+
+def test_mime_get_default_application_parent_type(tmpdir, monkeypatch):
+
+	setup_xdg(tmpdir, monkeypatch)
+
+	tmpdir.join('config', 'mimeapps.list').write('[Default Applications]\ntext/plain=editor.desktop;\n', ensure=True)
+	tmpdir.join('usr', 'applications', 'mimeinfo.cache').write('[MIME Cache]\n')
+
+	assert libdesktop.mime.get_parent_types('text/x-libdesktop') == ['text/x-libdesktop', 'text/plain']
+	assert libdesktop.mime.get_default_application('text/x-libdesktop') == 'editor.desktop'
+
+
+def test_mime_get_file_type(tmpdir, monkeypatch):
+
+	setup_xdg(tmpdir, monkeypatch)
+
+	assert libdesktop.mime.get_file_type('/tmp/test.ldt') == 'text/x-libdesktop'
+	assert libdesktop.mime.get_file_type('/tmp/TEST.PNG') == 'image/png'
+	assert libdesktop.mime.get_file_type('/tmp/special.png') == 'text/x-libdesktop-special'
+	assert libdesktop.mime.get_file_type(str(tmpdir)) == 'inode/directory'
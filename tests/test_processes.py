@@ -0,0 +1,321 @@
+from context import libdesktop
+import subprocess
+import time
+import os
+import sys
+import shutil
+
+def test_processes_spawn():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	assert libdesktop.processes.spawn(['true']).returncode == 0
+	assert libdesktop.processes.spawn('exit 3', shell=True).returncode == 3
+
+	child = libdesktop.processes.spawn(['cat'], input=b'libdesktop', stdout=libdesktop.processes.PIPE, background=True)
+
+	assert child.stdout.read() == b'libdesktop'
+	assert child.wait() == 0
+
+	try:
+		libdesktop.processes.spawn(['libdesktop-no-such-program'])
+		assert False
+
+	except OSError:
+		pass
+
+def test_processes_spawn_background():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	child = libdesktop.processes.spawn(['true'], background=True)
+
+	# Reaped without anyone calling wait()
+	for i in range(200):
+		if child.returncode is not None:
+			break
+
+		time.sleep(0.01)
+
+	assert child.returncode == 0
+	assert not os.path.exists('/proc/%d' % child.pid)
+
+	child = libdesktop.processes.spawn(['sleep', '10'], background=True, timeout=0.1)
+
+	assert child.wait(5) < 0
+
+	try:
+		libdesktop.processes.spawn(['sleep', '10'], timeout=0.1)
+		assert False
+
+	except subprocess.TimeoutExpired:
+		pass
+
+	child = libdesktop.processes.spawn(['sleep', '0'], detach=True)
+
+	assert child.detached
+	assert child.wait(5) in [0, None]
+
+	# Reaped by someone else: the exit status is lost, not 0
+	pid = os.posix_spawnp('false', ['false'], os.environ)
+	os.waitpid(pid, 0)
+	child = libdesktop.processes.Child(['false'], pid)
+
+	assert child.wait(5) is None
+	assert child.poll() is None
+	assert child.returncode is None
+
+def test_processes_check_output():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	assert libdesktop.processes.check_output(['echo', 'libdesktop']) == b'libdesktop\n'
+	assert libdesktop.system.get_cmd_out('echo "libdesktop  "') == 'libdesktop'
+
+	try:
+		libdesktop.processes.check_output('echo out; exit 1', shell=True)
+		assert False
+
+	except subprocess.CalledProcessError as e:
+		assert e.returncode == 1
+		assert e.output == b'out\n'
+
+def test_processes_communicate():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	# More than fits in a pipe, on both
+	child = libdesktop.processes.spawn('head -c 200000 /dev/zero; head -c 100000 /dev/zero >&2', shell=True, background=True,
+									   stdout=libdesktop.processes.PIPE, stderr=libdesktop.processes.PIPE)
+
+	stdout, stderr = child.communicate(10)
+
+	assert (len(stdout), len(stderr)) == (200000, 100000)
+	assert child.returncode == 0
+
+	child = libdesktop.processes.spawn('echo partial; exec sleep 10', shell=True, background=True, stdout=libdesktop.processes.PIPE)
+
+	try:
+		child.communicate(0.3)
+		assert False
+
+	except subprocess.TimeoutExpired as e:
+		assert e.output == b'partial\n'
+		assert e.stderr is None
+
+	child.kill()
+	assert child.wait() < 0
+
+def test_processes_find_processes():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	child = libdesktop.processes.spawn(['sleep', '30.5'], background=True)
+
+	try:
+		assert child.pid in libdesktop.processes.find_processes('sleep')
+		assert child.pid in libdesktop.processes.find_processes('/libdesktop/sleep', match='basename')
+		assert child.pid in libdesktop.processes.find_processes('sleep 30.5', match='cmdline')
+		assert child.pid not in libdesktop.processes.find_processes('/libdesktop/sleep')
+
+	finally:
+		child.kill()
+		child.wait()
+
+	assert child.pid not in libdesktop.processes.find_processes('sleep')
+
+def test_processes_find_processes_long_name(tmpdir):
+
+	if not sys.platform.startswith('linux'):
+		print('Not a Linux system, skipping')
+
+		return
+
+	program = str(tmpdir.join('libdesktop-sleep-long'))
+	shutil.copy(libdesktop.system.which('sleep'), program)
+
+	child = libdesktop.processes.spawn([program, '30'], background=True)
+
+	try:
+		# Wait for exec() to be done
+		for i in range(200):
+			if os.path.basename(os.readlink('/proc/%d/exe' % child.pid)) == 'libdesktop-sleep-long':
+				break
+
+			time.sleep(0.01)
+
+		# Both share the truncated name libdesktop-slee
+		assert child.pid in libdesktop.processes.find_processes('libdesktop-sleep-long')
+		assert child.pid not in libdesktop.processes.find_processes('libdesktop-sleep-other')
+
+		snapshot = libdesktop.processes.ProcessSnapshot()
+
+		assert child.pid in snapshot.find('libdesktop-sleep-long')
+		assert child.pid not in snapshot.find('libdesktop-sleep-other')
+
+	finally:
+		child.kill()
+		child.wait()
+
+def test_processes_snapshot():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	snapshot = libdesktop.processes.ProcessSnapshot()
+
+	assert os.getpid() in snapshot
+	assert not snapshot.is_running('libdesktop-no-such-program')
+
+	# Started through sh, which replaces itself with sleep
+	child = libdesktop.processes.spawn('exec sleep 30.5', shell=True, background=True)
+
+	try:
+		time.sleep(0.2)
+		started, exited = snapshot.refresh()
+
+		assert child.pid in started
+		assert snapshot.find('sleep') == [child.pid]
+		assert snapshot.get(child.pid).cmdline == ['sleep', '30.5']
+
+	finally:
+		child.kill()
+		child.wait()
+
+	started, exited = snapshot.refresh()
+
+	assert child.pid in exited
+	assert not snapshot.is_running('sleep')
+
+	if os.path.isdir('/proc/self'):
+		# /proc/<pid> got a new inode number (the kernel dropped it from its
+		# cache), but the process is the same
+		(inode, starttime), process = snapshot._processes[os.getpid()]
+		snapshot._processes[os.getpid()] = ((inode + 1, starttime), process)
+
+		assert os.getpid() not in snapshot.refresh()[0]
+
+def test_processes_wait():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	assert libdesktop.processes.wait_for_process('libdesktop-no-such-program', timeout=0.1) == []
+
+	child = libdesktop.processes.spawn('sleep 0.2; exec sleep 0.3', shell=True, background=True)
+
+	try:
+		assert libdesktop.processes.wait_for_process('sleep 0.3', match='cmdline', timeout=5) == [child.pid]
+		assert libdesktop.processes.wait_for_exit(child.pid, timeout=0.05) is False
+		assert libdesktop.processes.wait_for_exit(child.pid, timeout=5) is True
+
+	finally:
+		child.kill()
+		child.wait()
+
+	assert libdesktop.processes.wait_for_exit('libdesktop-no-such-program') is True
+
+def test_processes_wait_async():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	import asyncio
+
+	async def wait():
+		child = libdesktop.processes.spawn(['sleep', '0.2'], background=True)
+
+		assert await libdesktop.processes.wait_for_process_async('sleep 0.2', match='cmdline', timeout=5) == [child.pid]
+		assert await libdesktop.processes.wait_for_exit_async(child.pid, timeout=5) is True
+		assert await libdesktop.processes.wait_for_process_async('libdesktop-no-such-program', timeout=0.05) == []
+
+	loop = asyncio.new_event_loop()
+
+	try:
+		loop.run_until_complete(wait())
+	finally:
+		loop.close()
+
+def test_processes_forkserver():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	libdesktop.processes.use_forkserver()
+
+	try:
+		assert libdesktop.system.get_cmd_out(['echo', 'libdesktop']) == 'libdesktop'
+		assert libdesktop.processes.check_output(['pwd'], cwd='/') == b'/\n'
+
+		try:
+			libdesktop.processes.check_output('echo out; exit 1', shell=True)
+			assert False
+
+		except subprocess.CalledProcessError as e:
+			assert e.returncode == 1
+			assert e.output == b'out\n'
+
+		try:
+			libdesktop.processes.check_output(['libdesktop-no-such-program'])
+			assert False
+
+		except OSError:
+			pass
+
+	finally:
+		libdesktop.processes.use_forkserver(False)
+
+def test_processes_spawn_stats():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	records = []
+	libdesktop.processes.reset_spawn_stats()
+	libdesktop.processes.add_spawn_hook(records.append)
+
+	try:
+		with libdesktop.processes.count_spawns() as spawns:
+			libdesktop.system.get_cmd_out(['echo', 'libdesktop'])
+			libdesktop.processes.spawn('exit 3', shell=True)
+
+	finally:
+		libdesktop.processes.remove_spawn_hook(records.append)
+
+	assert spawns.count == 2
+	assert spawns.duration > 0
+	assert [record.returncode for record in spawns.records] == [0, 3]
+	assert records == spawns.records
+
+	record = spawns.records[0]
+	assert record.args == ['echo', 'libdesktop']
+	assert record.api == 'libdesktop.system.get_cmd_out'
+	assert spawns.records[1].api == 'libdesktop.processes.spawn'
+
+	assert libdesktop.processes.get_spawn_records()[-2:] == spawns.records
+	assert libdesktop.processes.get_spawn_totals()['libdesktop.system.get_cmd_out'][0] == 1
@@ -1,5 +1,7 @@
 import sys
 import os
+import time
+import subprocess
 from context import libdesktop
 
 def test_system_get_cmd_out():
@@ -33,6 +35,148 @@ def test_system_get_name():
 		# Just call it
 		print(libdesktop.system.get_name())
 
+def test_system_iter_cmd_lines():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	assert list(libdesktop.system.iter_cmd_lines(['printf', 'a\\nb\\n'])) == ['a', 'b']
+	assert list(libdesktop.system.iter_cmd_lines('echo a; echo b', binary=True)) == [b'a', b'b']
+
+	try:
+		list(libdesktop.system.iter_cmd_lines('echo a; exit 3'))
+		assert False
+
+	except subprocess.CalledProcessError as e:
+		assert e.returncode == 3
+
+	# Stopping early kills the command
+	start = time.monotonic()
+
+	with libdesktop.processes.count_spawns() as spawns:
+		for line in libdesktop.system.iter_cmd_lines('echo first; exec sleep 10'):
+			break
+
+	assert line == 'first'
+	assert spawns.records[0].returncode < 0
+	assert time.monotonic() - start < 5
+
+def test_system_run_cmds():
+
+	if os.name == 'nt':
+		print('Not a Linux/Unix system, skipping')
+
+		return
+
+	start = time.monotonic()
+	results = libdesktop.system.run_cmds(['sleep 0.3; echo %d' % i for i in range(4)], max_parallel=4)
+
+	assert time.monotonic() - start < 1.1
+	assert [result.stdout for result in results] == ['0', '1', '2', '3']
+	assert all(result.duration >= 0.3 for result in results)
+
+	results = libdesktop.system.run_cmds(['echo out; echo err >&2; exit 2',
+										  ['libdesktop-no-such-program'],
+										  ['sleep', '10'],
+										  ['sleep', '10'],
+										  ['true']],
+										 max_parallel=2, timeout=1, total_timeout=0.3)
+
+	assert results[0] == libdesktop.system.CommandResult(results[0].command, 'out', 'err', 2, results[0].duration, False)
+	assert results[1].returncode is None and results[1].stderr
+	assert results[2].timed_out and results[2].returncode < 0
+	assert results[3].timed_out
+
+	# Out of time before it could start
+	assert results[4] == libdesktop.system.CommandResult(['true'], '', '', None, 0.0, True)
+
+	assert libdesktop.system.run_cmds([]) == []
+
+def test_system_get_desktop_info():
+
+	if os.name == 'nt' or sys.platform == 'darwin':
+		return
+
+	old = os.environ.get('XDG_CURRENT_DESKTOP')
+
+	try:
+		os.environ['XDG_CURRENT_DESKTOP'] = 'X-Cinnamon'
+		info = libdesktop.system.get_desktop_info()
+
+		assert info.name == 'cinnamon'
+		assert info.source == 'XDG_CURRENT_DESKTOP'
+		assert libdesktop.system.get_desktop_info() is info
+
+		# Changing the environment is noticed
+		os.environ['XDG_CURRENT_DESKTOP'] = 'XFCE'
+		assert libdesktop.system.get_name() == 'xfce4'
+
+		libdesktop.system.refresh()
+		assert libdesktop.system.get_desktop_info() is not info
+
+	finally:
+		if old is None:
+			del os.environ['XDG_CURRENT_DESKTOP']
+		else:
+			os.environ['XDG_CURRENT_DESKTOP'] = old
+
+def test_system_get_desktop_info_wayland(tmpdir, monkeypatch):
+
+	if os.name == 'nt' or sys.platform == 'darwin':
+		return
+
+	for name in libdesktop.system._DETECTION_ENVIRON:
+		monkeypatch.delenv(name, raising=False)
+
+	monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmpdir))
+	monkeypatch.setenv('XDG_SESSION_TYPE', 'wayland')
+
+	# A process ID nothing runs as
+	exited = libdesktop.processes.spawn(['true'])
+
+	with libdesktop.processes.count_spawns() as spawns:
+		monkeypatch.setenv('SWAYSOCK', str(tmpdir.join('sway.sock')))
+		info = libdesktop.system.get_desktop_info()
+
+		assert info.name == 'sway'
+		assert info.source == 'SWAYSOCK'
+		assert info.confidence >= 0.8
+
+		monkeypatch.delenv('SWAYSOCK')
+		monkeypatch.setenv('XDG_CURRENT_DESKTOP', 'Hyprland')
+		assert libdesktop.system.get_name() == 'hyprland'
+
+		# Only the sockets left to go on. One of an earlier session is left
+		# behind: the process in its lock file is gone
+		monkeypatch.delenv('XDG_CURRENT_DESKTOP')
+		tmpdir.join('hypr', 'abc_123', '.socket.sock').ensure()
+		tmpdir.join('hypr', 'abc_123', 'hyprland.lock').write('%d\nwayland-1\n' % exited.pid)
+		libdesktop.system.refresh()
+
+		assert libdesktop.system.get_desktop_info().source != 'socket'
+
+		tmpdir.join('hypr', 'def_456', '.socket.sock').ensure()
+		tmpdir.join('hypr', 'def_456', 'hyprland.lock').write('%d\nwayland-1\n' % os.getpid())
+		libdesktop.system.refresh()
+
+		info = libdesktop.system.get_desktop_info()
+		assert (info.name, info.source) == ('hyprland', 'socket')
+
+		tmpdir.join('sway-ipc.%d.%d.sock' % (os.getuid(), os.getpid())).ensure()
+		libdesktop.system.refresh()
+
+		assert libdesktop.system.get_desktop_info().name == 'sway'
+
+		# Not a Wayland session
+		monkeypatch.setenv('XDG_SESSION_TYPE', 'x11')
+		assert libdesktop.system.get_desktop_info().source != 'socket'
+
+	assert spawns.count == 0
+
+	libdesktop.system.refresh()
+
 def test_system_is_in_path():
 
 	if os.name == 'nt':
@@ -41,6 +185,47 @@ def test_system_is_in_path():
 	else:
 		assert libdesktop.system.is_in_path('ls') is True
 
+def test_system_which(tmpdir):
+
+	if os.name == 'nt':
+		assert libdesktop.system.which('explorer') is not None
+		return
+
+	assert libdesktop.system.which('ls') in ['/bin/ls', '/usr/bin/ls']
+	assert libdesktop.system.which('libdesktop-no-such-program') is None
+
+	program = tmpdir.join('libdesktop-test')
+	program.write('#!/bin/sh\n')
+	tmpdir.join('libdesktop-not-executable').write('#!/bin/sh\n')
+	program.chmod(0o755)
+
+	old_path = os.environ['PATH']
+
+	try:
+		os.environ['PATH'] = str(tmpdir) + os.pathsep + old_path
+
+		assert libdesktop.system.which('libdesktop-test') == str(program)
+		assert libdesktop.system.which('libdesktop-not-executable') is None
+
+		# A later directory has an executable file of the same name
+		later = tmpdir.mkdir('later')
+		later.join('libdesktop-not-executable').write('#!/bin/sh\n')
+		later.join('libdesktop-not-executable').chmod(0o755)
+		os.environ['PATH'] = str(tmpdir) + os.pathsep + str(later) + os.pathsep + old_path
+
+		assert libdesktop.system.which('libdesktop-not-executable') == str(later.join('libdesktop-not-executable'))
+
+		# chmod does not change the directory, but is seen at once
+		tmpdir.join('libdesktop-not-executable').chmod(0o755)
+
+		assert libdesktop.system.which('libdesktop-not-executable') == str(tmpdir.join('libdesktop-not-executable'))
+		assert libdesktop.system.is_in_path('libdesktop-not-executable') is True
+
+	finally:
+		os.environ['PATH'] = old_path
+
+	assert libdesktop.system.which('libdesktop-test') is None
+
 def test_system_is_running():
 
 	if os.name == 'nt':
@@ -1,4 +1,6 @@
 from context import libdesktop
+import subprocess
+import time
 import sys
 import os
 
@@ -67,6 +69,16 @@ def test_volume_mute():
 
 def test_volume_is_muted():
 
+	if sys.platform.startswith('linux') and libdesktop.system.which('amixer') is None:
+		try:
+			libdesktop.volume.is_muted()
+			assert False
+
+		except OSError:
+			print('amixer is not installed')
+
+		return
+
 	print('The volume %s' % 'is muted' if libdesktop.volume.is_muted() else 'is not muted.')
 
 def test_volume_unmute():
@@ -83,4 +95,29 @@ def test_volume_unmute():
 
 	print('-' * 50)
 
+def test_volume_timeout(tmpdir, monkeypatch):
+
+	if not sys.platform.startswith('linux'):
+		print('Not a Linux system, skipping')
+
+		return
+
+	# An amixer which hangs
+	amixer = tmpdir.join('amixer')
+	amixer.write('#!/bin/sh\nexec sleep 30\n')
+	amixer.chmod(0o755)
+
+	monkeypatch.setenv('PATH', str(tmpdir) + os.pathsep + os.environ['PATH'])
+	monkeypatch.setattr(libdesktop.system, '_TIMEOUT', 0.2)
+
+	start = time.monotonic()
+
+	for function in [libdesktop.volume.mute, libdesktop.volume.is_muted]:
+		try:
+			function()
+			assert False
+
+		except subprocess.TimeoutExpired:
+			pass
 
+	assert time.monotonic() - start < 5